@@ -1,11 +1,17 @@
+import io
+import os
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import openpyxl
-from src.ml_models import TaxPredictor
+import numpy as np
+from src.artifacts import current_version
+from src.bulk_scoring import UPLOAD_TYPES, SpoolFile, iter_spool, score_upload, spool_chunks
+from src.charts import comparison_png
+from src.exporters import (EXCEL_MAX_ROWS, EXPORT_FORMATS, can_export, export_bytes, file_name,
+                           mime_type, write_export)
+from src.model_registry import ModelRegistry
+from src.result_cache import ResultCache, cached_calculate_tax, cached_predict_tax
 from src.tax_calculator import TaxCalculator
-from src.data_processing import DataProcessor
-from io import BytesIO  # Add for Excel export
 
 # Set page config with a custom icon
 st.set_page_config(page_title="TaxSense ML", page_icon="💰", layout="centered")
@@ -331,15 +337,136 @@ st.markdown(
 st.markdown('<div class="main-title">TaxSense ML: Tax Prediction System</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-title">Predict your tax liability using machine learning</div>', unsafe_allow_html=True)
 
-# Initialize components
-predictor = TaxPredictor()
-calculator = TaxCalculator()
-processor = DataProcessor()
+# Shared resources are cached once per server process and reload
+# automatically when the underlying files change
+BUNDLE_ROOT = 'models/bundles'
+MODEL_PATH = 'models/tax_model.joblib'
+SCALER_PATH = 'models/scaler.joblib'
+PIPELINE_PATH = 'models/feature_pipeline.joblib'
+TAX_TABLES_PATH = 'data/tax_tables_2024.csv'
+SAMPLE_DATA_PATH = 'data/sample_finances.csv'
+# Optional SQLite file so that several app processes share cached results
+RESULT_CACHE_PATH = os.environ.get('TAXSENSE_CACHE_PATH')
+
+
+def file_signature(path):
+    """Return (mtime, size) for cache keys, or None if the file is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry():
+    """Process-wide model registry that hot-swaps retrained artifacts.
+
+    The published bundle is preferred; otherwise the loose joblib files are
+    watched. New artifacts are loaded and validated in a background thread.
+    """
+    if current_version(BUNDLE_ROOT):
+        return ModelRegistry.for_bundles(BUNDLE_ROOT).start()
+    return ModelRegistry.for_files(MODEL_PATH, SCALER_PATH, PIPELINE_PATH).start()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_calculator(tax_tables_path, tables_signature):
+    return TaxCalculator(tax_tables_path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Bracket and model results shared by all sessions.
+
+    Keys include the tables digest and model version, so retrained models
+    and edited tables are never answered from stale entries.
+    """
+    return ResultCache(max_entries=4096, path=RESULT_CACHE_PATH)
+
+
+# Taxable incomes for the what-if curve, $100 apart
+CURVE_TAXABLE = np.linspace(0, 1_000_000, 10_001)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def tax_curve(filing_status, tables_signature):
+    """Tax and marginal rate over CURVE_TAXABLE, computed once per status.
+
+    Tax depends only on taxable income, so one curve serves every deduction
+    amount by shifting it along the income axis.
+    """
+    calculator = load_calculator(TAX_TABLES_PATH, tables_signature)
+    grid = calculator.what_if_grid(CURVE_TAXABLE, statuses=[filing_status])
+    return pd.DataFrame({
+        'taxable_income': CURVE_TAXABLE,
+        'tax': grid['tax'][0, 0],
+        'marginal_rate': grid['marginal_rate'][0, 0],
+    })
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def comparison_chart(traditional_tax, predicted_tax):
+    """PNG of the comparison chart, rendered once per pair of amounts."""
+    return comparison_png(['Traditional', 'ML Prediction'], [traditional_tax, predicted_tax])
+
+
+@st.cache_data(max_entries=8, show_spinner="Preparing export...")
+def cached_export(df, file_format):
+    return export_bytes(df, file_format)
+
+
+@st.cache_data(max_entries=2, show_spinner="Preparing export...")
+def cached_spool_export(_path, token, file_format):
+    """Export of spooled bulk results, streamed from the spool file.
+
+    Cached on the spool's token; the path is not hashed, as temp file names
+    can be reused.
+    """
+    buffer = io.BytesIO()
+    write_export(iter_spool(_path), file_format, buffer)
+    return buffer.getvalue()
+
+
+def export_controls(rows, export, file_stem, key):
+    """Format picker and download button.
+
+    export(file_format) returns the file's bytes. It is only called once a
+    format is chosen, instead of on every rerun.
+    """
+    formats = [f for f in EXPORT_FORMATS if can_export(rows, f)]
+    export_format = st.selectbox(
+        "Export format", options=formats, index=None, key=f"{key}-format",
+        format_func=lambda f: EXPORT_FORMATS[f][0], placeholder="Choose a format to export"
+    )
+    if len(formats) < len(EXPORT_FORMATS):
+        st.caption(f"Excel export is limited to {EXCEL_MAX_ROWS:,} rows; "
+                   "choose CSV or Parquet for larger results.")
+    if export_format is not None:
+        st.download_button(
+            label=f"Download {EXPORT_FORMATS[export_format][0]}",
+            data=export(export_format),
+            file_name=file_name(file_stem, export_format),
+            mime=mime_type(export_format),
+            key=f"{key}-download"
+        )
+
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_sample_data(path, signature):
+    """Sample data, re-read when the file's own signature changes."""
+    if signature is None:
+        return None
+    return pd.read_csv(path)
+
+
+tables_signature = file_signature(TAX_TABLES_PATH)
+calculator = load_calculator(TAX_TABLES_PATH, tables_signature)
 
 # Load model and scaler
 try:
-    predictor.load_model('models/tax_model.joblib')
-    processor.load_scaler('models/scaler.joblib')
+    # Snapshot for this rerun; a concurrent hot swap only affects later reruns
+    model_bundle = get_model_registry().current()
     model_loaded = True
 except FileNotFoundError:
     st.warning("No trained model or scaler found. Using traditional calculation method.")
@@ -384,114 +511,144 @@ if reset:
     st.session_state.filing_status = 'single'
     st.rerun()
 
+# Results stay visible across reruns (e.g. picking an export format) until
+# the inputs change
 if calculate:
+    st.session_state.calculated_inputs = (income, deductions, filing_status)
+
+if st.session_state.get('calculated_inputs') == (income, deductions, filing_status):
     # Traditional calculation
-    traditional_tax = calculator.calculate_tax(income, deductions, filing_status)
+    result_cache = get_result_cache()
+    traditional_tax = cached_calculate_tax(result_cache, calculator, income, deductions, filing_status)
     
     # ML prediction if model is loaded
+    predicted_tax = None
     if model_loaded:
         try:
-            input_data = pd.DataFrame([[income, deductions]], columns=['income', 'deductions'])
-            processed_input = processor.preprocess_features(input_data).values
-            predicted_tax = predictor.predict_tax(processed_input)[0]
-            
-            # Display results in a styled container
-            st.markdown('<div class="results-container">', unsafe_allow_html=True)
-            st.markdown('<h3 class="section-header">Tax Analysis Results</h3>', unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(
-                    '<div class="metric-box"><div class="metric-label">Traditional Tax Calculation</div>'
-                    f'<div class="metric-value">${traditional_tax:,.2f}</div></div>',
-                    unsafe_allow_html=True
-                )
-            with col2:
-                st.markdown(
-                    '<div class="metric-box"><div class="metric-label">ML-Based Prediction</div>'
-                    f'<div class="metric-value-alt">${predicted_tax:,.2f}</div></div>',
-                    unsafe_allow_html=True
-                )
-
-            st.markdown("<div style='height: 30px'></div>", unsafe_allow_html=True)
-            
-            # Export to Excel
-            result_df = pd.DataFrame({
-                'Method': ['Traditional Tax Calculation', 'ML-Based Prediction'],
-                'Tax Amount ($)': [traditional_tax, predicted_tax]
-            })
-            # Use BytesIO to create an in-memory Excel file
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                result_df.to_excel(writer, index=False, sheet_name='Tax Results')
-            excel_data = output.getvalue()
-
-            st.download_button(
-                label="Export to Excel",
-                data=excel_data,
-                file_name="tax_calculation_results.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download-excel"
-            )
-
-            # Plot comparison with light theme styling
-            st.markdown("<div style='height: 30px'></div>", unsafe_allow_html=True)
-            st.markdown('<h3 class="section-header">Tax Calculation Comparison</h3>', unsafe_allow_html=True)
-            
-            # Configure plot with light theme
-            plt.style.use('default')
-            fig, ax = plt.subplots(figsize=(6, 4))
-            fig.patch.set_facecolor('#ffffff')
-            ax.set_facecolor('#ffffff')
-            
-            # Create gradient color for bars
-            bar_colors = ['#0ea5e9', '#0d9488']
-            ax.bar(['Traditional', 'ML Prediction'], [traditional_tax, predicted_tax], color=bar_colors)
-            
-            # Style the plot
-            ax.set_ylabel('Tax Amount ($)', fontsize=12, color='#0f172a')
-            ax.set_title('Tax Calculation Comparison', fontsize=14, pad=15, color='#0f172a')
-            ax.set_ylim(0, max(traditional_tax, predicted_tax) * 1.2)
-            ax.tick_params(colors='#1e293b')
-            ax.spines['bottom'].set_color('#e2e8f0')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.spines['left'].set_color('#e2e8f0')
-            ax.grid(axis='y', linestyle='--', alpha=0.2, color='#94a3b8')
-            
-            # Add value labels
-            for i, v in enumerate([traditional_tax, predicted_tax]):
-                ax.text(i, v + max(traditional_tax, predicted_tax) * 0.05, f'${v:,.2f}', 
-                        ha='center', fontsize=10, color='#0f172a')
-            
-            fig.tight_layout()
-            st.pyplot(fig)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+            predicted_tax = cached_predict_tax(result_cache, model_bundle, income, deductions,
+                                               filing_status)
         except Exception as e:
             st.error(f"ML prediction failed: {e}")
-            # Only show traditional tax without redundant "Calculated Tax"
-            st.markdown('<div class="results-container">', unsafe_allow_html=True)
-            st.markdown('<h3 class="section-header">Tax Analysis Results</h3>', unsafe_allow_html=True)
+
+    # Display results in a styled container
+    st.markdown('<div class="results-container">', unsafe_allow_html=True)
+    st.markdown('<h3 class="section-header">Tax Analysis Results</h3>', unsafe_allow_html=True)
+    if predicted_tax is not None:
+        col1, col2 = st.columns(2)
+        with col1:
             st.markdown(
                 '<div class="metric-box"><div class="metric-label">Traditional Tax Calculation</div>'
                 f'<div class="metric-value">${traditional_tax:,.2f}</div></div>',
                 unsafe_allow_html=True
             )
-            st.markdown('</div>', unsafe_allow_html=True)
+        with col2:
+            st.markdown(
+                '<div class="metric-box"><div class="metric-label">ML-Based Prediction</div>'
+                f'<div class="metric-value-alt">${predicted_tax:,.2f}</div></div>',
+                unsafe_allow_html=True
+            )
+
+        st.markdown("<div style='height: 30px'></div>", unsafe_allow_html=True)
+        
+        # Export
+        result_df = pd.DataFrame({
+            'Method': ['Traditional Tax Calculation', 'ML-Based Prediction'],
+            'Tax Amount ($)': [traditional_tax, predicted_tax]
+        })
+        export_controls(len(result_df), lambda f: cached_export(result_df, f),
+                        "tax_calculation_results", "single-export")
+
+        # Plot comparison with light theme styling
+        st.markdown("<div style='height: 30px'></div>", unsafe_allow_html=True)
+        st.markdown('<h3 class="section-header">Tax Calculation Comparison</h3>', unsafe_allow_html=True)
+        
+        chart_style = st.radio("Chart style", ["Image", "Interactive"], horizontal=True,
+                               key="chart-style")
+        if chart_style == "Image":
+            st.image(comparison_chart(round(traditional_tax, 2), round(predicted_tax, 2)))
+        else:
+            # Native chart rendered in the browser, no server-side drawing
+            st.bar_chart(pd.DataFrame({'Tax Amount ($)': [traditional_tax, predicted_tax]},
+                                      index=['Traditional', 'ML Prediction']))
     else:
-        st.markdown('<div class="results-container">', unsafe_allow_html=True)
-        st.markdown('<h3 class="section-header">Tax Analysis Results</h3>', unsafe_allow_html=True)
+        # Only show traditional tax without redundant "Calculated Tax"
         st.markdown(
             '<div class="metric-box"><div class="metric-label">Traditional Tax Calculation</div>'
             f'<div class="metric-value">${traditional_tax:,.2f}</div></div>',
             unsafe_allow_html=True
         )
-        st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# What-if curve: reuses the cached per-status grid, so changing income or
+# deductions only re-slices arrays instead of recalculating
+with st.expander("What-If Tax Curve"):
+    curve = tax_curve(filing_status, tables_signature)
+    _, marginal_rate, effective_rate = calculator.calculate_rates([income], [deductions], filing_status)
+    col1, col2 = st.columns(2)
+    col1.metric("Marginal Rate", f"{marginal_rate[0]:.1%}")
+    col2.metric("Effective Rate", f"{effective_rate[0]:.1%}")
+
+    incomes = curve['taxable_income'] + deductions
+    visible = incomes <= max(2 * income, 200000)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effective = np.where(incomes > 0, curve['tax'] / incomes, 0.0)
+    chart = pd.DataFrame({
+        'Income ($)': incomes,
+        'Tax ($)': curve['tax'],
+        'Marginal Rate': curve['marginal_rate'],
+        'Effective Rate': effective,
+    })[visible].set_index('Income ($)')
+    st.line_chart(chart[['Tax ($)']])
+    st.line_chart(chart[['Marginal Rate', 'Effective Rate']])
+
+# Bulk scoring: whole client lists are processed in chunks with vectorized
+# bracket math and batched model predictions
+with st.expander("Bulk Scoring"):
+    uploaded = st.file_uploader(
+        "Upload a client list (CSV, Excel or Parquet)", type=UPLOAD_TYPES,
+        help="Required columns: income, deductions. Optional: filing_status (defaults to single)."
+    )
+    upload_key = (uploaded.name, uploaded.size) if uploaded is not None else None
+    results = st.session_state.get('bulk_results')
+    if results and results['key'] != upload_key:
+        # The spool belongs to a file that is no longer uploaded
+        results['spool'].remove()
+        del st.session_state['bulk_results']
+    if uploaded is not None:
+        if st.button("Score File"):
+            progress_bar = st.progress(0.0, text="Scoring...")
+
+            def report_progress(done, total):
+                fraction = min(done / total, 1.0) if total else 0.0
+                progress_bar.progress(fraction, text=f"Scored {done:,} rows")
+
+            try:
+                # Scored chunks go to a temporary file rather than the session.
+                # The SpoolFile deletes it when the session is dropped
+                path, rows, preview = spool_chunks(score_upload(
+                    uploaded, calculator, model_bundle if model_loaded else None,
+                    progress=report_progress))
+                progress_bar.progress(1.0, text=f"Scored {rows:,} rows")
+                previous = st.session_state.get('bulk_results')
+                if previous:
+                    previous['spool'].remove()
+                st.session_state.bulk_results = {'key': upload_key, 'spool': SpoolFile(path),
+                                                 'rows': rows, 'preview': preview}
+            except Exception as e:
+                st.error(f"Scoring failed: {e}")
+
+        results = st.session_state.get('bulk_results')
+        if results and results['spool'].exists():
+            st.write(f"Scored {results['rows']:,} rows. First 100 shown below.")
+            st.dataframe(results['preview'])
+            spool = results['spool']
+            export_controls(results['rows'],
+                            lambda f: cached_spool_export(spool.path, spool.token, f),
+                            "scored_clients", "bulk-export")
 
 # Sample Data Viewer
 with st.expander("View Sample Tax Data"):
-    sample_data = calculator.load_sample_data()
+    sample_data = load_sample_data(SAMPLE_DATA_PATH, file_signature(SAMPLE_DATA_PATH))
     if sample_data is not None:
         st.dataframe(sample_data.style.format({
             'income': '${:,.2f}',
@@ -503,9 +660,10 @@ with st.expander("View Sample Tax Data"):
 
 # Additional Information
 with st.expander("How It Works"):
-    st.write("""
+    tax_year = calculator.tax_year or 'current'
+    st.write(f"""
     **TaxSense ML** uses two methods to estimate your tax liability:
-    - **Traditional Tax Bracket Calculation**: Based on 2024 IRS tax rates, this method applies standard tax brackets for your filing status.
+    - **Traditional Tax Bracket Calculation**: Based on {tax_year} IRS tax rates, this method applies standard tax brackets for your filing status.
     - **Machine Learning Prediction**: A Lasso regression model trained on historical tax data predicts your tax liability by analyzing patterns in income and deductions.
 
     ### Supported Filing Statuses:
@@ -516,7 +674,7 @@ with st.expander("How It Works"):
     ### How the ML Model Works:
     The ML model is trained on synthetic data simulating various income levels, deductions, and filing statuses. It uses a Lasso regression algorithm to identify relationships between inputs and tax outcomes, providing a prediction that can adapt to complex patterns.
 
-    **Note**: Tax brackets and rates are based on 2024 IRS guidelines. Always consult a tax professional for official advice.
+    **Note**: Tax brackets and rates are based on {tax_year} IRS guidelines. Always consult a tax professional for official advice.
     """)
 
 # Footer
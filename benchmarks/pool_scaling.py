@@ -0,0 +1,99 @@
+"""Throughput of PredictorPool as the number of workers grows.
+
+Scores one large batch with 1, 2, 4, ... workers in each mode and reports
+rows per second, speedup over one worker and parallel efficiency:
+
+    python benchmarks/pool_scaling.py --rows 4000000 --modes thread process
+
+Near-linear scaling shows as an efficiency close to 1.0. The --model
+option picks the compiled linear model or a feature-pipeline forest, whose
+prediction holds the GIL and so only scales in process mode.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.run_benchmarks import TAX_TABLES, measure  # noqa: E402
+from src.artifacts import ModelBundle, load_bundle, save_bundle  # noqa: E402
+from src.data_processing import TaxFeaturePipeline  # noqa: E402
+from src.predictor_pool import MODES, PredictorPool  # noqa: E402
+from src.tax_calculator import TaxCalculator  # noqa: E402
+
+MODELS = ('linear', 'forest')
+
+
+def _bundle(calculator, model, workdir):
+    data = calculator.generate_training_data(5000, random_state=0)
+    if model == 'linear':
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+        features = data[['income', 'deductions']].to_numpy()
+        scaler = StandardScaler().fit(features)
+        estimator = LinearRegression().fit(scaler.transform(features), data['tax_liability'])
+        return ModelBundle.from_estimators(estimator, scaler=scaler)
+    from sklearn.ensemble import RandomForestRegressor
+    pipeline = TaxFeaturePipeline.from_calculator(calculator).fit(data)
+    estimator = RandomForestRegressor(n_estimators=20, max_depth=12, n_jobs=1, random_state=0)
+    estimator.fit(pipeline.transform(data), data['tax_liability'])
+    # Saved to disk so process workers memory-map the trees
+    return load_bundle(save_bundle(workdir, estimator, pipeline.feature_names,
+                                   feature_pipeline=pipeline, version='forest'))
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def run_scaling(rows=1_000_000, modes=MODES, model='linear', max_workers=None, min_time=0.5,
+                log=print):
+    """Return {"mode[workers]": result} with speedup and efficiency added."""
+    calculator = TaxCalculator(TAX_TABLES)
+    rng = np.random.default_rng(0)
+    incomes = rng.uniform(0, 500000, rows)
+    deductions = rng.uniform(0, 50000, rows)
+    statuses = rng.choice(np.array(['single', 'married', 'head_of_household'], dtype=object), rows)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='taxsense-bench-') as workdir:
+        bundle = _bundle(calculator, model, workdir)
+        for mode in modes:
+            single = None
+            for workers in worker_counts(max_workers or os.cpu_count() or 1):
+                with PredictorPool(bundle, calculator, mode=mode, workers=workers) as pool:
+                    result = measure(lambda: pool.score(incomes, deductions, statuses), rows,
+                                     min_time=min_time)
+                single = single or result['rows_per_sec']
+                result['workers'] = workers
+                result['speedup'] = result['rows_per_sec'] / single
+                result['efficiency'] = result['speedup'] / workers
+                results[f'{mode}[{workers}]'] = result
+                log(f"{mode:<8}{workers:>4} workers  {result['rows_per_sec']:>14,.0f} rows/s  "
+                    f"speedup {result['speedup']:>5.2f}  efficiency {result['efficiency']:>5.2f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure PredictorPool scaling with workers")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--modes', nargs='*', choices=MODES, default=list(MODES))
+    parser.add_argument('--model', choices=MODELS, default='linear')
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help="defaults to the number of CPUs")
+    parser.add_argument('--min-time', type=float, default=0.5)
+    args = parser.parse_args(argv)
+    run_scaling(args.rows, args.modes, args.model, args.max_workers, args.min_time)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Reproducible performance benchmarks with a JSON regression baseline.
+
+Record a baseline on a quiet machine, then compare later runs against it:
+
+    python benchmarks/run_benchmarks.py --update-baseline
+    python benchmarks/run_benchmarks.py --threshold 0.25
+
+The second command exits with status 1 when any case's median latency or
+peak memory grows by more than the threshold relative to the baseline, and
+with status 2, before running anything, when there is no baseline yet.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.artifacts import ModelBundle  # noqa: E402
+from src.data_processing import DataProcessor  # noqa: E402
+from src.ml_models import TaxPredictor  # noqa: E402
+from src.predictor_pool import PredictorPool  # noqa: E402
+from src.tax_calculator import TaxCalculator  # noqa: E402
+
+DEFAULT_SIZES = [1, 1000, 1000000]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+TAX_TABLES = os.path.join(ROOT, 'data', 'tax_tables_2024.csv')
+# Per-call Python loops are capped so the suite finishes in reasonable time
+SCALAR_MAX_SIZE = 1000
+
+
+def _dataset(calculator, size):
+    return calculator.generate_training_data(size, random_state=0)
+
+
+def _fitted(calculator, size):
+    data = _dataset(calculator, size)
+    processor = DataProcessor()
+    processor.scaler.fit(data[['income', 'deductions']])
+    predictor = TaxPredictor()
+    X = processor.preprocess_features(data).values
+    predictor.train(X, data['tax_liability'])
+    return data, processor, predictor, X
+
+
+def case_calculate_tax_scalar(calculator, size):
+    if size > SCALAR_MAX_SIZE:
+        return None
+    data = _dataset(calculator, size)
+    rows = list(zip(data['income'], data['deductions'], data['filing_status']))
+    return lambda: [calculator.calculate_tax(i, d, s) for i, d, s in rows]
+
+
+def case_calculate_tax_batch(calculator, size):
+    data = _dataset(calculator, size)
+    incomes = data['income'].to_numpy()
+    deductions = data['deductions'].to_numpy()
+    statuses = data['filing_status'].to_numpy()
+    return lambda: calculator.calculate_tax_batch(incomes, deductions, statuses)
+
+
+def case_generate_training_data(calculator, size):
+    return lambda: calculator.generate_training_data(size, random_state=0)
+
+
+def case_preprocess_features(calculator, size):
+    data, processor, _, _ = _fitted(calculator, size)
+    return lambda: processor.preprocess_features(data)
+
+
+def case_predict_tax(calculator, size):
+    _, _, predictor, X = _fitted(calculator, size)
+    return lambda: predictor.predict_tax(X)
+
+
+def case_score_pool(calculator, size):
+    # Prediction and bracket tax on a thread pool with one worker per CPU;
+    # benchmarks/pool_scaling.py compares worker counts
+    data, processor, predictor, _ = _fitted(calculator, size)
+    pool = PredictorPool(ModelBundle.from_estimators(predictor.model, scaler=processor.scaler),
+                         calculator)
+    incomes = data['income'].to_numpy()
+    deductions = data['deductions'].to_numpy()
+    statuses = data['filing_status'].to_numpy()
+    return lambda: pool.score(incomes, deductions, statuses)
+
+
+def case_train(calculator, size):
+    if size < 2:
+        return None
+    data, processor, _, X = _fitted(calculator, size)
+    y = data['tax_liability']
+    return lambda: TaxPredictor().train(X, y)
+
+
+def case_train_initial_model(calculator, size):
+    if size < 2:
+        return None
+    from src import train_model
+
+    def run():
+        # train_initial_model writes to ./models, so run it in a scratch copy
+        workdir = tempfile.mkdtemp(prefix='taxsense-bench-')
+        cwd = os.getcwd()
+        try:
+            shutil.copytree(os.path.join(ROOT, 'data'), os.path.join(workdir, 'data'))
+            os.chdir(workdir)
+            with open(os.devnull, 'w') as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    train_model.train_initial_model(samples=size)
+                finally:
+                    sys.stdout = stdout
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return run
+
+
+CASES = {
+    'calculate_tax_scalar': case_calculate_tax_scalar,
+    'calculate_tax_batch': case_calculate_tax_batch,
+    'generate_training_data': case_generate_training_data,
+    'preprocess_features': case_preprocess_features,
+    'predict_tax': case_predict_tax,
+    'score_pool': case_score_pool,
+    'train': case_train,
+    'train_initial_model': case_train_initial_model,
+}
+
+
+def measure(fn, size, min_time=0.5, min_repeats=3, max_repeats=200):
+    """Time fn repeatedly and measure its peak traced memory once."""
+    fn()  # warm-up
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_repeats and (
+            len(timings) < min_repeats or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = np.array(timings)
+    p50 = float(np.percentile(timings, 50))
+    return {
+        'size': size,
+        'repeats': len(timings),
+        'p50_ms': p50 * 1000,
+        'p95_ms': float(np.percentile(timings, 95)) * 1000,
+        'p99_ms': float(np.percentile(timings, 99)) * 1000,
+        'rows_per_sec': size / p50 if p50 > 0 else float('inf'),
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def run_benchmarks(cases=None, sizes=DEFAULT_SIZES, min_time=0.5, log=print):
+    """Run the selected cases at each size and return {"case[size]": result}."""
+    calculator = TaxCalculator(TAX_TABLES)
+    results = {}
+    for name in cases or CASES:
+        for size in sizes:
+            fn = CASES[name](calculator, size)
+            if fn is None:
+                continue
+            result = measure(fn, size, min_time=min_time)
+            results[f'{name}[{size}]'] = result
+            log(f"{name:<24}{size:>10}  p50 {result['p50_ms']:>10.3f} ms  "
+                f"{result['rows_per_sec']:>14,.0f} rows/s  {result['peak_memory_mb']:>8.1f} MB")
+    return results
+
+
+def compare(results, baseline, threshold=0.25, metrics=('p50_ms', 'peak_memory_mb'),
+            min_absolute=(('p50_ms', 0.05), ('peak_memory_mb', 0.5))):
+    """Return regressions of results against baseline beyond threshold.
+
+    Differences smaller than min_absolute are ignored so that timer noise on
+    microsecond-scale cases does not fail the run.
+    """
+    floors = dict(min_absolute)
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in metrics:
+            old, new = previous[metric], current[metric]
+            if new - old > floors.get(metric, 0) and new > old * (1 + threshold):
+                regressions.append({'case': key, 'metric': metric, 'baseline': old,
+                                    'current': new, 'change': new / old - 1 if old else float('inf')})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TaxSense performance benchmarks")
+    parser.add_argument('--cases', nargs='*', choices=sorted(CASES), default=None)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated row counts")
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="minimum seconds spent timing each case")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--output', help="also write this run's results to a JSON file")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed fractional slowdown before failing")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 2
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run_benchmarks(args.cases, sizes, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['case']} {r['metric']}: {r['baseline']:.3f} -> "
+              f"{r['current']:.3f} (+{r['change']:.0%})")
+    if regressions:
+        return 1
+    print("No regressions beyond threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
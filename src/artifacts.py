@@ -0,0 +1,315 @@
+"""Versioned model bundles with a manifest and memory-mappable arrays.
+
+A bundle is a directory under a bundle root:
+
+    models/bundles/
+        CURRENT                      name of the published version
+        releases.json                publish history, used for rollback
+        20261018T120000-3f2a9c1d/
+            manifest.json            version, data hash, features, tax year, metrics
+            model.joblib             estimator, arrays stored uncompressed for mmap
+            scaler_mean.npy          StandardScaler statistics (basic features)
+            scaler_scale.npy
+            feature_pipeline.joblib  TaxFeaturePipeline (filing-status features)
+
+Bundles are written to a temporary directory and renamed into place, and
+publishing swaps the CURRENT pointer with os.replace, so readers never see
+a half-written bundle.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+from joblib import dump, load
+
+try:
+    from .data_processing import DataProcessor, TaxFeaturePipeline
+    from .instrumentation import timed
+    from .ml_models import TaxPredictor
+except ImportError:
+    from data_processing import DataProcessor, TaxFeaturePipeline
+    from instrumentation import timed
+    from ml_models import TaxPredictor
+
+FORMAT_VERSION = 1
+DEFAULT_BUNDLE_ROOT = 'models/bundles'
+CURRENT_POINTER = 'CURRENT'
+RELEASES_FILE = 'releases.json'
+
+
+def dataset_digest(df):
+    """Stable SHA-256 of a training DataFrame's contents."""
+    import pandas as pd
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def _write_json(path, payload):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def save_bundle(root, model, features, scaler=None, feature_pipeline=None, tax_year=None,
+                training_data=None, metrics=None, version=None):
+    """Write a new bundle under root and return its directory.
+
+    Exactly one of scaler (a fitted StandardScaler over `features`) or
+    feature_pipeline must be given. The bundle is not published.
+    """
+    if (scaler is None) == (feature_pipeline is None):
+        raise ValueError("Provide exactly one of scaler or feature_pipeline")
+    version = version or time.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    os.makedirs(root, exist_ok=True)
+    final = os.path.join(root, version)
+    if os.path.exists(final):
+        raise FileExistsError(f"Bundle {version} already exists")
+    staging = os.path.join(root, f'.{version}.tmp')
+    os.makedirs(staging)
+    try:
+        dump(model, os.path.join(staging, 'model.joblib'))
+        if scaler is not None:
+            np.save(os.path.join(staging, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+            np.save(os.path.join(staging, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+        else:
+            feature_pipeline.save(os.path.join(staging, 'feature_pipeline.joblib'))
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'model_class': type(model).__name__,
+            'features': list(features),
+            'preprocessing': 'scaler' if scaler is not None else 'feature_pipeline',
+            'tax_year': tax_year,
+            'training_data_sha256': dataset_digest(training_data) if training_data is not None else None,
+            'training_rows': len(training_data) if training_data is not None else None,
+            'metrics': metrics or {},
+        }
+        _write_json(os.path.join(staging, 'manifest.json'), manifest)
+        os.rename(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return final
+
+
+class ModelBundle:
+    """A loaded, validated bundle."""
+
+    def __init__(self, path, manifest, model, scaler=None, feature_pipeline=None):
+        self.path = path
+        self.manifest = manifest
+        self.model = model
+        self.scaler = scaler
+        self.feature_pipeline = feature_pipeline
+        self._compiled = None
+
+    @classmethod
+    def from_estimators(cls, model, scaler=None, feature_pipeline=None, version='in-memory',
+                        path=None):
+        """Wrap already-loaded estimators, e.g. the legacy joblib files."""
+        features = (feature_pipeline.feature_names if feature_pipeline is not None
+                    else list(getattr(scaler, 'feature_names_in_', ['income', 'deductions'])))
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'model_class': type(model).__name__,
+            'features': features,
+            'preprocessing': 'feature_pipeline' if feature_pipeline is not None else 'scaler',
+        }
+        bundle = cls(path, manifest, model, scaler, feature_pipeline)
+        bundle.validate()
+        return bundle
+
+    def validate(self):
+        """Check that preprocessing, manifest and model agree on the features."""
+        if self.feature_pipeline is not None:
+            n_inputs = len(self.feature_pipeline.feature_names)
+        else:
+            n_inputs = len(self.scaler.mean_)
+        n_features = len(self.features)
+        model_features = getattr(self.model, 'n_features_in_', n_features)
+        if not n_inputs == n_features == model_features:
+            raise ValueError(
+                f"Bundle {self.version} is inconsistent: preprocessing produces {n_inputs} "
+                f"features, manifest lists {n_features}, model expects {model_features}")
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def features(self):
+        return self.manifest['features']
+
+    def predictor(self):
+        predictor = TaxPredictor()
+        predictor.model = self.model
+        return predictor
+
+    def processor(self):
+        """DataProcessor holding the bundle's scaler (basic features only)."""
+        if self.scaler is None:
+            raise ValueError("Bundle uses a feature pipeline, not a plain scaler")
+        processor = DataProcessor()
+        processor.scaler = self.scaler
+        return processor
+
+    def compile(self):
+        """CompiledLinearModel for linear models with plain scaling."""
+        if self._compiled is None:
+            if self.scaler is None:
+                raise TypeError("Bundles with a feature pipeline cannot be compiled")
+            self._compiled = self.predictor().compile(self.scaler)
+        return self._compiled
+
+    def transform(self, incomes, deductions, statuses='single'):
+        """Raw inputs to model features, as used at training time."""
+        if self.feature_pipeline is not None:
+            return self.feature_pipeline.transform_arrays(incomes, deductions, statuses)
+        features = np.column_stack([np.asarray(incomes, dtype=np.float64),
+                                    np.asarray(deductions, dtype=np.float64)])
+        # Same arithmetic as StandardScaler.transform, without its input checks
+        return (features - self.scaler.mean_) / self.scaler.scale_
+
+    def predict(self, incomes, deductions, statuses='single'):
+        return self.model.predict(self.transform(incomes, deductions, statuses))
+
+
+def _scaler_from_arrays(mean, scale):
+    from sklearn.preprocessing import StandardScaler
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.scale_ = scale
+    scaler.var_ = scale ** 2
+    scaler.n_features_in_ = len(mean)
+    scaler.n_samples_seen_ = 0
+    return scaler
+
+
+@timed('load_bundle')
+def load_bundle(path, mmap=True):
+    """Load and validate a bundle directory.
+
+    With mmap=True the scaler arrays and the estimator's NumPy arrays are
+    memory-mapped read-only, so processes loading the same bundle share pages.
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format: {manifest.get('format_version')}")
+    mmap_mode = 'r' if mmap else None
+    model = load(os.path.join(path, 'model.joblib'), mmap_mode=mmap_mode)
+
+    scaler = feature_pipeline = None
+    if manifest['preprocessing'] == 'scaler':
+        scaler = _scaler_from_arrays(
+            np.load(os.path.join(path, 'scaler_mean.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, 'scaler_scale.npy'), mmap_mode=mmap_mode))
+    else:
+        feature_pipeline = TaxFeaturePipeline.load(os.path.join(path, 'feature_pipeline.joblib'))
+    bundle = ModelBundle(path, manifest, model, scaler, feature_pipeline)
+    bundle.validate()
+    return bundle
+
+
+def load_legacy(model_path, scaler_path, pipeline_path=None):
+    """Load the loose joblib model/scaler files as a ModelBundle.
+
+    A saved TaxFeaturePipeline is used when the model matches its feature
+    count; otherwise the scaler is required. The version is derived from the
+    files' contents, so it changes whenever they are retrained.
+    """
+    predictor = TaxPredictor()
+    predictor.load_model(model_path)
+    if pipeline_path and os.path.exists(pipeline_path):
+        feature_pipeline = TaxFeaturePipeline.load(pipeline_path)
+        if getattr(predictor.model, 'n_features_in_', None) == len(feature_pipeline.feature_names):
+            return ModelBundle.from_estimators(predictor.model, feature_pipeline=feature_pipeline,
+                                               version=_legacy_version(model_path, pipeline_path),
+                                               path=model_path)
+    processor = DataProcessor()
+    processor.load_scaler(scaler_path)
+    return ModelBundle.from_estimators(predictor.model, scaler=processor.scaler,
+                                       version=_legacy_version(model_path, scaler_path),
+                                       path=model_path)
+
+
+def _legacy_version(*paths):
+    """Version of loose artifacts derived from their contents."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return f'legacy-{digest.hexdigest()[:12]}'
+
+
+def _read_releases(root):
+    try:
+        with open(os.path.join(root, RELEASES_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def current_version(root=DEFAULT_BUNDLE_ROOT):
+    """Name of the published bundle, or None."""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _point_current(root, version):
+    tmp = os.path.join(root, f'.{CURRENT_POINTER}.{uuid.uuid4().hex}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(root, CURRENT_POINTER))
+
+
+def publish(root, version, validate=True):
+    """Atomically point CURRENT at a bundle version and push it on the release history."""
+    path = os.path.join(root, version)
+    if validate:
+        load_bundle(path)
+    _point_current(root, version)
+    releases = _read_releases(root)
+    releases.append({'version': version, 'published_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+    _write_json(os.path.join(root, RELEASES_FILE), releases)
+    return path
+
+
+def rollback(root=DEFAULT_BUNDLE_ROOT):
+    """Pop the current release and re-publish the one before it.
+
+    releases.json is a stack: rolling back does not add an entry, so
+    repeated rollbacks keep walking back through the history.
+    """
+    current = current_version(root)
+    releases = _read_releases(root)
+    while releases and releases[-1]['version'] == current:
+        releases.pop()
+    if not releases:
+        raise ValueError("No earlier bundle to roll back to")
+    version = releases[-1]['version']
+    path = os.path.join(root, version)
+    load_bundle(path)
+    _point_current(root, version)
+    _write_json(os.path.join(root, RELEASES_FILE), releases)
+    return path
+
+
+def load_current(root=DEFAULT_BUNDLE_ROOT, mmap=True):
+    """Load the published bundle."""
+    version = current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No bundle published under {root}")
+    return load_bundle(os.path.join(root, version), mmap=mmap)
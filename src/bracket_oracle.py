@@ -0,0 +1,238 @@
+"""Differential testing of the fast bracket paths against the reference walk.
+
+Random tax tables and returns are generated, every fast implementation is
+evaluated on them, and each result is compared with a plain-Python port of
+the original `calculate_tax` loop:
+
+    python -m src.bracket_oracle --cases 2000000 --seed 7
+
+The exit status is 1 if any implementation differs by a cent or more.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    from .tax_calculator import FILING_STATUSES, MultiYearTaxCalculator, TaxCalculator, _taxable
+except ImportError:
+    from tax_calculator import FILING_STATUSES, MultiYearTaxCalculator, TaxCalculator, _taxable
+
+TOLERANCE = 0.01
+# Statuses that may be missing from a generated table, plus empty and
+# missing ones as they appear in a pandas column with gaps
+EXTRA_STATUSES = ['qualifying_widow', '', None, float('nan')]
+TOP_BRACKET_END = 999999999
+
+
+def reference_tax(rows, income, deductions, filing_status='single'):
+    """Bracket walk exactly as `TaxCalculator.calculate_tax` first implemented it.
+
+    `rows` are (filing_status, bracket_start, bracket_end, tax_rate) tuples in
+    file order. Unknown statuses are taxed at 0.
+    """
+    taxable_income = max(0, income - deductions)
+    total_tax = 0
+    brackets = sorted((row for row in rows if row[0] == filing_status), key=lambda row: row[1])
+    for _, start, end, rate in brackets:
+        if taxable_income > start:
+            total_tax += min(taxable_income - start, end - start) * rate
+        else:
+            break
+    return total_tax
+
+
+def random_table(rng, max_brackets=8):
+    """Random tax table rows for a random subset of filing statuses.
+
+    Brackets are mostly contiguous from zero, but may start above zero, leave
+    gaps, overlap, repeat a start or have zero width. Rows are shuffled so the
+    sort by bracket_start is exercised too.
+    """
+    statuses = [s for s in FILING_STATUSES if rng.random() < 0.8] or [FILING_STATUSES[0]]
+    rows = []
+    for status in statuses:
+        n = int(rng.integers(1, max_brackets + 1))
+        start = 0.0 if rng.random() < 0.9 else float(rng.integers(1, 20000))
+        for i in range(n):
+            if i == n - 1 and rng.random() < 0.7:
+                end = float(TOP_BRACKET_END)
+            else:
+                width = float(rng.integers(0, 200000)) if rng.random() < 0.95 else 0.0
+                if rng.random() < 0.2:
+                    width += round(float(rng.random()), 2)
+                end = start + width
+            rate = round(float(rng.uniform(0, 0.5)), int(rng.integers(2, 5)))
+            rows.append((status, start, end, rate))
+            shape = rng.random()
+            if shape < 0.8:
+                start = end
+            elif shape < 0.9:
+                start = end + float(rng.integers(1, 10000))  # gap
+            elif shape < 0.95:
+                start = max(0.0, end - float(rng.integers(1, 10000)))  # overlap
+            # otherwise the next bracket repeats this start
+    order = rng.permutation(len(rows))
+    return [rows[i] for i in order]
+
+
+def write_table(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['filing_status', 'bracket_start', 'bracket_end', 'tax_rate'])
+        writer.writerows(rows)
+
+
+def random_returns(rng, rows, n):
+    """Incomes, deductions and statuses, biased towards bracket boundaries.
+
+    A few amounts are NaN, as blank cells of a pandas column would be.
+    """
+    bounds = np.array(sorted({row[1] for row in rows} | {row[2] for row in rows}))
+    deductions = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(0, 50000, n).round(2))
+    kind = rng.integers(0, 4, n)
+    uniform = rng.uniform(0, 1000000, n).round(2)
+    # Taxable income landing exactly on, or a cent either side of, a boundary
+    boundary = (bounds[rng.integers(0, len(bounds), n)] + deductions
+                + rng.choice([-0.01, 0.0, 0.01], n))
+    # Deductions larger than income
+    negative = rng.uniform(0, 1, n) * deductions
+    huge = rng.uniform(1e8, 2e9, n)
+    incomes = np.select([kind == 0, kind == 1, kind == 2], [uniform, boundary, negative], huge)
+    incomes[rng.random(n) < 0.02] = np.nan
+    deductions[rng.random(n) < 0.02] = np.nan
+    statuses = np.asarray(FILING_STATUSES + EXTRA_STATUSES, dtype=object)[
+        rng.integers(0, len(FILING_STATUSES) + len(EXTRA_STATUSES), n)]
+    return incomes, deductions, statuses
+
+
+def _scalar(calculator, incomes, deductions, statuses):
+    # calculate_tax prints a warning for every unknown status
+    with contextlib.redirect_stdout(io.StringIO()):
+        return np.array([calculator.calculate_tax(i, d, s)
+                         for i, d, s in zip(incomes, deductions, statuses)])
+
+
+def _batch(calculator, incomes, deductions, statuses):
+    return calculator.calculate_tax_batch(incomes, deductions, statuses)
+
+
+def _batch_per_status(calculator, incomes, deductions, statuses):
+    taxes = np.zeros(len(incomes))
+    for status in set(statuses):
+        mask = statuses == status
+        taxes[mask] = calculator.calculate_tax_batch(incomes[mask], deductions[mask], status)
+    return taxes
+
+
+def _schedules(calculator, incomes, deductions, statuses):
+    taxable = _taxable(incomes, deductions)
+    taxes = np.zeros(len(incomes))
+    for status, schedule in calculator.schedules.items():
+        mask = statuses == status
+        taxes[mask] = schedule.tax(taxable[mask])
+    return taxes
+
+
+def _multi_year(calculator, incomes, deductions, statuses):
+    # The same table registered under two years, so rows are regrouped by
+    # (year, status) without changing the expected tax
+    multi = MultiYearTaxCalculator.from_tables({2000: calculator._tables, 2001: calculator._tables},
+                                               validate=False)
+    years = 2000 + np.arange(len(incomes)) % 2
+    return multi.calculate_tax_batch(incomes, deductions, statuses, years)
+
+
+# name -> (fn(calculator, incomes, deductions, statuses), max cases per table).
+# The scalar path is sampled because it is evaluated one return at a time.
+IMPLEMENTATIONS = {
+    'calculate_tax': (_scalar, 50),
+    'calculate_tax_batch': (_batch, None),
+    'calculate_tax_batch[status]': (_batch_per_status, None),
+    'BracketSchedule.tax': (_schedules, None),
+    'MultiYearTaxCalculator': (_multi_year, None),
+}
+
+
+def check_table(rows, path, incomes, deductions, statuses, implementations=None,
+                tolerance=TOLERANCE):
+    """Compare each implementation with reference_tax on one table.
+
+    Returns a list of mismatches, one dict per differing case.
+    """
+    write_table(rows, path)
+    calculator = TaxCalculator(path)
+    expected = np.array([reference_tax(rows, i, d, s)
+                         for i, d, s in zip(incomes, deductions, statuses)])
+    mismatches = []
+    for name in implementations or IMPLEMENTATIONS:
+        fn, limit = IMPLEMENTATIONS[name]
+        n = len(incomes) if limit is None else min(limit, len(incomes))
+        actual = fn(calculator, incomes[:n], deductions[:n], statuses[:n])
+        for i in np.flatnonzero(~(np.abs(actual - expected[:n]) < tolerance)):
+            mismatches.append({'implementation': name, 'table': path, 'income': float(incomes[i]),
+                               'deductions': float(deductions[i]), 'filing_status': statuses[i],
+                               'expected': float(expected[i]), 'actual': float(actual[i])})
+    return mismatches
+
+
+def run_oracle(num_cases=100000, cases_per_table=2000, seed=None, implementations=None,
+               tolerance=TOLERANCE, workdir=None, log=None):
+    """Check num_cases random returns spread over freshly generated tables.
+
+    Returns {'cases', 'tables', 'mismatches'}. Tables with mismatches are
+    kept in workdir for reproduction.
+    """
+    rng = np.random.default_rng(seed)
+    cleanup = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='taxsense-oracle-')
+    checked = tables = 0
+    mismatches = []
+    start = time.perf_counter()
+    while checked < num_cases:
+        n = min(cases_per_table, num_cases - checked)
+        rows = random_table(rng)
+        # A fresh name per table: the tables cache keys on path and mtime
+        path = os.path.join(workdir, f'tax_tables_{tables:06d}.csv')
+        found = check_table(rows, path, *random_returns(rng, rows, n),
+                            implementations=implementations, tolerance=tolerance)
+        if found:
+            mismatches.extend(found)
+        else:
+            os.remove(path)
+        checked += n
+        tables += 1
+        if log and tables % 100 == 0:
+            log(f"{checked:>12,} cases  {tables:>7,} tables  {len(mismatches):>6} mismatches  "
+                f"{time.perf_counter() - start:>7.1f}s")
+    if cleanup and not mismatches:
+        os.rmdir(workdir)
+    return {'cases': checked, 'tables': tables, 'mismatches': mismatches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check fast tax paths against the reference")
+    parser.add_argument('--cases', type=int, default=1000000)
+    parser.add_argument('--cases-per-table', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--implementations', nargs='*', choices=sorted(IMPLEMENTATIONS))
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    result = run_oracle(args.cases, args.cases_per_table, args.seed, args.implementations,
+                        args.tolerance, log=print)
+    for mismatch in result['mismatches'][:20]:
+        print(f"MISMATCH {mismatch}")
+    print(f"{result['cases']:,} cases over {result['tables']:,} tables: "
+          f"{len(result['mismatches'])} mismatches")
+    return 1 if result['mismatches'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Chunked scoring of uploaded client lists (CSV, Excel or Parquet)."""
+import io
+import os
+import pickle
+import tempfile
+import uuid
+import weakref
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_processing import DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, DataProcessor, file_format_for
+except ImportError:
+    from data_processing import DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, DataProcessor, file_format_for
+
+UPLOAD_TYPES = ['csv', 'xlsx', 'parquet']
+COUNT_BLOCK_SIZE = 1 << 20
+
+
+def count_rows(source, file_format):
+    """Number of data rows in an uploaded file, or None if it is not cheap to tell."""
+    if file_format == 'parquet':
+        from pyarrow.parquet import ParquetFile
+        count = ParquetFile(source).metadata.num_rows
+    elif file_format == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(source, read_only=True)
+        try:
+            max_row = workbook.worksheets[0].max_row
+        finally:
+            workbook.close()
+        count = max_row - 1 if max_row else None
+    else:
+        # Count newlines block by block instead of copying the whole upload
+        source.seek(0)
+        count, last = 0, b'\n'
+        for block in iter(lambda: source.read(COUNT_BLOCK_SIZE), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+        count = count - 1 + (last != b'\n')
+    source.seek(0)
+    return max(count, 0) if count is not None else None
+
+
+def score_chunk(chunk, calculator, bundle=None):
+    """Add calculated_tax, and predicted_tax when a model bundle is given.
+
+    Bracket tax uses the values as given; the model sees missing incomes and
+    deductions filled with the chunk mean and median, as in
+    DataProcessor.preprocess_features.
+    """
+    missing = [col for col in FEATURE_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Uploaded data is missing columns: {missing}")
+    incomes = pd.to_numeric(chunk['income'], errors='coerce').to_numpy(dtype=np.float64)
+    deductions = pd.to_numeric(chunk['deductions'], errors='coerce').to_numpy(dtype=np.float64)
+    if 'filing_status' in chunk.columns:
+        statuses = chunk['filing_status'].fillna('single').astype(str).str.strip().to_numpy(dtype=object)
+    else:
+        statuses = 'single'
+
+    scored = chunk.copy()
+    scored['calculated_tax'] = calculator.calculate_tax_batch(incomes, deductions, statuses)
+    if bundle is not None:
+        scored['predicted_tax'] = _predict(bundle, _fill_missing(incomes, np.nanmean),
+                                           _fill_missing(deductions, np.nanmedian), statuses)
+    return scored
+
+
+def _predict(bundle, incomes, deductions, statuses):
+    try:
+        # Linear models skip sklearn's per-call input validation
+        return bundle.compile().predict(np.column_stack([incomes, deductions]))
+    except TypeError:
+        return bundle.predict(incomes, deductions, statuses)
+
+
+def _fill_missing(values, statistic):
+    missing = np.isnan(values)
+    if missing.all():
+        return np.zeros_like(values)
+    if missing.any():
+        return np.where(missing, statistic(values), values)
+    return values
+
+
+def score_upload(source, calculator, bundle=None, chunksize=DEFAULT_CHUNK_SIZE, file_format=None,
+                 progress=None):
+    """Yield scored chunks of an uploaded file.
+
+    source is a binary file object such as Streamlit's UploadedFile.
+    progress, if given, is called as progress(rows_done, total_rows) after
+    every chunk; total_rows is None when it cannot be determined up front.
+    """
+    file_format = file_format or file_format_for(getattr(source, 'name', ''))
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    total = count_rows(source, file_format) if progress is not None else None
+    done = 0
+    for chunk in DataProcessor().iter_chunks(source, chunksize, file_format):
+        scored = score_chunk(chunk, calculator, bundle)
+        done += len(scored)
+        if progress is not None:
+            progress(done, total)
+        yield scored
+
+
+def _remove_spool(path):
+    # Best effort: a failure here must not mask the error being handled
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def spool_chunks(chunks, preview_rows=100):
+    """Write DataFrame chunks to a temporary file as they arrive.
+
+    Returns (path, rows, preview) with the total row count and the first
+    preview_rows rows, holding only one chunk in memory at a time. Read the
+    chunks back with iter_spool; the caller deletes the file, or hands it to
+    a SpoolFile.
+    """
+    handle, path = tempfile.mkstemp(prefix='taxsense-scored-', suffix='.pkl')
+    rows, preview = 0, []
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            for chunk in chunks:
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                if rows < preview_rows:
+                    preview.append(chunk.head(preview_rows - rows))
+                rows += len(chunk)
+    except BaseException:
+        _remove_spool(path)
+        raise
+    return path, rows, pd.concat(preview, ignore_index=True) if preview else pd.DataFrame()
+
+
+class SpoolFile:
+    """Owner of a spool file written by spool_chunks.
+
+    The file is deleted by remove(), when the object is garbage collected
+    (e.g. with the Streamlit session holding it), or at interpreter exit,
+    whichever comes first. token is unique per spool, unlike the path, which
+    the OS may reuse once the file is gone; key caches of its contents on it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.token = uuid.uuid4().hex
+        self._finalizer = weakref.finalize(self, _remove_spool, path)
+
+    def remove(self):
+        self._finalizer()
+
+    def exists(self):
+        return self._finalizer.alive and os.path.exists(self.path)
+
+
+def iter_spool(path):
+    """Yield the chunks written by spool_chunks."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
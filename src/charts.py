@@ -0,0 +1,55 @@
+"""Chart rendering for the app that bypasses pyplot's global figure manager.
+
+Figures are created with matplotlib.figure.Figure and rendered with the Agg
+canvas directly, so they are never registered with pyplot and are released
+as soon as the PNG bytes have been produced.
+"""
+import io
+
+BAR_COLORS = ['#0ea5e9', '#0d9488']
+TEXT_COLOR = '#0f172a'
+
+
+def comparison_figure(labels, values):
+    """Bar chart comparing tax amounts, styled like the app's light theme."""
+    import matplotlib.style
+    from matplotlib.figure import Figure
+
+    top = max(max(values), 0) or 1
+    # Scoped to this figure, unlike plt.style.use which changes global rcParams
+    with matplotlib.style.context('default'):
+        fig = Figure(figsize=(6, 4), facecolor='#ffffff')
+        ax = fig.add_subplot()
+        ax.set_facecolor('#ffffff')
+        ax.bar(labels, values, color=BAR_COLORS[:len(values)])
+
+        ax.set_ylabel('Tax Amount ($)', fontsize=12, color=TEXT_COLOR)
+        ax.set_title('Tax Calculation Comparison', fontsize=14, pad=15, color=TEXT_COLOR)
+        ax.set_ylim(0, top * 1.2)
+        ax.tick_params(colors='#1e293b')
+        ax.spines['bottom'].set_color('#e2e8f0')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_color('#e2e8f0')
+        ax.grid(axis='y', linestyle='--', alpha=0.2, color='#94a3b8')
+
+        for i, value in enumerate(values):
+            ax.text(i, value + top * 0.05, f'${value:,.2f}', ha='center', fontsize=10,
+                    color=TEXT_COLOR)
+        fig.tight_layout()
+    return fig
+
+
+def render_png(fig, dpi=100):
+    """Render a Figure to PNG bytes with Agg and free its artists."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', dpi=dpi)
+    finally:
+        fig.clear()
+    return buffer.getvalue()
+
+
+def comparison_png(labels, values, dpi=100):
+    """PNG bytes of the tax comparison bar chart."""
+    return render_png(comparison_figure(list(labels), list(values)), dpi=dpi)
@@ -1,22 +1,139 @@
+import logging
+import time
+
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 from joblib import dump, load
 
+try:
+    from .instrumentation import hooks as default_hooks, timed
+    from .tax_tables import BracketSchedule
+except ImportError:
+    from instrumentation import hooks as default_hooks, timed
+    from tax_tables import BracketSchedule
+
+FEATURE_COLUMNS = ['income', 'deductions']
+DEFAULT_CHUNK_SIZE = 100_000
+
+logger = logging.getLogger(__name__)
+
+
+def _import_parquet():
+    """Import pyarrow.parquet, which is only needed for Parquet input/output."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet support requires pyarrow (pip install pyarrow)") from e
+    return pq
+
+
+def _parquet_schema(table):
+    """Schema for every chunk of a scored Parquet file, from the first chunk's.
+
+    Later chunks may infer other types for a column: integers turn into floats
+    once a chunk has a gap, and a column that is empty throughout the first
+    chunk has no real type yet. Integers and empty feature columns are
+    widened to float64, and other empty columns to string.
+    """
+    import pyarrow as pa
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        empty = column.null_count == len(column)
+        if pa.types.is_integer(field.type) or (empty and field.name in FEATURE_COLUMNS):
+            field = field.with_type(pa.float64())
+        elif empty:
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def file_format_for(name):
+    """Input format implied by a file name: 'parquet', 'xlsx' or 'csv'."""
+    name = str(name).lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith(('.xlsx', '.xlsm')):
+        return 'xlsx'
+    return 'csv'
+
+
+def _iter_excel_chunks(source, chunksize):
+    """Stream the first worksheet in row chunks using openpyxl's read-only mode."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() for name in header]
+        width = len(columns)
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:width] + (None,) * (width - len(row)))
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
 class DataProcessor:
-    def __init__(self):
-        """Initialize the data processor with a scaler."""
+    def __init__(self, hooks=None):
+        """Initialize the data processor with a scaler.
+
+        hooks are optional callbacks invoked as hook(event, rows, seconds)
+        after each instrumented step. Timing is only measured when a hook is
+        registered or DEBUG logging is enabled for this module; with
+        TAXSENSE_METRICS set, every processor reports to the metrics registry.
+        """
         self.scaler = StandardScaler()
+        self.hooks = list(hooks or []) + default_hooks()
+
+    def add_hook(self, hook):
+        """Register an instrumentation callback."""
+        self.hooks.append(hook)
+
+    def _instrumented(self):
+        return bool(self.hooks) or logger.isEnabledFor(logging.DEBUG)
+
+    def _emit(self, event, rows, start):
+        """Report a finished step to the logger and registered hooks."""
+        seconds = time.perf_counter() - start
+        logger.debug("%s: %d rows in %.3f ms", event, rows, seconds * 1000)
+        for hook in self.hooks:
+            hook(event, rows, seconds)
     
     def load_data(self, filepath):
         """Load data from CSV file."""
         return pd.read_csv(filepath)
+
+    def iter_chunks(self, filepath, chunksize=DEFAULT_CHUNK_SIZE, file_format=None):
+        """Yield DataFrames of at most chunksize rows from a CSV, Parquet or Excel file.
+
+        filepath may also be a binary file object, in which case file_format
+        ('csv', 'parquet' or 'xlsx') is taken from its name when not given.
+        """
+        file_format = file_format or file_format_for(getattr(filepath, 'name', filepath))
+        if file_format == 'parquet':
+            parquet_file = _import_parquet().ParquetFile(filepath)
+            for batch in parquet_file.iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        elif file_format == 'xlsx':
+            yield from _iter_excel_chunks(filepath, chunksize)
+        else:
+            yield from pd.read_csv(filepath, chunksize=chunksize)
     
     def preprocess_features(self, df):
         """Preprocess features for model training/prediction."""
+        start = time.perf_counter() if self._instrumented() else None
         # Ensure required columns exist
-        required_cols = ['income', 'deductions']
+        required_cols = FEATURE_COLUMNS
         if not all(col in df.columns for col in required_cols):
             raise ValueError(f"Data must contain columns: {required_cols}")
         
@@ -26,15 +143,74 @@ class DataProcessor:
             'deductions': df['deductions'].median()
         })
         
-        # Debug: Show raw and scaled values
-        print("Raw input values:", df[required_cols].values)
         features = df[required_cols]
         scaled_features = self.scaler.transform(features)  # Use loaded scaler
-        print("Scaled input values:", scaled_features)
+        if start is not None:
+            self._emit('preprocess_features', len(df), start)
         return pd.DataFrame(scaled_features, columns=required_cols)
     
+    def score_chunk(self, df, predictor, calculator):
+        """Add ML-predicted and bracket-calculated tax columns to one chunk.
+
+        Missing values are filled per chunk, so streamed results can differ
+        slightly from scoring the whole file at once when inputs have gaps.
+        """
+        start = time.perf_counter() if self._instrumented() else None
+        features = self.preprocess_features(df).values
+        statuses = df['filing_status'] if 'filing_status' in df.columns else 'single'
+        scored = df.copy()
+        scored['predicted_tax'] = predictor.predict_tax(features)
+        scored['calculated_tax'] = calculator.calculate_tax_batch(
+            df['income'].to_numpy(), df['deductions'].to_numpy(), statuses)
+        if start is not None:
+            self._emit('score_chunk', len(df), start)
+        return scored
+
+    def score_file(self, input_path, output_path, predictor, calculator,
+                   chunksize=DEFAULT_CHUNK_SIZE):
+        """Score a CSV/Parquet file chunk by chunk, appending results to output_path.
+
+        Only one chunk is held in memory at a time. The output format follows
+        the output_path extension (.parquet, otherwise CSV). Returns the number
+        of rows written.
+        """
+        to_parquet = str(output_path).endswith('.parquet')
+        writer = None
+        rows = 0
+        columns = list(FEATURE_COLUMNS)
+        try:
+            for chunk in self.iter_chunks(input_path, chunksize):
+                if chunk.empty:
+                    columns = list(chunk.columns)
+                    continue
+                scored = self.score_chunk(chunk, predictor, calculator)
+                if to_parquet:
+                    import pyarrow as pa
+                    table = pa.Table.from_pandas(scored, preserve_index=False)
+                    if writer is None:
+                        writer = _import_parquet().ParquetWriter(output_path,
+                                                                 _parquet_schema(table))
+                    writer.write_table(table.cast(writer.schema))
+                else:
+                    scored.to_csv(output_path, mode='w' if rows == 0 else 'a',
+                                  header=rows == 0, index=False)
+                rows += len(scored)
+            if rows == 0:
+                # No rows to score: still write a file with the scored columns
+                empty = pd.DataFrame(columns=columns + ['predicted_tax', 'calculated_tax'],
+                                     dtype=np.float64)
+                if to_parquet:
+                    empty.to_parquet(output_path, index=False)
+                else:
+                    empty.to_csv(output_path, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
     def prepare_training_data(self, filepath, test_size=0.2, random_state=42):
         """Load, preprocess, and split data for training."""
+        from sklearn.model_selection import train_test_split
         df = self.load_data(filepath)
         X = self.preprocess_features(df)
         y = df['tax_liability']
@@ -44,8 +220,120 @@ class DataProcessor:
         """Save the fitted scaler for later use."""
         dump(self.scaler, filepath)
     
+    @timed('load_scaler')
     def load_scaler(self, filepath):
         """Load a previously fitted scaler."""
-        from joblib import load
         self.scaler = load(filepath)
-        print("Scaler loaded with mean:", self.scaler.mean_, "scale:", self.scaler.scale_)  # Debug
+        logger.debug("Scaler loaded with mean: %s scale: %s", self.scaler.mean_, self.scaler.scale_)
+
+
+class TaxFeaturePipeline:
+    """Fitted feature transform that uses filing status and bracket position.
+
+    Produces scaled income, deductions and distance to the next bracket
+    threshold, the marginal rate, and a one-hot encoding of filing status.
+    The bracket tables are copied in at construction, so a saved pipeline is
+    a single self-contained artifact used identically in training and serving.
+    """
+
+    NUMERIC_COLUMNS = ['income', 'deductions', 'distance_to_next_bracket']
+    ARTIFACT_VERSION = 1
+
+    def __init__(self, schedules):
+        """Build from {filing_status: BracketSchedule or (starts, ends, rates)}."""
+        self.brackets = {status: schedule if isinstance(schedule, BracketSchedule)
+                         else BracketSchedule(status, *schedule)
+                         for status, schedule in schedules.items()}
+        self.statuses = list(self.brackets)
+        self.scaler = StandardScaler()
+        self.fill_values = None
+
+    @classmethod
+    def from_calculator(cls, calculator):
+        return cls(calculator.schedules)
+
+    @property
+    def feature_names(self):
+        return (self.NUMERIC_COLUMNS + ['marginal_rate']
+                + [f'status_{status}' for status in self.statuses])
+
+    def bracket_features(self, incomes, deductions, statuses):
+        """Vectorized marginal rate and distance to the next bracket threshold."""
+        taxable = np.maximum(0, np.asarray(incomes, dtype=np.float64)
+                             - np.asarray(deductions, dtype=np.float64))
+        statuses = np.broadcast_to(np.asarray(statuses, dtype=object), taxable.shape)
+        marginal_rate = np.zeros(taxable.shape)
+        distance = np.zeros(taxable.shape)
+        for status, schedule in self.brackets.items():
+            mask = statuses == status
+            if mask.any():
+                marginal_rate[mask] = schedule.marginal_rate(taxable[mask])
+                distance[mask] = schedule.distance_to_next(taxable[mask])
+        return marginal_rate, distance
+
+    def _numeric_block(self, incomes, deductions, statuses):
+        marginal_rate, distance = self.bracket_features(incomes, deductions, statuses)
+        return np.column_stack([incomes, deductions, distance]), marginal_rate
+
+    def _columns(self, df):
+        if not all(col in df.columns for col in FEATURE_COLUMNS):
+            raise ValueError(f"Data must contain columns: {FEATURE_COLUMNS}")
+        incomes = df['income'].to_numpy(dtype=np.float64)
+        deductions = df['deductions'].to_numpy(dtype=np.float64)
+        statuses = (df['filing_status'].to_numpy(dtype=object)
+                    if 'filing_status' in df.columns else 'single')
+        return incomes, deductions, statuses
+
+    def fit(self, df):
+        """Fit missing-value fills and the scaler on training data."""
+        incomes, deductions, statuses = self._columns(df)
+        self.fill_values = (float(np.nanmean(incomes)), float(np.nanmedian(deductions)))
+        incomes, deductions = self._fill(incomes, deductions)
+        numeric, _ = self._numeric_block(incomes, deductions, statuses)
+        self.scaler.fit(numeric)
+        return self
+
+    def _fill(self, incomes, deductions):
+        income_fill, deduction_fill = self.fill_values
+        return (np.where(np.isnan(incomes), income_fill, incomes),
+                np.where(np.isnan(deductions), deduction_fill, deductions))
+
+    @timed('feature_pipeline_transform', rows_arg=1)
+    def transform_arrays(self, incomes, deductions, statuses='single'):
+        """Transform raw arrays into model features without building a DataFrame."""
+        if self.fill_values is None:
+            raise ValueError("TaxFeaturePipeline must be fitted before transform")
+        incomes, deductions = self._fill(np.asarray(incomes, dtype=np.float64),
+                                         np.asarray(deductions, dtype=np.float64))
+        numeric, marginal_rate = self._numeric_block(incomes, deductions, statuses)
+        statuses = np.broadcast_to(np.asarray(statuses, dtype=object), incomes.shape)
+        one_hot = np.column_stack([statuses == status for status in self.statuses])
+        return np.column_stack([self.scaler.transform(numeric), marginal_rate,
+                                one_hot.astype(np.float64)])
+
+    def transform(self, df):
+        return self.transform_arrays(*self._columns(df))
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def save(self, filepath):
+        """Save the fitted pipeline as a single artifact of plain data."""
+        dump({
+            'version': self.ARTIFACT_VERSION,
+            'brackets': {status: (schedule.starts, schedule.ends, schedule.rates)
+                         for status, schedule in self.brackets.items()},
+            'scaler': self.scaler,
+            'fill_values': self.fill_values,
+        }, filepath)
+
+    @classmethod
+    @timed('load_feature_pipeline')
+    def load(cls, filepath):
+        state = load(filepath)
+        if state.get('version') != cls.ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported feature pipeline version: {state.get('version')}")
+        pipeline = cls(state['brackets'])
+        pipeline.scaler = state['scaler']
+        pipeline.fill_values = state['fill_values']
+        return pipeline
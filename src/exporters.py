@@ -0,0 +1,132 @@
+"""Export of result DataFrames to CSV, Parquet, Arrow IPC and Excel.
+
+Every format can be written from an iterable of DataFrame chunks, so large
+batch results are streamed to the output instead of being copied into one
+big intermediate. Excel uses openpyxl's write-only mode, which keeps memory
+flat regardless of the number of rows.
+"""
+import io
+
+# format -> (label, MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv', 'csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('Arrow IPC', 'application/vnd.apache.arrow.file', 'arrow'),
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+# A worksheet could hold 1,048,575 data rows, but building and opening one
+# that large takes minutes; bigger results are offered as CSV or Parquet
+EXCEL_MAX_ROWS = 100_000
+
+
+def _arrow_table(chunk):
+    import pyarrow as pa
+    return pa.Table.from_pandas(chunk, preserve_index=False)
+
+
+def _arrow_tables(chunks):
+    # Streamed chunks can disagree on a column's type, e.g. a text column
+    # that is empty (float NaN) in one CSV chunk; follow the first chunk
+    schema = None
+    for chunk in chunks:
+        table = _arrow_table(chunk)
+        if schema is None:
+            schema = table.schema
+        elif not table.schema.equals(schema):
+            table = table.cast(schema)
+        yield table
+
+
+def _write_csv(chunks, sink):
+    header = True
+    for chunk in chunks:
+        sink.write(chunk.to_csv(index=False, header=header).encode())
+        header = False
+
+
+def _write_parquet(chunks, sink):
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for table in _arrow_tables(chunks):
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_arrow(chunks, sink):
+    import pyarrow as pa
+    writer = None
+    try:
+        for table in _arrow_tables(chunks):
+            if writer is None:
+                writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_excel(chunks, sink, sheet_name='Tax Results'):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    rows = 0
+    try:
+        for chunk in chunks:
+            if rows == 0:
+                sheet.append([str(column) for column in chunk.columns])
+            rows += len(chunk)
+            if rows > EXCEL_MAX_ROWS:
+                raise ValueError(f"Excel export is limited to {EXCEL_MAX_ROWS:,} rows; "
+                                 "export larger results as CSV or Parquet")
+            # NaN would be written as a #NUM! error, so leave those cells empty
+            values = chunk.astype(object).where(chunk.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                sheet.append(row)
+    except BaseException:
+        # Release the worksheet's temporary file
+        sheet.close()
+        raise
+    workbook.save(sink)
+
+
+_WRITERS = {'csv': _write_csv, 'parquet': _write_parquet, 'arrow': _write_arrow, 'xlsx': _write_excel}
+
+
+def write_export(chunks, file_format, sink):
+    """Write an iterable of DataFrame chunks to a binary file object or path."""
+    if file_format not in _WRITERS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    if hasattr(chunks, 'columns'):
+        chunks = [chunks]
+    if isinstance(sink, str):
+        with open(sink, 'wb') as f:
+            _WRITERS[file_format](chunks, f)
+    else:
+        _WRITERS[file_format](chunks, sink)
+
+
+def export_bytes(df, file_format, chunksize=50_000):
+    """Serialize a DataFrame to bytes in file_format, streaming it in chunks."""
+    buffer = io.BytesIO()
+    chunks = (df.iloc[start:start + chunksize] for start in range(0, max(len(df), 1), chunksize))
+    write_export(chunks, file_format, buffer)
+    return buffer.getvalue()
+
+
+def file_name(stem, file_format):
+    return f'{stem}.{EXPORT_FORMATS[file_format][2]}'
+
+
+def mime_type(file_format):
+    return EXPORT_FORMATS[file_format][1]
+
+
+def can_export(rows, file_format):
+    """Whether a result of this many rows can be exported in file_format."""
+    return file_format != 'xlsx' or rows <= EXCEL_MAX_ROWS
+
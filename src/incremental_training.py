@@ -0,0 +1,236 @@
+"""Out-of-core training of the linear tax model.
+
+Training data is streamed in chunks from disk or from the synthetic
+generator, so the corpus never has to fit in memory:
+
+- the StandardScaler is updated with partial_fit;
+- method='closed_form' accumulates centred sufficient statistics (X'X, X'y)
+  in a single pass and solves the ridge regression exactly at the end;
+- method='sgd' makes one pass for the scaler and then trains an
+  SGDRegressor with partial_fit for a number of epochs;
+- a deterministic hash of each row's features holds out validation rows, so
+  the split does not depend on chunk boundaries and needs no index.
+
+Sources are callables returning a fresh iterator of DataFrames, because the
+SGD method and the final evaluation read the data more than once.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_processing import DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, DataProcessor
+    from .ml_models import TaxPredictor
+except ImportError:
+    from data_processing import DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, DataProcessor
+    from ml_models import TaxPredictor
+
+TARGET_COLUMN = 'tax_liability'
+METHODS = ('closed_form', 'sgd')
+_HASH_BUCKETS = 10000
+
+
+def synthetic_source(calculator, num_samples, chunk_size=DEFAULT_CHUNK_SIZE, random_state=0):
+    """Re-iterable source of synthetic training chunks."""
+    return lambda: calculator.iter_training_data(num_samples, chunk_size, random_state)
+
+
+def file_source(path, chunksize=DEFAULT_CHUNK_SIZE):
+    """Re-iterable source of chunks from a CSV or Parquet file."""
+    return lambda: DataProcessor().iter_chunks(path, chunksize)
+
+
+def validation_mask(chunk, fraction, salt=0):
+    """Rows held out for validation, chosen by hashing their feature values.
+
+    The same row always lands on the same side of the split, whichever chunk
+    it arrives in.
+    """
+    if fraction <= 0:
+        return np.zeros(len(chunk), dtype=bool)
+    hashes = pd.util.hash_pandas_object(chunk[FEATURE_COLUMNS], index=False,
+                                        hash_key=f'taxsense{salt:08d}'[:16]).to_numpy()
+    return hashes % _HASH_BUCKETS < fraction * _HASH_BUCKETS
+
+
+def _arrays(chunk):
+    """Feature matrix and target of a chunk, without rows that have gaps."""
+    X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    complete = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    return X[complete], y[complete]
+
+
+class LinearStats:
+    """Running means and centred cross-products of (X, y).
+
+    Chunks are merged with Chan et al.'s pairwise update, which stays
+    accurate for large row counts where raw sums of squares would not.
+    """
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.cxx = np.zeros((n_features, n_features))
+        self.cxy = np.zeros(n_features)
+
+    def update(self, X, y):
+        n_b = len(y)
+        if n_b == 0:
+            return self
+        mean_xb, mean_yb = X.mean(axis=0), y.mean()
+        xc, yc = X - mean_xb, y - mean_yb
+        n = self.n + n_b
+        delta_x, delta_y = mean_xb - self.mean_x, mean_yb - self.mean_y
+        weight = self.n * n_b / n
+        self.cxx += xc.T @ xc + np.outer(delta_x, delta_x) * weight
+        self.cxy += xc.T @ yc + delta_x * delta_y * weight
+        self.mean_x += delta_x * n_b / n
+        self.mean_y += delta_y * n_b / n
+        self.n = n
+        return self
+
+    def solve(self, scale, alpha=1.0):
+        """Ridge coefficients for standardized features, and the intercept.
+
+        Matches fitting sklearn's Ridge(alpha) on StandardScaler output.
+        """
+        gram = self.cxx / np.outer(scale, scale) + alpha * np.eye(len(scale))
+        coef = np.linalg.solve(gram, self.cxy / scale)
+        return coef, self.mean_y
+
+
+def _fit_scaler(processor, X):
+    # Fitted on named columns so preprocess_features can use the scaler later
+    processor.scaler.partial_fit(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+
+
+def _scale(processor, X):
+    return (X - processor.scaler.mean_) / processor.scaler.scale_
+
+
+def _linear_model(coef, intercept, alpha):
+    """A fitted sklearn linear model holding the given coefficients."""
+    if alpha:
+        from sklearn.linear_model import Ridge
+        model = Ridge(alpha=alpha)
+    else:
+        from sklearn.linear_model import LinearRegression
+        model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = len(model.coef_)
+    return model
+
+
+def _fit_closed_form(source, processor, validation_fraction, alpha, salt):
+    stats = LinearStats(len(FEATURE_COLUMNS))
+    for chunk in source():
+        X, y = _arrays(chunk[~validation_mask(chunk, validation_fraction, salt)])
+        if len(y):
+            _fit_scaler(processor, X)
+            stats.update(X, y)
+    if stats.n == 0:
+        raise ValueError("No complete training rows")
+    coef, intercept = stats.solve(processor.scaler.scale_, alpha)
+    return _linear_model(coef, intercept, alpha), stats.n
+
+
+def _fit_sgd(source, processor, validation_fraction, alpha, salt, epochs, random_state):
+    from sklearn.linear_model import SGDRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    # First pass: feature and target statistics
+    target_scaler = StandardScaler()
+    rows = 0
+    for chunk in source():
+        X, y = _arrays(chunk[~validation_mask(chunk, validation_fraction, salt)])
+        if len(y):
+            _fit_scaler(processor, X)
+            target_scaler.partial_fit(y[:, None])
+        rows += len(y)
+    if rows == 0:
+        raise ValueError("No complete training rows")
+
+    # SGD on a standardized target, so the step size does not depend on dollars
+    rng = np.random.default_rng(random_state)
+    sgd = SGDRegressor(alpha=alpha / rows, random_state=random_state)
+    y_mean, y_scale = target_scaler.mean_[0], target_scaler.scale_[0]
+    for _ in range(epochs):
+        for chunk in source():
+            X, y = _arrays(chunk[~validation_mask(chunk, validation_fraction, salt)])
+            if len(y):
+                order = rng.permutation(len(y))
+                sgd.partial_fit(_scale(processor, X[order]), (y[order] - y_mean) / y_scale)
+    model = _linear_model(sgd.coef_ * y_scale, sgd.intercept_[0] * y_scale + y_mean, alpha)
+    return model, rows * epochs
+
+
+def evaluate_stream(source, predictor, processor, validation_fraction=0.2, salt=0):
+    """Stream MAE and RMSE for the training and validation sides of the split.
+
+    Rows with a missing feature or target are counted as 'skipped_rows'.
+    """
+    totals = {'train': [0, 0.0, 0.0], 'validation': [0, 0.0, 0.0]}
+    skipped = 0
+    for chunk in source():
+        held_out = validation_mask(chunk, validation_fraction, salt)
+        skipped += int(chunk[FEATURE_COLUMNS + [TARGET_COLUMN]].isna().any(axis=1).sum())
+        for name, part in (('train', chunk[~held_out]), ('validation', chunk[held_out])):
+            X, y = _arrays(part)
+            if len(y):
+                errors = predictor.predict_tax(_scale(processor, X)) - y
+                total = totals[name]
+                total[0] += len(y)
+                total[1] += np.abs(errors).sum()
+                total[2] += (errors ** 2).sum()
+    metrics = {'skipped_rows': skipped}
+    for name, (n, abs_sum, sq_sum) in totals.items():
+        metrics[f'{name}_rows'] = n
+        if n:
+            metrics[f'{name}_mae'] = float(abs_sum / n)
+            metrics[f'{name}_rmse'] = float(np.sqrt(sq_sum / n))
+    return metrics
+
+
+def train_incremental(source, method='closed_form', alpha=1.0, validation_fraction=0.2,
+                      epochs=5, random_state=0, track_memory=True):
+    """Train a linear model on a streamed source.
+
+    Returns (predictor, processor, report). The report holds training
+    throughput ('rows_per_sec', counting every row seen by the optimizer),
+    'peak_memory_mb' as traced by tracemalloc (None when track_memory is
+    False), rows skipped because of missing values, and streamed train and
+    validation MAE/RMSE.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; choose from {METHODS}")
+    processor = DataProcessor()
+    tracing = track_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif track_memory:
+        tracemalloc.reset_peak()
+    try:
+        start = time.perf_counter()
+        if method == 'closed_form':
+            model, rows = _fit_closed_form(source, processor, validation_fraction, alpha,
+                                           random_state)
+        else:
+            model, rows = _fit_sgd(source, processor, validation_fraction, alpha, random_state,
+                                   epochs, random_state)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if track_memory else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    predictor = TaxPredictor()
+    predictor.model = model
+    report = {'method': method, 'fit_seconds': seconds, 'rows_per_sec': rows / seconds,
+              'peak_memory_mb': peak}
+    report.update(evaluate_stream(source, predictor, processor, validation_fraction, random_state))
+    return predictor, processor, report
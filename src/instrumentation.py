@@ -0,0 +1,263 @@
+"""Opt-in timers, counters and profiling for the hot paths.
+
+Nothing is measured unless an environment variable turns it on before the
+src modules are imported:
+
+    TAXSENSE_METRICS=1                     collect (served by the HTTP service at /metrics)
+    TAXSENSE_METRICS=metrics.json          ... and write them as JSON at exit
+    TAXSENSE_METRICS=metrics.prom          ... or in Prometheus text format
+    TAXSENSE_PROFILE=cprofile:run.pstats   cProfile the main thread
+    TAXSENSE_PROFILE=sample:run.folded     sample every thread's stack each
+                                           TAXSENSE_PROFILE_INTERVAL seconds (0.005)
+
+When metrics are disabled, `timed` returns the decorated function itself
+and `timer` a shared no-op context, so instrumented code runs exactly as
+before. Sampled stacks are written in the folded format read by
+flamegraph.pl and speedscope.
+"""
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+METRICS_ENV = 'TAXSENSE_METRICS'
+PROFILE_ENV = 'TAXSENSE_PROFILE'
+PROFILE_INTERVAL_ENV = 'TAXSENSE_PROFILE_INTERVAL'
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metrics:
+    """Thread-safe latency histograms and row counts per operation, plus counters."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._counters = {}
+
+    def observe(self, operation, seconds, rows=None):
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0,
+                    'buckets': [0] * len(self.buckets)}
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if rows is not None:
+                stats['rows'] += rows
+            stats['buckets'][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, operation, rows=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - start, rows)
+
+    def snapshot(self):
+        """Plain-dict copy of all metrics, as written to JSON."""
+        with self._lock:
+            operations = {name: dict(stats, buckets=list(stats['buckets']))
+                          for name, stats in self._operations.items()}
+            counters = dict(self._counters)
+        for stats in operations.values():
+            stats['mean_ms'] = stats['seconds'] / stats['count'] * 1000
+            stats['buckets'] = {_bound(le): n for le, n in zip(self.buckets, stats['buckets'])}
+        return {'operations': operations, 'counters': counters}
+
+    def to_prometheus(self, prefix='taxsense'):
+        snapshot = self.snapshot()
+        lines = [f'# HELP {prefix}_operation_seconds Time spent in instrumented operations.',
+                 f'# TYPE {prefix}_operation_seconds histogram']
+        for name, stats in sorted(snapshot['operations'].items()):
+            label = _escape(name)
+            cumulative = 0
+            for le, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(f'{prefix}_operation_seconds_bucket{{operation="{label}",le="{le}"}} '
+                             f'{cumulative}')
+            lines.append(f'{prefix}_operation_seconds_sum{{operation="{label}"}} {stats["seconds"]!r}')
+            lines.append(f'{prefix}_operation_seconds_count{{operation="{label}"}} {stats["count"]}')
+        lines += [f'# HELP {prefix}_operation_rows_total Rows processed by instrumented operations.',
+                  f'# TYPE {prefix}_operation_rows_total counter']
+        for name, stats in sorted(snapshot['operations'].items()):
+            lines.append(f'{prefix}_operation_rows_total{{operation="{_escape(name)}"}} {stats["rows"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = f'{prefix}_{_metric_name(name)}_total'
+            lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write to path, as Prometheus text for .prom/.txt and JSON otherwise."""
+        if path.endswith(('.prom', '.txt')):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+def _bound(le):
+    return '+Inf' if le == float('inf') else repr(le)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+class SamplingProfiler:
+    """Count the stacks of all other threads every interval seconds."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='taxsense-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def _start_profiler(setting):
+    mode, _, path = setting.partition(':')
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def finish():
+            profiler.disable()
+            profiler.dump_stats(path or 'taxsense.pstats')
+    elif mode == 'sample':
+        profiler = SamplingProfiler(float(os.environ.get(PROFILE_INTERVAL_ENV, 0.005))).start()
+
+        def finish():
+            profiler.stop()
+            profiler.write(path or 'taxsense.folded')
+    else:
+        raise ValueError(f"{PROFILE_ENV} must be cprofile:<path> or sample:<path>, not {setting!r}")
+    _at_exit(finish)
+    return profiler
+
+
+def _at_exit(fn, *args):
+    """Run fn when this process exits, but not in multiprocessing workers.
+
+    Forked workers inherit the registration and spawned ones import this
+    module again; either way only the parent writes the output files.
+    """
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        return
+    pid = os.getpid()
+    atexit.register(lambda: os.getpid() == pid and fn(*args))
+
+
+def _setup():
+    metrics = profiler = None
+    target = os.environ.get(METRICS_ENV, '').strip()
+    if target and target.lower() not in ('0', 'false', 'no'):
+        metrics = Metrics()
+        if target.lower() not in ('1', 'true', 'yes'):
+            _at_exit(metrics.write, target)
+    setting = os.environ.get(PROFILE_ENV, '').strip()
+    if setting:
+        profiler = _start_profiler(setting)
+    return metrics, profiler
+
+
+METRICS, PROFILER = _setup()
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def enabled():
+    return METRICS is not None
+
+
+def timer(operation, rows=None):
+    """Context manager timing a block, or a no-op when metrics are disabled."""
+    return METRICS.timer(operation, rows) if METRICS is not None else _NULL_TIMER
+
+
+def record_hook(event, rows, seconds):
+    """DataProcessor hook that records its steps as operations."""
+    METRICS.observe(event, seconds, rows)
+
+
+def hooks():
+    """DataProcessor hooks to install by default: record_hook when enabled."""
+    return [record_hook] if METRICS is not None else []
+
+
+def _count(value):
+    try:
+        return len(value)
+    except TypeError:
+        return 1
+
+
+def timed(operation, rows_arg=None):
+    """Decorator recording the calls and latency of a function.
+
+    rows_arg is the index of a positional argument (self included) whose
+    length is counted as rows. With metrics disabled the function is
+    returned unchanged.
+    """
+    def decorate(fn):
+        if METRICS is None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rows = _count(args[rows_arg]) if rows_arg is not None and len(args) > rows_arg else None
+                METRICS.observe(operation, time.perf_counter() - start, rows)
+        return wrapper
+    return decorate
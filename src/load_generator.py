@@ -0,0 +1,107 @@
+"""Offline load generator for src/server.py.
+
+Start the server, then run for example:
+
+    python -m src.load_generator --requests 20000 --concurrency 64 --endpoint /calculate
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+STATUSES = ['single', 'married', 'head_of_household']
+
+
+async def _client(host, port, endpoint, payloads, latencies):
+    """Send payloads sequentially over one keep-alive connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for payload in payloads:
+            body = json.dumps(payload).encode()
+            request = (f"POST {endpoint} HTTP/1.1\r\nHost: {host}\r\n"
+                       "Content-Type: application/json\r\n"
+                       f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    status = int(status_line.split()[1])
+    if status != 200:
+        raise RuntimeError(f"Server returned {status}: {body.decode()}")
+    return json.loads(body)
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def run_load(host='127.0.0.1', port=8080, endpoint='/calculate', requests=10000,
+                   concurrency=32, seed=0):
+    """Fire requests from concurrent clients and return a throughput summary."""
+    rng = np.random.default_rng(seed)
+    incomes = rng.uniform(20000, 250000, requests).round(2)
+    deductions = (incomes * rng.uniform(0.05, 0.3, requests)).round(2)
+    statuses = rng.choice(STATUSES, requests)
+    payloads = [{'income': i, 'deductions': d, 'filing_status': s}
+                for i, d, s in zip(incomes.tolist(), deductions.tolist(), statuses.tolist())]
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, endpoint, payloads[i::concurrency], latencies)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    values = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_sec': len(latencies) / elapsed,
+        'client_p50_ms': float(np.percentile(values, 50)),
+        'client_p99_ms': float(np.percentile(values, 99)),
+        'server': await fetch_stats(host, port),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput of the tax HTTP service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--endpoint', default='/calculate', choices=['/calculate', '/predict'])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.host, args.port, args.endpoint,
+                                   args.requests, args.concurrency))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
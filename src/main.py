@@ -1 +1,2 @@
-print("testing as zhuluke1")
\ No newline at end of file
+if __name__ == "__main__":
+    print("testing as zhuluke1")
@@ -1,26 +1,250 @@
-from sklearn.linear_model import Lasso
 from joblib import dump, load
-import pandas as pd
 import numpy as np
 
+try:
+    from .instrumentation import timed
+except ImportError:
+    from instrumentation import timed
+
+# More segments than this means the taxes are not a bracket curve
+MAX_KNOTS = 64
+
 class TaxPredictor:
     def __init__(self):
         """Initialize the tax prediction model with Lasso (L1)."""
+        from sklearn.linear_model import Lasso  # deferred: sklearn is slow to import
         self.model = Lasso(alpha=1.0)  # alpha controls regularization strength
 
+    @timed('train', rows_arg=1)
     def train(self, X, y):
         """Train the model with features (X) and target (y)."""
         self.model.fit(X, y)
 
+    @timed('predict_tax', rows_arg=1)
     def predict_tax(self, features):
         """Predict tax liability for given features."""
         return self.model.predict(features)
 
+    def compile(self, scaler):
+        """Fold a fitted StandardScaler into the model for pandas-free inference."""
+        return CompiledLinearModel.from_estimators(scaler, self.model)
+
     def save_model(self, filepath):
         """Save the trained model to a file."""
         dump(self.model, filepath)
 
+    @timed('load_model')
     def load_model(self, filepath):
         """Load a trained model from a file."""
         self.model = load(filepath)
-        
\ No newline at end of file
+
+
+class CompiledLinearModel:
+    """Linear model with standard scaling folded into its weights.
+
+    For a scaler (mean, scale) and model (coef, intercept), predictions on raw
+    features are x @ (coef / scale) + (intercept - mean @ (coef / scale)), so
+    inference is a single dot product with no DataFrame or scaler round-trip.
+    """
+
+    __slots__ = ('coef', 'intercept', '_coef_list')
+
+    def __init__(self, coef, intercept):
+        self.coef = np.array(coef, dtype=np.float64).ravel()
+        self.coef.flags.writeable = False
+        self.intercept = float(intercept)
+        self._coef_list = self.coef.tolist()
+
+    @classmethod
+    def from_estimators(cls, scaler, model):
+        """Build from a fitted StandardScaler (or None) and any linear model."""
+        if not hasattr(model, 'coef_'):
+            raise TypeError(f"{type(model).__name__} is not a fitted linear model")
+        coef = np.ravel(model.coef_).astype(np.float64)
+        intercept = float(np.ravel(model.intercept_)[0])
+        if scaler is not None:
+            if getattr(scaler, 'with_std', True) and scaler.scale_ is not None:
+                coef = coef / scaler.scale_
+            if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None:
+                intercept -= float(np.dot(coef, scaler.mean_))
+        return cls(coef, intercept)
+
+    def predict(self, features):
+        """Predict tax for a 2-D array of raw (unscaled) features."""
+        features = np.asarray(features, dtype=np.float64)
+        return features @ self.coef + self.intercept
+
+    def predict_one(self, *features):
+        """Predict tax for a single row passed as plain floats."""
+        if len(features) != len(self._coef_list):
+            raise ValueError(f"Expected {len(self._coef_list)} features, got {len(features)}")
+        total = self.intercept
+        for weight, value in zip(self._coef_list, features):
+            total += weight * value
+        return total
+
+
+class PiecewiseTaxModel:
+    """Per-status piecewise-linear tax curve learned from (taxable income, tax) data.
+
+    Each filing status is stored as three arrays: segment start knots, the
+    tax at each knot and the slope (marginal rate) after it. Prediction is a
+    searchsorted over the knots per status, so a batch costs O(n log k).
+
+    The sorted points are split greedily into the longest runs that one
+    least-squares line fits to within tol dollars, and knots are placed where
+    the lines of neighbouring runs intersect. Liabilities rounded to the cent
+    stay within the default tol, so every bracket boundary inside the sampled
+    income range is recovered. Below the lowest sample the curve is anchored
+    at zero tax for zero taxable income; above the highest it extends the
+    last slope.
+    """
+
+    def __init__(self, segments=None):
+        self.segments = dict(segments or {})
+
+    @staticmethod
+    def _taxable(incomes, deductions):
+        return np.maximum(0, np.asarray(incomes, dtype=np.float64)
+                          - np.asarray(deductions, dtype=np.float64))
+
+    def fit(self, incomes, deductions, taxes, statuses='single', tol=0.01, max_knots=MAX_KNOTS):
+        """Learn one curve per filing status; returns self.
+
+        Raises ValueError when a status needs more than max_knots segments:
+        its taxes are then not a piecewise-linear function of taxable income,
+        e.g. because several filing statuses were pooled into one curve.
+        Rows with a missing status (None or NaN) are skipped; predict taxes
+        them at 0, as TaxCalculator does.
+        """
+        taxable = self._taxable(incomes, deductions)
+        taxes = np.asarray(taxes, dtype=np.float64)
+        statuses = np.broadcast_to(np.asarray(statuses, dtype=object), taxable.shape)
+        self.segments = {}
+        # np.unique sorts, which fails on None mixed with strings
+        for status in dict.fromkeys(s for s in statuses.ravel() if s is not None and s == s):
+            mask = statuses == status
+            self.segments[str(status)] = _fit_segments(taxable[mask], taxes[mask], tol, max_knots,
+                                                       status)
+        return self
+
+    def predict(self, incomes, deductions, statuses='single'):
+        """Predict tax; unknown filing statuses get 0, as in TaxCalculator."""
+        taxable = self._taxable(incomes, deductions)
+        taxes = np.zeros(taxable.shape)
+        if isinstance(statuses, str):
+            if statuses in self.segments:
+                taxes = _evaluate_segments(self.segments[statuses], taxable)
+            return taxes
+        statuses = np.broadcast_to(np.asarray(statuses, dtype=object), taxable.shape)
+        for status, segments in self.segments.items():
+            mask = statuses == status
+            if mask.any():
+                taxes[mask] = _evaluate_segments(segments, taxable[mask])
+        return taxes
+
+    def to_dict(self):
+        """Plain-list lookup tables, e.g. for JSON export."""
+        return {status: {name: values.tolist() for name, values in zip(('knots', 'base', 'slopes'),
+                                                                         segments)}
+                for status, segments in self.segments.items()}
+
+    @classmethod
+    def from_dict(cls, tables):
+        return cls({status: tuple(np.asarray(table[name], dtype=np.float64)
+                                  for name in ('knots', 'base', 'slopes'))
+                    for status, table in tables.items()})
+
+
+def _line(x, y):
+    """Least-squares slope and intercept, centred for accuracy."""
+    x_mean, y_mean = x.mean(), y.mean()
+    spread = ((x - x_mean) ** 2).sum()
+    slope = ((x - x_mean) * (y - y_mean)).sum() / spread if spread > 0 else 0.0
+    return slope, y_mean - slope * x_mean
+
+
+def _max_residual(x, y, lo, hi):
+    slope, intercept = _line(x[lo:hi], y[lo:hi])
+    return np.abs(y[lo:hi] - (slope * x[lo:hi] + intercept)).max()
+
+
+def _runs(x, y, tol, limit):
+    """Greedy [lo, hi) index ranges that one line fits to within tol, or None past limit."""
+    runs, lo, n = [], 0, len(x)
+    while lo < n:
+        if len(runs) >= limit:
+            return None
+        # A lone last point shares the previous run's last point
+        lo = min(lo, n - 2)
+        # Double the run while it fits, then bisect for its end
+        good, bad = lo + 2, None
+        while good < n:
+            probe = min(lo + 2 * (good - lo), n)
+            if _max_residual(x, y, lo, probe) > tol:
+                bad = probe
+                break
+            good = probe
+        while bad is not None and bad - good > 1:
+            middle = (good + bad) // 2
+            if _max_residual(x, y, lo, middle) > tol:
+                bad = middle
+            else:
+                good = middle
+        runs.append((lo, good))
+        lo = good
+    return runs
+
+
+def _fit_segments(x, y, tol, max_knots=MAX_KNOTS, status=None):
+    """Knots, tax at each knot and slopes for one filing status."""
+    x, inverse = np.unique(x, return_inverse=True)
+    y = np.bincount(inverse, y) / np.bincount(inverse)
+    if len(x) < 2:
+        return np.zeros(1), np.array([y[0] if len(y) else 0.0]), np.zeros(1)
+
+    # A bracket holding a single sample leaves an interior run of two points
+    # that spans a knot; such runs belong to neither line
+    runs = _runs(x, y, tol, 2 * max_knots + 1)
+    if runs is not None and len(runs) > 2:
+        runs = runs[:1] + [run for run in runs[1:-1] if run[1] - run[0] > 2] + runs[-1:]
+    merged = []
+    for lo, hi in runs or ():
+        # Runs either side of a dropped one may lie on the same line
+        if merged and _max_residual(x, y, merged[-1][0], hi) <= tol:
+            lo = merged.pop()[0]
+        merged.append((lo, hi))
+    if runs is None or len(merged) > max_knots:
+        raise ValueError(f"Taxes for filing status {status!r} are not piecewise linear in taxable "
+                         f"income within {tol:g} with at most {max_knots} segments; fit each "
+                         "filing status separately")
+
+    lines = [_line(x[lo:hi], y[lo:hi]) for lo, hi in merged]
+    knots = [x[0]]
+    for (m1, c1), (m2, c2), (lo, end), (start, hi) in zip(lines, lines[1:], merged, merged[1:]):
+        knot = (c2 - c1) / (m1 - m2) if m1 != m2 else np.inf
+        # Rounding noise may move the crossing into either run; lines that
+        # only meet outside both are near-parallel, so split the gap
+        if not x[lo] <= knot <= x[hi - 1]:
+            knot = (x[end - 1] + x[start]) / 2
+        knots.append(knot)
+    knots = np.array(knots)
+    slopes = np.array([m for m, _ in lines])
+    base = np.array([m * k + c for (m, c), k in zip(lines, knots)])
+
+    if knots[0] > 0:
+        if abs(lines[0][1]) <= tol:
+            knots[0] = 0.0
+            base[0] = lines[0][1]
+        else:
+            # Interpolate from zero tax at zero income up to the first sample
+            knots = np.concatenate([[0.0], knots])
+            slopes = np.concatenate([[base[0] / knots[1]], slopes])
+            base = np.concatenate([[0.0], base])
+    return knots, base, slopes
+
+
+def _evaluate_segments(segments, taxable):
+    knots, base, slopes = segments
+    idx = np.maximum(np.searchsorted(knots, taxable, side='right') - 1, 0)
+    return base[idx] + (taxable - knots[idx]) * slopes[idx]
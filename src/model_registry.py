@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    from .artifacts import DEFAULT_BUNDLE_ROOT, current_version, load_current, load_legacy
+except ImportError:
+    from artifacts import DEFAULT_BUNDLE_ROOT, current_version, load_current, load_legacy
+
+logger = logging.getLogger(__name__)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _settled(signature):
+    """Wrap signature() to report a change only once two polls agree.
+
+    Loose model files may be caught mid-write, or with a new model next to
+    the old scaler; a signature that is still moving keeps reporting the
+    last settled one, so the half-written pair is never loaded.
+    """
+    unset = object()
+    state = {'seen': unset, 'settled': None}
+
+    def settled():
+        current = signature()
+        if state['seen'] is unset or current == state['seen']:
+            state['settled'] = current
+        state['seen'] = current
+        return state['settled']
+    return settled
+
+
+class ModelRegistry:
+    """Serve the newest valid model, swapping new artifacts in without restarts.
+
+    loader() returns a loaded, validated model (normally a ModelBundle) and
+    signature() returns a cheap fingerprint of the artifacts on disk. A
+    background thread polls the signature; when it changes, the new model is
+    loaded off the request path and swapped in with a single reference
+    assignment. Callers take a snapshot with current() per request or batch,
+    so in-flight work finishes on the model it started with.
+    """
+
+    def __init__(self, loader, signature, poll_interval=2.0):
+        self.loader = loader
+        self.signature = signature
+        self.poll_interval = poll_interval
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._model = None
+        self._signature = None
+        self._metrics = {
+            'loads': 0,
+            'load_failures': 0,
+            'swaps': 0,
+            'last_load_seconds': None,
+            'last_swap_at': None,
+            'last_error': None,
+        }
+        self.reload()
+        if self._model is None:
+            raise FileNotFoundError(self._metrics['last_error'] or "No model could be loaded")
+
+    @classmethod
+    def for_bundles(cls, root=DEFAULT_BUNDLE_ROOT, poll_interval=2.0):
+        """Follow the published bundle under root."""
+        return cls(lambda: load_current(root), lambda: current_version(root), poll_interval)
+
+    @classmethod
+    def for_files(cls, model_path, scaler_path, pipeline_path=None, poll_interval=2.0):
+        """Follow the loose joblib model/scaler (and optional pipeline) files.
+
+        A change is picked up once the files look the same on two
+        consecutive polls.
+        """
+        paths = [p for p in (model_path, scaler_path, pipeline_path) if p]
+        return cls(lambda: load_legacy(model_path, scaler_path, pipeline_path),
+                   _settled(lambda: tuple(_file_signature(p) for p in paths)), poll_interval)
+
+    @classmethod
+    def static(cls, model):
+        """Registry that always serves one already-loaded model."""
+        return cls(lambda: model, lambda: None)
+
+    def current(self):
+        """Model to use for one request or batch."""
+        return self._model
+
+    def add_listener(self, callback):
+        """Call callback(old_model, new_model) after each swap."""
+        self.listeners.append(callback)
+
+    def reload(self, force=False):
+        """Load and swap in a new model if the artifacts changed. Returns True on swap."""
+        with self._lock:
+            signature = self.signature()
+            if not force and self._model is not None and signature == self._signature:
+                return False
+            start = time.perf_counter()
+            try:
+                model = self.loader()
+            except Exception as e:
+                self._metrics['load_failures'] += 1
+                self._metrics['last_error'] = f"{type(e).__name__}: {e}"
+                logger.warning("Model reload failed, keeping current model: %s", e)
+                # Remember the broken signature so it is not retried every poll
+                if self._model is not None:
+                    self._signature = signature
+                return False
+            self._metrics['loads'] += 1
+            self._metrics['last_load_seconds'] = time.perf_counter() - start
+            old, self._model, self._signature = self._model, model, signature
+            if old is not None:
+                self._metrics['swaps'] += 1
+                self._metrics['last_swap_at'] = time.time()
+                logger.info("Swapped model %s -> %s", getattr(old, 'version', old),
+                            getattr(model, 'version', model))
+        if old is not None:
+            for callback in self.listeners:
+                callback(old, model)
+        return True
+
+    def metrics(self):
+        metrics = dict(self._metrics)
+        metrics['version'] = getattr(self._model, 'version', None)
+        return metrics
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Model watcher failed")
+
+    def start(self):
+        """Start watching for new artifacts in a daemon thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
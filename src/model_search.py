@@ -0,0 +1,190 @@
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, RegressorMixin, TransformerMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.model_selection import KFold, cross_validate
+from sklearn.pipeline import make_pipeline
+
+try:
+    from .ml_models import PiecewiseTaxModel
+except ImportError:
+    from ml_models import PiecewiseTaxModel
+
+LASSO_ALPHAS = [0.01, 0.1, 1.0, 10.0]
+RIDGE_ALPHAS = [0.1, 1.0, 10.0, 100.0]
+
+
+class BracketHingeFeatures(BaseEstimator, TransformerMixin):
+    """Expand scaled (income, deductions) into hinge features at bracket knots.
+
+    The first two columns are income and deductions; mean and scale undo the
+    StandardScaler so knots are given in dollars of taxable income. The
+    output is [taxable, max(0, taxable - knot) ...], which lets a linear
+    model fit the piecewise-linear bracket function.
+
+    When status_knots is given, it holds one tuple of knots per trailing
+    one-hot filing-status column, and each status gets its own intercept,
+    slope and hinges, multiplied by its one-hot column; knots is then unused.
+    """
+
+    def __init__(self, knots=(), mean=(0.0, 0.0), scale=(1.0, 1.0), status_knots=()):
+        self.knots = knots
+        self.mean = mean
+        self.scale = scale
+        self.status_knots = status_knots
+
+    def fit(self, X, y=None):
+        self.n_features_in_ = np.shape(X)[1]
+        return self
+
+    @staticmethod
+    def _hinges(taxable, knots):
+        knots = np.asarray(knots, dtype=np.float64)
+        return np.column_stack([taxable, np.maximum(0, taxable[:, None] - knots[None, :])])
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        raw = X[:, :2] * np.asarray(self.scale) + np.asarray(self.mean)
+        taxable = np.maximum(0, raw[:, 0] - raw[:, 1])
+        if not self.status_knots:
+            return self._hinges(taxable, self.knots)
+        one_hot = X[:, -len(self.status_knots):]
+        blocks = []
+        for column, knots in enumerate(self.status_knots):
+            indicator = one_hot[:, column:column + 1]
+            blocks.append(indicator)
+            blocks.append(self._hinges(taxable, knots) * indicator)
+        return np.column_stack(blocks)
+
+
+class PiecewiseTaxRegressor(BaseEstimator, RegressorMixin):
+    """PiecewiseTaxModel over scaled model features, for use in the model search.
+
+    As in BracketHingeFeatures, mean and scale undo the StandardScaler on the
+    first two columns (income, deductions). When statuses is given, the last
+    len(statuses) columns are read as the filing-status one-hot encoding and
+    a separate curve is learned per status.
+    """
+
+    def __init__(self, mean=(0.0, 0.0), scale=(1.0, 1.0), statuses=()):
+        self.mean = mean
+        self.scale = scale
+        self.statuses = statuses
+
+    def _inputs(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        raw = X[:, :2] * np.asarray(self.scale) + np.asarray(self.mean)
+        if self.statuses:
+            one_hot = X[:, -len(self.statuses):]
+            statuses = np.asarray(self.statuses, dtype=object)[np.argmax(one_hot, axis=1)]
+        else:
+            statuses = 'all'
+        return raw[:, 0], raw[:, 1], statuses
+
+    def fit(self, X, y):
+        incomes, deductions, statuses = self._inputs(X)
+        self.model_ = PiecewiseTaxModel().fit(incomes, deductions, y, statuses)
+        self.n_features_in_ = np.shape(X)[1]
+        return self
+
+    def predict(self, X):
+        return self.model_.predict(*self._inputs(X))
+
+
+def bracket_knots(calculator, statuses=None):
+    """Distinct non-zero bracket starts across all filing statuses.
+
+    With statuses, return one tuple of knots per status instead, in that
+    order, for BracketHingeFeatures(status_knots=...).
+    """
+    if statuses is not None:
+        schedules = calculator.schedules
+        return tuple(tuple(float(k) for k in schedules[status].starts if k > 0)
+                     if status in schedules else () for status in statuses)
+    starts = [schedule.starts for schedule in calculator.schedules.values()]
+    if not starts:
+        return []
+    knots = np.unique(np.concatenate(starts))
+    return knots[knots > 0].tolist()
+
+
+def default_candidates(knots=(), scaler=None, statuses=(), status_knots=()):
+    """Regressors evaluated by search_models, keyed by name.
+
+    statuses names the trailing one-hot filing-status columns, if the
+    features include them, and status_knots holds the bracket knots of each
+    of those statuses (see bracket_knots); with it, the piecewise_linear
+    candidate fits a separate curve per status instead of pooling them.
+    """
+    candidates = {f'lasso_alpha_{alpha:g}': Lasso(alpha=alpha, max_iter=10000)
+                  for alpha in LASSO_ALPHAS}
+    candidates.update({f'ridge_alpha_{alpha:g}': Ridge(alpha=alpha) for alpha in RIDGE_ALPHAS})
+    candidates['gradient_boosting'] = HistGradientBoostingRegressor(random_state=0)
+    mean = tuple(float(m) for m in scaler.mean_[:2]) if scaler is not None else (0.0, 0.0)
+    scale = tuple(float(s) for s in scaler.scale_[:2]) if scaler is not None else (1.0, 1.0)
+    if len(status_knots):
+        hinges = BracketHingeFeatures(mean=mean, scale=scale,
+                                      status_knots=tuple(tuple(k) for k in status_knots))
+        candidates['piecewise_linear'] = make_pipeline(hinges, LinearRegression())
+    elif len(knots):
+        hinges = BracketHingeFeatures(tuple(float(k) for k in knots), mean, scale)
+        candidates['piecewise_linear'] = make_pipeline(hinges, LinearRegression())
+    if len(statuses):
+        # Learns the bracket curve itself; a lower bound for the other models'
+        # error. Without status columns the pooled taxes are not one curve
+        candidates['piecewise_exact'] = PiecewiseTaxRegressor(mean, scale, tuple(statuses))
+    return candidates
+
+
+def evaluate_candidate(name, estimator, X, y, cv=5, random_state=42, latency_rows=1000,
+                       latency_repeats=5):
+    """Cross-validate one regressor, then refit it and time fit and inference."""
+    folds = KFold(n_splits=cv, shuffle=True, random_state=random_state)
+    scores = cross_validate(estimator, X, y, cv=folds, n_jobs=1,
+                            scoring=('neg_mean_absolute_error', 'neg_root_mean_squared_error'))
+
+    model = clone(estimator)
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+
+    sample = np.resize(np.asarray(X), (latency_rows, np.shape(X)[1]))
+    timings = []
+    for _ in range(latency_repeats):
+        start = time.perf_counter()
+        model.predict(sample)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'name': name,
+        'cv_mae': float(-scores['test_neg_mean_absolute_error'].mean()),
+        'cv_rmse': float(-scores['test_neg_root_mean_squared_error'].mean()),
+        'fit_seconds': fit_seconds,
+        'predict_ms_per_1k': min(timings) * 1000 * 1000 / latency_rows,
+        'model': model,
+    }
+
+
+def search_models(X, y, candidates, cv=5, n_jobs=-1, random_state=42):
+    """Evaluate candidates in parallel and return results sorted by CV MAE.
+
+    Each result holds the metrics from evaluate_candidate plus the model
+    refit on all of X; the first entry is the best model.
+    """
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_candidate)(name, estimator, X, y, cv, random_state)
+        for name, estimator in candidates.items()
+    )
+    return sorted(results, key=lambda result: result['cv_mae'])
+
+
+def format_report(results):
+    """Render search results as a fixed-width table."""
+    lines = [f"{'model':<22}{'cv_mae':>12}{'cv_rmse':>12}{'fit_s':>10}{'ms/1k':>10}"]
+    for result in results:
+        lines.append(f"{result['name']:<22}{result['cv_mae']:>12.2f}{result['cv_rmse']:>12.2f}"
+                     f"{result['fit_seconds']:>10.3f}{result['predict_ms_per_1k']:>10.3f}")
+    return '\n'.join(lines)
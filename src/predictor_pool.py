@@ -0,0 +1,308 @@
+"""Parallel batch scoring over immutable predictor snapshots.
+
+A PredictorPool splits a large batch into shards and scores them in
+parallel, returning the model prediction and the bracket tax for every row:
+
+- mode='thread' runs shards on a thread pool. The compiled linear path and
+  the bracket engine are NumPy ufuncs, BLAS and searchsorted calls on float
+  arrays, which release the GIL, so threads run on separate cores.
+- mode='process' runs shards in worker processes for models whose
+  prediction holds the GIL (feature pipelines, tree ensembles). Each worker
+  loads the model once: published bundles are memory-mapped from disk, so
+  all workers share one copy of the estimator's arrays in the page cache.
+  Batch inputs and outputs travel through one shared-memory block instead
+  of being pickled per shard.
+
+Every batch is scored by a single PredictorSnapshot taken from the model
+source when the batch starts, so a registry swap never mixes versions
+within a batch.
+"""
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MODES = ('thread', 'process')
+# Batches are split into shards of at least this many rows; smaller batches
+# are scored inline, where pool overhead would outweigh the parallelism
+MIN_SHARD_SIZE = 16_384
+
+
+class PredictorSnapshot:
+    """Immutable view of one model version, safe to share between threads.
+
+    Linear bundles with plain scaling are compiled to a read-only weight
+    vector; other bundles predict through ModelBundle.predict, which keeps
+    no per-call state.
+    """
+
+    __slots__ = ('version', 'bundle', 'compiled')
+
+    def __init__(self, bundle):
+        try:
+            compiled = bundle.compile()
+        except TypeError:
+            compiled = None
+        object.__setattr__(self, 'version', bundle.version)
+        object.__setattr__(self, 'bundle', bundle)
+        object.__setattr__(self, 'compiled', compiled)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PredictorSnapshot is immutable")
+
+    def __reduce__(self):
+        return _snapshot_from_spec, (self.spec(),)
+
+    def __repr__(self):
+        return f"PredictorSnapshot({self.version!r})"
+
+    def spec(self):
+        """How a worker process obtains this model.
+
+        Bundles saved on disk are referenced by path and memory-mapped by
+        every worker; anything else is pickled.
+        """
+        path = self.bundle.path
+        if path and os.path.exists(os.path.join(path, 'manifest.json')):
+            return 'bundle', path
+        return 'pickle', pickle.dumps(self.bundle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def predict(self, incomes, deductions, statuses='single'):
+        if self.compiled is not None:
+            return self.compiled.predict(np.column_stack([incomes, deductions]))
+        return self.bundle.predict(incomes, deductions, statuses)
+
+
+def _snapshot_from_spec(spec):
+    kind, payload = spec
+    if kind == 'bundle':
+        try:
+            from .artifacts import load_bundle
+        except ImportError:
+            from artifacts import load_bundle
+        return PredictorSnapshot(load_bundle(payload, mmap=True))
+    return PredictorSnapshot(pickle.loads(payload))
+
+
+def encode_statuses(statuses, size):
+    """Integer code per row and the status labels they index.
+
+    Shards compare small integers instead of Python strings, which keeps the
+    per-status masks off the GIL. Missing statuses get an empty label.
+    """
+    if isinstance(statuses, str):
+        return np.zeros(size, dtype=np.int32), np.array([statuses], dtype=object)
+    import pandas as pd
+    codes, labels = pd.factorize(np.asarray(statuses, dtype=object).reshape(size))
+    labels = np.asarray(labels, dtype=object)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = np.append(labels, '')
+    return codes.astype(np.int32), labels
+
+
+def score_shard(snapshot, calculator, incomes, deductions, codes, labels, predicted, calculated):
+    """Score one shard, writing into the predicted and calculated views.
+
+    Either output may be None to skip it.
+    """
+    if predicted is not None:
+        statuses = labels[0] if len(labels) == 1 else labels[codes]
+        predicted[:] = snapshot.predict(incomes, deductions, statuses)
+    if calculated is not None:
+        taxable = np.maximum(0, incomes - deductions)
+        calculated[:] = 0.0
+        for code, status in enumerate(labels):
+            schedule = calculator.schedules.get(status)
+            if schedule is None:
+                continue
+            if len(labels) == 1:
+                calculated[:] = schedule.tax(taxable)
+            else:
+                mask = codes == code
+                calculated[mask] = schedule.tax(taxable[mask])
+
+
+def _shards(size, workers, min_shard_size):
+    shard = max(min_shard_size, -(-size // workers))
+    return [(start, min(start + shard, size)) for start in range(0, size, shard)]
+
+
+# Per-process state of pool workers, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec, calculator):
+    _worker['snapshot'] = _snapshot_from_spec(spec) if spec is not None else None
+    _worker['calculator'] = calculator
+
+
+class _SharedBatch:
+    """Inputs and outputs of one batch in a single shared-memory block."""
+
+    FIELDS = (('incomes', np.float64), ('deductions', np.float64), ('codes', np.int32),
+              ('predicted', np.float64), ('calculated', np.float64))
+
+    def __init__(self, size, name=None):
+        self.size = size
+        nbytes = sum(np.dtype(dtype).itemsize for _, dtype in self.FIELDS) * max(size, 1)
+        # Workers share the parent's resource tracker, so attaching by name
+        # does not hand ownership of the block to them
+        self.block = (shared_memory.SharedMemory(create=True, size=nbytes) if name is None
+                      else shared_memory.SharedMemory(name=name))
+        self.arrays = {}
+        offset = 0
+        for field, dtype in self.FIELDS:
+            self.arrays[field] = np.ndarray(size, dtype=dtype, buffer=self.block.buf, offset=offset)
+            offset += np.dtype(dtype).itemsize * size
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def close(self, unlink=False):
+        self.arrays = {}
+        try:
+            self.block.close()
+        except BufferError:
+            # A traceback still holds views into the block; the mapping is
+            # released together with them
+            pass
+        if unlink:
+            self.block.unlink()
+
+
+def _score_shared(name, size, labels, start, stop, predict, calculate):
+    batch = _SharedBatch(size, name)
+    try:
+        views = {field: array[start:stop] for field, array in batch.arrays.items()}
+        score_shard(_worker['snapshot'], _worker['calculator'], views['incomes'],
+                    views['deductions'], views['codes'], labels,
+                    views['predicted'] if predict else None,
+                    views['calculated'] if calculate else None)
+        del views
+    finally:
+        batch.close()
+
+
+class PredictorPool:
+    """Score large batches in parallel with a thread or process pool.
+
+    source is a ModelRegistry (its current() model is snapshotted once per
+    batch) or a single loaded ModelBundle; it may be None when only bracket
+    tax is needed. calculator, if given, adds bracket tax to the results.
+    Use as a context manager, or call close(), to stop the workers.
+    """
+
+    def __init__(self, source=None, calculator=None, mode='thread', workers=None,
+                 min_shard_size=MIN_SHARD_SIZE, mp_context=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}; choose from {MODES}")
+        self.source = source
+        self.calculator = calculator
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.min_shard_size = min_shard_size
+        self.mp_context = mp_context
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._executor = None
+        self._executor_snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def snapshot(self):
+        """PredictorSnapshot of the source's current model, or None."""
+        model = self.source.current() if hasattr(self.source, 'current') else self.source
+        if model is None:
+            return None
+        with self._lock:
+            if self._snapshot is None or self._snapshot.bundle is not model:
+                self._snapshot = PredictorSnapshot(model)
+            return self._snapshot
+
+    def _pool(self, snapshot=None):
+        """The executor; process workers are restarted when the model changes."""
+        retired = None
+        with self._lock:
+            if (self.mode == 'process' and snapshot is not None
+                    and self._executor_snapshot is not snapshot):
+                retired, self._executor = self._executor, None
+            if self._executor is None:
+                if self.mode == 'thread':
+                    self._executor = ThreadPoolExecutor(self.workers,
+                                                        thread_name_prefix='taxsense-pool')
+                else:
+                    spec = snapshot.spec() if snapshot is not None else None
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=self.mp_context, initializer=_init_worker,
+                        initargs=(spec, self.calculator))
+                    self._executor_snapshot = snapshot
+            executor = self._executor
+        if retired is not None:
+            # Batches already submitted to the old workers finish first
+            retired.shutdown(wait=False)
+        return executor
+
+    def score(self, incomes, deductions, statuses='single', predict=True, calculate=True):
+        """Return (predicted, calculated) arrays for a batch of returns.
+
+        Inputs must be free of missing values. predicted is None when there
+        is no model or predict is False; calculated is None without a
+        calculator or when calculate is False.
+        """
+        incomes = np.ascontiguousarray(incomes, dtype=np.float64).ravel()
+        deductions = np.ascontiguousarray(np.broadcast_to(deductions, incomes.shape), dtype=np.float64)
+        codes, labels = encode_statuses(statuses, len(incomes))
+        snapshot = self.snapshot() if predict else None
+        calculate = calculate and self.calculator is not None
+        shards = _shards(len(incomes), self.workers, self.min_shard_size)
+        if self.mode == 'process' and len(shards) > 1:
+            return self._score_processes(snapshot, incomes, deductions, codes, labels, shards,
+                                         calculate)
+
+        predicted = np.empty(len(incomes)) if snapshot is not None else None
+        calculated = np.empty(len(incomes)) if calculate else None
+
+        def run(shard):
+            rows = slice(*shard)
+            score_shard(snapshot, self.calculator, incomes[rows], deductions[rows], codes[rows],
+                        labels, predicted[rows] if predicted is not None else None,
+                        calculated[rows] if calculated is not None else None)
+
+        if len(shards) > 1:
+            list(self._pool().map(run, shards))
+        elif shards:
+            run(shards[0])
+        return predicted, calculated
+
+    def _score_processes(self, snapshot, incomes, deductions, codes, labels, shards, calculate):
+        executor = self._pool(snapshot)
+        batch = _SharedBatch(len(incomes))
+        try:
+            batch.arrays['incomes'][:] = incomes
+            batch.arrays['deductions'][:] = deductions
+            batch.arrays['codes'][:] = codes
+            futures = [executor.submit(_score_shared, batch.name, len(incomes), labels, start, stop,
+                                       snapshot is not None, calculate)
+                       for start, stop in shards]
+            for future in futures:
+                future.result()
+            predicted = batch.arrays['predicted'].copy() if snapshot is not None else None
+            calculated = batch.arrays['calculated'].copy() if calculate else None
+        finally:
+            batch.close(unlink=True)
+        return predicted, calculated
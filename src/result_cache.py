@@ -0,0 +1,310 @@
+"""Bounded cache of tax results for repeated queries.
+
+Calculator and model results are keyed by (tax year, filing status, income,
+deductions, version), where the version is the model bundle's version for
+predictions and the tax tables' digest for bracket calculations, so a new
+model or edited tables never serve stale results.
+
+Entries are evicted least-recently-used once max_entries is reached, and
+expire ttl seconds after they were stored. By default entries live in
+process memory; with a path they are kept in a SQLite file that several
+processes (Streamlit or server workers) can share.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+HIT, MISS, EXPIRED = 'hit', 'miss', 'expired'
+
+
+class _MemoryStore:
+    backend = 'memory'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key, now, ttl):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISS, None
+        value, stored_at = entry
+        if ttl is not None and now - stored_at >= ttl:
+            del self._entries[key]
+            return EXPIRED, None
+        self._entries.move_to_end(key)
+        return HIT, value
+
+    def lookup_many(self, keys, now, ttl):
+        return [self.lookup(key, now, ttl) for key in keys]
+
+    def store_many(self, items, now, max_entries):
+        return sum(self.store(key, value, now, max_entries) for key, value in items)
+
+    def store(self, key, value, now, max_entries):
+        """Insert an entry and return how many were evicted to make room."""
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        self._entries.clear()
+
+
+class _SqliteStore:
+    """Entries in a SQLite file, shared by every process that opens it.
+
+    Hits do not write: their recency is buffered and flushed in one batch
+    before the next eviction, or every TOUCH_BATCH hits. The table is only
+    counted when this process's running size estimate passes the limit, and
+    is then trimmed an eighth below it so the following inserts need no
+    count. With several writers the file may briefly hold a few more than
+    max_entries. SQLite reads NaN as NULL, so NaN is stored as the text 'NaN'
+    and converted back on lookup.
+    """
+
+    backend = 'sqlite'
+    TOUCH_BATCH = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+        self._touched = {}
+        self._size = None
+
+    @property
+    def connection(self):
+        # Connections must not cross a fork, so each process opens its own
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=10, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value REAL NOT NULL, '
+                'stored_at REAL NOT NULL, used_at REAL NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)')
+            self._pid = os.getpid()
+            self._touched = {}
+            self._size = None
+        return self._connection
+
+    def __len__(self):
+        self._size = self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return self._size
+
+    # Below SQLite's default limit of 999 bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    def lookup(self, key, now, ttl):
+        return self.lookup_many([key], now, ttl)[0]
+
+    def lookup_many(self, keys, now, ttl):
+        """(state, value) per key, with one SELECT per LOOKUP_BATCH keys."""
+        connection = self.connection
+        encoded = [json.dumps(key) for key in keys]
+        rows = {}
+        distinct = list(dict.fromkeys(encoded))
+        for i in range(0, len(distinct), self.LOOKUP_BATCH):
+            part = distinct[i:i + self.LOOKUP_BATCH]
+            rows.update((key, (value, stored_at)) for key, value, stored_at in connection.execute(
+                'SELECT key, value, stored_at FROM results WHERE key IN '
+                f'({", ".join("?" * len(part))})', part))
+        expired = []
+        results = []
+        for key in encoded:
+            row = rows.get(key)
+            if row is None:
+                results.append((MISS, None))
+                continue
+            value, stored_at = row
+            if ttl is not None and now - stored_at >= ttl:
+                expired.append(key)
+                del rows[key]
+                self._touched.pop(key, None)
+                results.append((EXPIRED, None))
+                continue
+            self._touched[key] = now
+            results.append((HIT, float(value)))
+        if expired:
+            connection.executemany('DELETE FROM results WHERE key = ?', [(key,) for key in expired])
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._transaction(self._flush)
+        return results
+
+    def _flush(self):
+        if self._touched:
+            self.connection.executemany('UPDATE results SET used_at = MAX(used_at, ?) WHERE key = ?',
+                                        [(used_at, key) for key, used_at in self._touched.items()])
+            self._touched.clear()
+
+    def _transaction(self, fn, *args):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(*args)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def store(self, key, value, now, max_entries):
+        return self._transaction(self._store, json.dumps(key), value, now, max_entries)
+
+    def store_many(self, items, now, max_entries):
+        """Insert (key, value) pairs in one transaction."""
+        def store_all():
+            return sum(self._store(json.dumps(key), value, now, max_entries)
+                       for key, value in items)
+        return self._transaction(store_all)
+
+    def _store(self, key, value, now, max_entries):
+        connection = self.connection
+        if value != value:
+            value = 'NaN'
+        self._touched.pop(key, None)
+        inserted = connection.execute('INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)',
+                                      (key, value, now, now)).rowcount
+        if not inserted:
+            connection.execute('UPDATE results SET value = ?, stored_at = ?, used_at = ? '
+                               'WHERE key = ?', (value, now, now, key))
+        if self._size is not None:
+            self._size += inserted
+        if self._size is None or self._size > max_entries:
+            self._size = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if self._size <= max_entries:
+            return 0
+        self._flush()
+        excess = self._size - max_entries + max_entries // 8
+        evicted = connection.execute('DELETE FROM results WHERE key IN '
+                                     '(SELECT key FROM results ORDER BY used_at LIMIT ?)',
+                                     (excess,)).rowcount
+        self._size -= evicted
+        return evicted
+
+    def clear(self):
+        self.connection.execute('DELETE FROM results')
+        self._touched.clear()
+        self._size = 0
+
+
+class ResultCache:
+    """Thread-safe LRU/TTL cache of float results with hit and miss counters.
+
+    ttl is in seconds (None keeps entries until evicted). path selects the
+    shared SQLite backend. Counters are per process; size is the number of
+    entries in the backend.
+    """
+
+    def __init__(self, max_entries=4096, ttl=None, path=None, clock=time.time):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._store = _SqliteStore(path) if path else _MemoryStore()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        """Cached value for key, or None."""
+        return self._get_many([key])[0]
+
+    def _get_many(self, keys):
+        with self._lock:
+            looked_up = self._store.lookup_many(keys, self.clock(), self.ttl)
+            for state, _ in looked_up:
+                if state == HIT:
+                    self._counters['hits'] += 1
+                else:
+                    self._counters['misses'] += 1
+                    if state == EXPIRED:
+                        self._counters['expirations'] += 1
+        return [value for _, value in looked_up]
+
+    def put(self, key, value):
+        self._put_many([(key, float(value))])
+
+    def _put_many(self, items):
+        with self._lock:
+            self._counters['evictions'] += self._store.store_many(items, self.clock(),
+                                                                  self.max_entries)
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, calling compute() and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = float(compute())
+            self.put(key, value)
+        return value
+
+    def get_many(self, keys, compute):
+        """Cached values for a list of keys.
+
+        compute(indices) is called once with the positions of all missing
+        keys and must return their values in the same order. The lookups and
+        the stores each take the lock once, which with the SQLite backend
+        means one query and one transaction per batch.
+        """
+        values = self._get_many(keys)
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            for i, value in zip(missing, compute(missing)):
+                values[i] = float(value)
+            self._put_many([(keys[i], values[i]) for i in missing])
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._store)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+        stats.update(max_entries=self.max_entries, ttl=self.ttl, backend=self._store.backend)
+        return stats
+
+
+def calculation_key(calculator, income, deductions, filing_status='single'):
+    """Cache key of a bracket calculation, versioned by the tables' contents."""
+    digest = calculator.tables_digest
+    return (calculator.tax_year, filing_status, float(income), float(deductions),
+            f'tables:{digest[:16]}' if digest else None)
+
+
+def prediction_key(bundle, income, deductions, filing_status='single'):
+    """Cache key of a model prediction, versioned by the bundle."""
+    return (bundle.manifest.get('tax_year'), filing_status, float(income), float(deductions),
+            f'model:{bundle.version}')
+
+
+def cached_calculate_tax(cache, calculator, income, deductions, filing_status='single'):
+    """TaxCalculator.calculate_tax through the cache."""
+    return cache.get_or_compute(
+        calculation_key(calculator, income, deductions, filing_status),
+        lambda: calculator.calculate_tax(income, deductions, filing_status))
+
+
+def cached_predict_tax(cache, bundle, income, deductions, filing_status='single'):
+    """Model prediction for one return through the cache."""
+    def predict():
+        try:
+            # Linear models predict from plain floats with the scaler folded in
+            return bundle.compile().predict_one(income, deductions)
+        except (TypeError, ValueError):
+            return bundle.predict([income], [deductions], [filing_status])[0]
+    return cache.get_or_compute(prediction_key(bundle, income, deductions, filing_status), predict)
@@ -0,0 +1,428 @@
+"""Standalone HTTP prediction service with request micro-batching.
+
+Run from the repository root as a module, so that src is imported as a
+package and pickled estimators in the bundles resolve:
+
+    python -m src.server --port 8080 [--bundle-root models/bundles]
+
+Endpoints:
+    POST /predict    {"income": 60000, "deductions": 12000, "filing_status": "single"}
+    POST /calculate  {"income": 60000, "deductions": 12000, "filing_status": "single"}
+    GET  /stats      latency percentiles, batch sizes, model reload metrics and
+                     result cache counters
+    GET  /metrics    operation timers in Prometheus text format (TAXSENSE_METRICS=1)
+    GET  /health
+
+Requests that arrive within --max-delay-ms of each other are coalesced into
+one vectorized call to the model or the bracket engine. Repeated returns are
+answered from a result cache (--cache-size, --cache-ttl, and --cache-path to
+share it between processes).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    from . import instrumentation
+    from .artifacts import DEFAULT_BUNDLE_ROOT
+    from .model_registry import ModelRegistry
+    from .result_cache import ResultCache, calculation_key, prediction_key
+    from .tax_calculator import TaxCalculator
+    from .tax_tables import tables_path_for_year
+except ImportError:
+    import instrumentation
+    from artifacts import DEFAULT_BUNDLE_ROOT
+    from model_registry import ModelRegistry
+    from result_cache import ResultCache, calculation_key, prediction_key
+    from tax_calculator import TaxCalculator
+    from tax_tables import tables_path_for_year
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class MicroBatcher:
+    """Coalesce concurrent submissions into batched calls of a sync function.
+
+    The first item of a batch waits at most max_delay seconds for company;
+    a batch is flushed early once it holds max_batch items. batch_fn receives
+    the list of items and must return one result per item. It runs in the
+    loop's default executor, so a slow batch (e.g. a contended SQLite result
+    cache) does not stall other connections.
+    """
+
+    def __init__(self, batch_fn, max_batch=1024, max_delay=0.002, history=10000):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batch_sizes = deque(maxlen=history)
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item):
+        if self._worker is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Drain anything that is already queued without waiting further
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        self.batch_sizes.append(len(batch))
+        loop = asyncio.get_running_loop()
+        try:
+            results = list(await loop.run_in_executor(
+                None, self.batch_fn, [item for item, _ in batch]))
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.exception("Batch of %d failed", len(batch))
+            _fail(batch, e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        if len(results) < len(batch):
+            _fail(batch[len(results):], RuntimeError(
+                f"Batch function returned {len(results)} results for {len(batch)} items"))
+
+
+def _fail(batch, error):
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+class LatencyStats:
+    """Rolling window of request latencies per endpoint."""
+
+    def __init__(self, history=10000):
+        self.history = history
+        self.latencies = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        window = self.latencies.setdefault(endpoint, deque(maxlen=self.history))
+        window.append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        summary = {}
+        for endpoint, window in self.latencies.items():
+            values = np.fromiter(window, dtype=np.float64) * 1000
+            summary[endpoint] = {
+                'requests': self.counts[endpoint],
+                'p50_ms': float(np.percentile(values, 50)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'max_ms': float(values.max()),
+            }
+        return summary
+
+
+def batch_summary(batch_sizes):
+    if not batch_sizes:
+        return {'batches': 0}
+    sizes = np.fromiter(batch_sizes, dtype=np.int64)
+    return {
+        'batches': len(sizes),
+        'mean_size': float(sizes.mean()),
+        'p50_size': float(np.percentile(sizes, 50)),
+        'max_size': int(sizes.max()),
+    }
+
+
+class TaxService:
+    """Model and tax tables loaded once, exposed as batched operations.
+
+    The model is served through a ModelRegistry, so a watched registry swaps
+    in retrained artifacts while the service keeps running. With a
+    ResultCache, only returns missing from the cache reach the model or the
+    bracket engine.
+    """
+
+    def __init__(self, calculator, registry=None, max_batch=1024, max_delay=0.002, cache=None):
+        self.calculator = calculator
+        self.registry = registry
+        self.cache = cache
+        self.predict_batcher = MicroBatcher(self.predict_batch, max_batch, max_delay)
+        self.calculate_batcher = MicroBatcher(self.calculate_batch, max_batch, max_delay)
+        self.latency = LatencyStats()
+
+    @classmethod
+    def from_files(cls, model_path='models/tax_model.joblib', scaler_path='models/scaler.joblib',
+                   tax_tables_file='data/tax_tables_2024.csv', pipeline_path=None,
+                   poll_interval=2.0, **kwargs):
+        """Serve the loose joblib artifacts, reloading them when they change."""
+        try:
+            registry = ModelRegistry.for_files(model_path, scaler_path, pipeline_path,
+                                               poll_interval).start()
+        except FileNotFoundError:
+            logger.warning("No trained model or scaler found; /predict is disabled")
+            registry = None
+        return cls(TaxCalculator(tax_tables_file), registry, **kwargs)
+
+    @classmethod
+    def from_bundle(cls, bundle_root=DEFAULT_BUNDLE_ROOT, tax_tables_file=None,
+                    poll_interval=2.0, **kwargs):
+        """Serve the published model bundle, following new publishes."""
+        registry = ModelRegistry.for_bundles(bundle_root, poll_interval).start()
+        bundle = registry.current()
+        year = bundle.manifest.get('tax_year')
+        if tax_tables_file is None:
+            tax_tables_file = tables_path_for_year(year) if year else 'data/tax_tables_2024.csv'
+        logger.info("Loaded bundle %s", bundle.version)
+        return cls(TaxCalculator(tax_tables_file), registry, **kwargs)
+
+    def close(self):
+        if self.registry is not None:
+            self.registry.stop()
+
+    def predict_batch(self, items):
+        # One snapshot per batch: a concurrent swap only affects later batches
+        bundle = self.registry.current()
+        if self.cache is None:
+            return self._predict(bundle, items)
+        keys = [prediction_key(bundle, item['income'], item['deductions'], item['filing_status'])
+                for item in items]
+        return self.cache.get_many(
+            keys, lambda missing: self._predict(bundle, [items[i] for i in missing]))
+
+    def _predict(self, bundle, items):
+        incomes = np.array([item['income'] for item in items], dtype=np.float64)
+        deductions = np.array([item['deductions'] for item in items], dtype=np.float64)
+        try:
+            compiled_model = bundle.compile()
+        except TypeError:
+            statuses = np.array([item['filing_status'] for item in items], dtype=object)
+            return bundle.predict(incomes, deductions, statuses).tolist()
+        return compiled_model.predict(np.column_stack([incomes, deductions])).tolist()
+
+    def calculate_batch(self, items):
+        if self.cache is None:
+            return self._calculate(items)
+        keys = [calculation_key(self.calculator, item['income'], item['deductions'],
+                                item['filing_status']) for item in items]
+        return self.cache.get_many(
+            keys, lambda missing: self._calculate([items[i] for i in missing]))
+
+    def _calculate(self, items):
+        incomes = np.array([item['income'] for item in items], dtype=np.float64)
+        deductions = np.array([item['deductions'] for item in items], dtype=np.float64)
+        statuses = np.array([item['filing_status'] for item in items], dtype=object)
+        return self.calculator.calculate_tax_batch(incomes, deductions, statuses).tolist()
+
+    def stats(self):
+        return {
+            'latency': self.latency.summary(),
+            'predict_batches': batch_summary(self.predict_batcher.batch_sizes),
+            'calculate_batches': batch_summary(self.calculate_batcher.batch_sizes),
+            'model': self.registry.metrics() if self.registry is not None else None,
+            'cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def handle(self, method, path, body):
+        """Route one request, returning (status, payload)."""
+        if path == '/health':
+            model = self.registry.current() if self.registry is not None else None
+            return 200, {'status': 'ok', 'model_loaded': model is not None,
+                         'model_version': getattr(model, 'version', None)}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/metrics':
+            if not instrumentation.enabled():
+                return 404, {'error': f'Metrics are disabled; set {instrumentation.METRICS_ENV}=1'}
+            return 200, instrumentation.METRICS.to_prometheus()
+        if path not in ('/predict', '/calculate'):
+            return 404, {'error': f'Unknown path {path}'}
+        if method != 'POST':
+            return 405, {'error': 'Use POST'}
+        try:
+            item = parse_return(body)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+        if path == '/predict':
+            if self.registry is None:
+                return 503, {'error': 'No trained model loaded'}
+            return 200, {'predicted_tax': await self.predict_batcher.submit(item)}
+        return 200, {'tax': await self.calculate_batcher.submit(item)}
+
+    async def serve_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as e:
+                    logger.exception("Request to %s failed", path)
+                    status, payload = 500, {'error': str(e)}
+                self.latency.record(path, time.perf_counter() - start)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            writer.write(encode_response(413 if 'large' in str(e) else 400,
+                                         {'error': str(e)}, False))
+        finally:
+            writer.close()
+
+
+def parse_return(body):
+    """Validate a JSON request body describing a single return."""
+    try:
+        data = json.loads(body or b'{}')
+        item = {
+            'income': float(data['income']),
+            'deductions': float(data['deductions']),
+            'filing_status': str(data.get('filing_status', 'single')),
+        }
+        if not (math.isfinite(item['income']) and math.isfinite(item['deductions'])):
+            raise ValueError("income and deductions must be finite")
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Expected JSON with numeric income and deductions: {e}") from e
+    return item
+
+
+async def read_request(reader):
+    """Read one HTTP request, or return None when the client disconnects."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ValueError("Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], headers, body
+
+
+def encode_response(status, payload, keep_alive=True):
+    """HTTP response for a JSON payload, or Prometheus text for a str."""
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), instrumentation.PROMETHEUS_CONTENT_TYPE
+    else:
+        body, content_type = json.dumps(payload).encode(), 'application/json'
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def serve(service, host='127.0.0.1', port=8080):
+    """Run the HTTP server until cancelled."""
+    service.predict_batcher.start()
+    service.calculate_batcher.start()
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    logger.info("Serving on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.predict_batcher.stop()
+        await service.calculate_batcher.stop()
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve tax predictions over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model', default='models/tax_model.joblib')
+    parser.add_argument('--scaler', default='models/scaler.joblib')
+    parser.add_argument('--feature-pipeline', default='models/feature_pipeline.joblib')
+    parser.add_argument('--tax-tables', default=None,
+                        help="defaults to the bundle's tax year, else 2024")
+    parser.add_argument('--bundle-root', default=None,
+                        help="serve the published bundle under this root instead of --model/--scaler")
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help="seconds between checks for retrained artifacts")
+    parser.add_argument('--cache-size', type=int, default=100_000,
+                        help="cached results per process (0 disables the cache)")
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help="seconds before a cached result expires")
+    parser.add_argument('--cache-path', default=None,
+                        help="SQLite file to share cached results between processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    cache = (ResultCache(args.cache_size, args.cache_ttl, args.cache_path)
+             if args.cache_size > 0 else None)
+    options = {'max_batch': args.max_batch, 'max_delay': args.max_delay_ms / 1000,
+               'poll_interval': args.poll_interval, 'cache': cache}
+    if args.bundle_root:
+        service = TaxService.from_bundle(args.bundle_root, args.tax_tables, **options)
+    else:
+        service = TaxService.from_files(args.model, args.scaler,
+                                        args.tax_tables or 'data/tax_tables_2024.csv',
+                                        args.feature_pipeline, **options)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,326 @@
-import pandas as pd
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+try:
+    from .instrumentation import timed
+    from .tax_tables import (DEFAULT_DATA_DIR, BracketSchedule, available_years, load_tax_tables,
+                             load_tax_year, year_from_path)
+except ImportError:
+    from instrumentation import timed
+    from tax_tables import (DEFAULT_DATA_DIR, BracketSchedule, available_years, load_tax_tables,
+                            load_tax_year, year_from_path)
+
+FILING_STATUSES = ['single', 'married', 'head_of_household']
+DEFAULT_CHUNK_SIZE = 100_000
+
 class TaxCalculator:
     def __init__(self, tax_tables_file='data/tax_tables_2024.csv'):
         """Initialize with tax brackets from file."""
+        # Tables are parsed once per process and shared between calculators
+        self.tax_year = year_from_path(tax_tables_file)
+        self._tables = None
+        self._brackets = {}
         try:
-            self.tax_tables = pd.read_csv(tax_tables_file)
-            required_cols = ['filing_status', 'bracket_start', 'bracket_end', 'tax_rate']
-            if not all(col in self.tax_tables.columns for col in required_cols):
-                raise ValueError("Tax tables missing required columns")
+            self._tables = load_tax_tables(tax_tables_file)
+            self._brackets = self._tables.schedules
         except FileNotFoundError:
             print(f"Error: {tax_tables_file} not found.")
-            self.tax_tables = None
         except Exception as e:
             print(f"Error loading tax tables: {e}")
-            self.tax_tables = None
-        
+
+    @property
+    def tax_tables(self):
+        """Raw tax tables as a DataFrame, or None if they failed to load."""
+        return self._tables.frame if self._tables is not None else None
+
+    @property
+    def schedules(self):
+        """Compiled BracketSchedule per filing status."""
+        return self._brackets
+
+    @property
+    def tables_digest(self):
+        """SHA-256 of the tax tables file, or None if it failed to load."""
+        return self._tables.digest if self._tables is not None else None
+
+    @timed('calculate_tax')
     def calculate_tax(self, income, deductions, filing_status='single'):
         """Calculate tax using traditional tax bracket method."""
-        if self.tax_tables is None:
+        if self._tables is None:
             return 0  # Or raise an error
-        taxable_income = max(0, income - deductions)
-        total_tax = 0
-        
-        # Get brackets for filing status
-        status_brackets = self.tax_tables[self.tax_tables['filing_status'] == filing_status].sort_values('bracket_start')
-        if status_brackets.empty:
+        if filing_status not in self._brackets:
             print(f"Warning: No brackets for {filing_status}")
             return 0
-        
-        for _, bracket in status_brackets.iterrows():
-            if taxable_income > bracket['bracket_start']:
-                taxable_in_bracket = min(
-                    taxable_income - bracket['bracket_start'],
-                    bracket['bracket_end'] - bracket['bracket_start']
-                )
-                total_tax += taxable_in_bracket * bracket['tax_rate']
-            else:
-                break
-                
-        return total_tax
-
-    def generate_training_data(self, num_samples=1000):
+        # Evaluated here rather than through calculate_tax_batch, which would
+        # record the call a second time
+        return float(self._brackets[filing_status].tax(_taxable([income], [deductions]))[0])
+
+    @timed('calculate_tax_batch', rows_arg=1)
+    def calculate_tax_batch(self, incomes, deductions, statuses='single'):
+        """Calculate bracket tax for whole arrays of incomes and deductions.
+
+        `statuses` may be a single filing status or an array of statuses with
+        one entry per income. Unknown statuses are taxed at 0, as in
+        `calculate_tax`.
+        """
+        taxable = _taxable(incomes, deductions)
+        return self._evaluate(taxable, statuses, BracketSchedule.tax)
+
+    def calculate_rates(self, incomes, deductions, statuses='single'):
+        """Tax, marginal rate and effective rate for arrays of returns.
+
+        The effective rate is tax divided by income, and 0 where income is 0.
+        Unknown statuses get zeros for all three.
+        """
+        incomes = np.asarray(incomes, dtype=np.float64)
+        taxable = _taxable(incomes, deductions)
+        taxes = self._evaluate(taxable, statuses, BracketSchedule.tax)
+        marginal = self._evaluate(taxable, statuses, BracketSchedule.marginal_rate)
+        return taxes, marginal, _effective_rate(taxes, incomes)
+
+    def what_if_grid(self, incomes, deductions=(0,), statuses=None):
+        """Evaluate every combination of filing status, deduction and income.
+
+        Returns a dict holding the three axes ('filing_status', 'deductions',
+        'income') and 'tax', 'marginal_rate' and 'effective_rate' arrays of
+        shape (len(statuses), len(deductions), len(incomes)). statuses
+        defaults to every status in the tables.
+        """
+        incomes = np.atleast_1d(np.asarray(incomes, dtype=np.float64))
+        deductions = np.atleast_1d(np.asarray(deductions, dtype=np.float64))
+        statuses = list(self._brackets) if statuses is None else list(statuses)
+        # Broadcast to (deductions, incomes) once and evaluate per status
+        taxable = _taxable(incomes[None, :], deductions[:, None])
+        shape = (len(statuses),) + taxable.shape
+        taxes, marginal = np.zeros(shape), np.zeros(shape)
+        for i, status in enumerate(statuses):
+            brackets = self._brackets.get(status)
+            if brackets is not None:
+                taxes[i] = brackets.tax(taxable)
+                marginal[i] = brackets.marginal_rate(taxable)
+        return {
+            'filing_status': statuses,
+            'deductions': deductions,
+            'income': incomes,
+            'tax': taxes,
+            'marginal_rate': marginal,
+            'effective_rate': _effective_rate(taxes, np.broadcast_to(incomes, shape)),
+        }
+
+    def _evaluate(self, taxable, statuses, method):
+        """Apply a BracketSchedule method to taxable incomes grouped by status."""
+        result = np.zeros(taxable.shape)
+        if not self._brackets:
+            return result
+
+        if isinstance(statuses, str):
+            brackets = self._brackets.get(statuses)
+            if brackets is not None:
+                result = method(brackets, taxable)
+            return result
+
+        statuses = np.broadcast_to(np.asarray(statuses), taxable.shape)
+        for status, brackets in self._brackets.items():
+            mask = statuses == status
+            if mask.any():
+                result[mask] = method(brackets, taxable[mask])
+        return result
+
+    @timed('generate_training_data')
+    def generate_training_data(self, num_samples=1000, random_state=None, n_jobs=1,
+                               chunk_size=DEFAULT_CHUNK_SIZE):
         """Generate synthetic data for model training."""
-        if self.tax_tables is None:
+        if self._tables is None:
             print("Error: No tax tables available")
             return None
-        incomes = np.random.uniform(20000, 150000, num_samples)  # Lower max to 150k
-        deduction_rates = np.random.uniform(0.05, 0.30, num_samples)
+        import pandas as pd
+        chunks = list(self.iter_training_data(num_samples, chunk_size, random_state, n_jobs))
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)
+
+    def iter_training_data(self, num_samples, chunk_size=DEFAULT_CHUNK_SIZE,
+                           random_state=None, n_jobs=1):
+        """Yield synthetic training data as DataFrames of at most chunk_size rows.
+
+        Each chunk draws from its own child of `random_state`, so the output is
+        reproducible and identical whether chunks are generated serially or,
+        with n_jobs > 1 (or -1 for all cores), sharded across a process pool.
+        At most 2 * n_jobs chunks are in flight at once to keep memory bounded.
+        """
+        # Checked here rather than in the generator, so bad arguments fail at
+        # the call instead of on the first chunk
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if n_jobs == 0 or n_jobs < -1:
+            raise ValueError("n_jobs must be -1 or a positive number of workers")
+        return self._iter_training_data(num_samples, chunk_size, random_state, n_jobs)
+
+    def _iter_training_data(self, num_samples, chunk_size, random_state, n_jobs):
+        if self._tables is None:
+            print("Error: No tax tables available")
+            return
+        sizes = [chunk_size] * (num_samples // chunk_size)
+        if num_samples % chunk_size or not sizes:
+            sizes.append(num_samples % chunk_size)
+        seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+
+        if n_jobs == 1:
+            for size, seed in zip(sizes, seeds):
+                yield self._sample_training_chunk(size, seed)
+            return
+
+        workers = os.cpu_count() if n_jobs == -1 else n_jobs
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for size, seed in zip(sizes, seeds):
+                pending.append(pool.submit(_training_chunk, self, size, seed))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _sample_training_chunk(self, num_samples, seed):
+        """Sample one chunk of synthetic returns and their bracket tax."""
+        import pandas as pd
+        rng = np.random.default_rng(seed)
+        incomes = rng.uniform(20000, 150000, num_samples)  # Lower max to 150k
+        deduction_rates = rng.uniform(0.05, 0.30, num_samples)
         deductions = incomes * deduction_rates
-        statuses = np.random.choice(['single', 'married', 'head_of_household'], num_samples)
-        
-        taxes = [self.calculate_tax(inc, ded, status) 
-                for inc, ded, status in zip(incomes, deductions, statuses)]
-        
+        statuses = np.asarray(FILING_STATUSES, dtype=object)[
+            rng.integers(0, len(FILING_STATUSES), num_samples)]
+
         return pd.DataFrame({
             'income': incomes,
             'deductions': deductions,
             'filing_status': statuses,
-            'tax_liability': taxes
-    })
+            'tax_liability': self.calculate_tax_batch(incomes, deductions, statuses)
+        })
 
     def load_sample_data(self, filepath='data/sample_finances.csv'):
         """Load and return sample financial data."""
+        import pandas as pd
         try:
             return pd.read_csv(filepath)
         except FileNotFoundError:
             print(f"Error: {filepath} not found.")
-            return None
\ No newline at end of file
+            return None
+
+
+class MultiYearTaxCalculator:
+    """Bracket tax for returns from several tax years at once.
+
+    Every tax_tables_<year>.csv in data_dir (or just `years`) is loaded once
+    through the shared tables registry and validated to be contiguous from 0.
+    """
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, years=None):
+        years = available_years(data_dir) if years is None else sorted(years)
+        if not years:
+            raise FileNotFoundError(f"No tax tables found in {data_dir}")
+        self.data_dir = data_dir
+        self._tables = {}
+        for year in years:
+            self._add(year, load_tax_year(year, data_dir), validate=True)
+
+    @classmethod
+    def from_tables(cls, tables, validate=True):
+        """Build from already loaded {year: TaxTables}."""
+        calculator = cls.__new__(cls)
+        calculator.data_dir = None
+        calculator._tables = {}
+        for year in sorted(tables):
+            calculator._add(year, tables[year], validate)
+        return calculator
+
+    def _add(self, year, tables, validate):
+        if validate:
+            try:
+                tables.validate()
+            except ValueError as e:
+                raise ValueError(f"Invalid {year} tax tables: {e}") from e
+        self._tables[year] = tables
+
+    @property
+    def years(self):
+        return list(self._tables)
+
+    @property
+    def latest_year(self):
+        return self.years[-1]
+
+    def schedules(self, year):
+        """Compiled BracketSchedule per filing status for one year."""
+        return self._tables[year].schedules
+
+    def calculate_tax(self, income, deductions, filing_status='single', year=None):
+        """Calculate tax for one return; year defaults to the latest loaded."""
+        year = self.latest_year if year is None else year
+        return float(self.calculate_tax_batch([income], [deductions], [filing_status], [year])[0])
+
+    def calculate_tax_batch(self, incomes, deductions, statuses='single', years=None):
+        """Calculate bracket tax for a batch mixing tax years and filing statuses.
+
+        `statuses` and `years` may be scalars or arrays with one entry per
+        income; years defaults to the latest loaded. Rows are grouped by
+        (year, status) with a single sort, and each group is evaluated with
+        its schedule. Unknown or missing (None/NaN) years and statuses are
+        taxed at 0.
+        """
+        taxable = _taxable(incomes, deductions)
+        taxes = np.zeros(taxable.shape)
+        if taxable.size == 0:
+            return taxes
+
+        years = self.latest_year if years is None else years
+        year_values, year_codes = _factorize(years, taxable.shape)
+        status_values, status_codes = _factorize(statuses, taxable.shape)
+        groups = year_codes * len(status_values) + status_codes
+        order = np.argsort(groups, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(groups, minlength=len(
+            year_values) * len(status_values)))])
+
+        flat_taxable = taxable.ravel()
+        flat_taxes = taxes.ravel()
+        for group in np.flatnonzero(np.diff(bounds)):
+            tables = self._tables.get(year_values[group // len(status_values)])
+            schedule = tables.schedules.get(status_values[group % len(status_values)]) if tables else None
+            if schedule is not None:
+                rows = order[bounds[group]:bounds[group + 1]]
+                flat_taxes[rows] = schedule.tax(flat_taxable[rows])
+        return taxes
+
+
+def _factorize(values, shape):
+    """Distinct values and a code per row, for a scalar or per-row array.
+
+    Missing values (None, NaN) share one trailing None label, which matches
+    no tables or schedule. Years come back as plain ints.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(np.broadcast_to(np.asarray(values, dtype=object), shape).ravel())
+    labels = [value.item() if isinstance(value, np.generic) else value for value in uniques]
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels.append(None)
+    return labels, codes
+
+
+def _taxable(incomes, deductions):
+    """max(0, income - deductions), with a missing (NaN) amount giving 0 as in the scalar walk."""
+    taxable = np.asarray(incomes, dtype=np.float64) - np.asarray(deductions, dtype=np.float64)
+    return np.where(np.isnan(taxable), 0.0, np.maximum(0, taxable))
+
+
+def _effective_rate(taxes, incomes):
+    effective = np.zeros(np.shape(taxes))
+    np.divide(taxes, incomes, out=effective, where=incomes > 0)
+    return effective
+
+
+def _training_chunk(calculator, num_samples, seed):
+    """Process pool entry point for TaxCalculator.iter_training_data."""
+    return calculator._sample_training_chunk(num_samples, seed)
@@ -0,0 +1,251 @@
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+
+import numpy as np
+
+REQUIRED_COLUMNS = ['filing_status', 'bracket_start', 'bracket_end', 'tax_rate']
+DEFAULT_DATA_DIR = 'data'
+
+_YEAR_PATTERN = re.compile(r'tax_tables_(\d{4})\.csv$')
+
+
+class BracketSchedule:
+    """Immutable, array-backed tax brackets for a single filing status."""
+
+    __slots__ = ('filing_status', 'starts', 'widths', 'rates', 'base', 'overlapping')
+
+    def __init__(self, filing_status, starts, ends, rates):
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        rates = np.asarray(rates, dtype=np.float64)
+        if not len(starts) == len(ends) == len(rates) or len(starts) == 0:
+            raise ValueError(f"Brackets for {filing_status} are empty or misaligned")
+        order = np.argsort(starts, kind='stable')
+        starts, ends, rates = starts[order], ends[order], rates[order]
+        widths = ends - starts
+        if np.isnan(starts).any() or np.isnan(widths).any() or np.isnan(rates).any():
+            raise ValueError(f"Brackets for {filing_status} contain missing values")
+        if (widths < 0).any():
+            raise ValueError(f"Brackets for {filing_status} end before they start")
+        # Tax owed on all income below each bracket start, accumulated in
+        # bracket order so sums match the iterative walk exactly
+        base = np.zeros(len(starts))
+        np.cumsum((widths * rates)[:-1], out=base[1:])
+        for name, value in (('starts', starts), ('widths', widths),
+                            ('rates', rates), ('base', base)):
+            value.flags.writeable = False
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, 'filing_status', filing_status)
+        # The cumulative base assumes every lower bracket is full once a higher
+        # one is reached, which only holds when brackets do not overlap
+        object.__setattr__(self, 'overlapping', bool((starts[1:] < starts[:-1] + widths[:-1]).any()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BracketSchedule is immutable")
+
+    def __reduce__(self):
+        return BracketSchedule, (self.filing_status, self.starts, self.ends, self.rates)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f"BracketSchedule({self.filing_status!r}, {len(self)} brackets)"
+
+    @property
+    def ends(self):
+        return self.starts + self.widths
+
+    def validate(self):
+        """Raise ValueError unless brackets run from 0 without gaps or overlaps."""
+        ends = self.ends
+        if self.starts[0] != 0:
+            raise ValueError(f"Brackets for {self.filing_status} start at {self.starts[0]:g}, not 0")
+        breaks = np.flatnonzero(self.starts[1:] != ends[:-1])
+        if len(breaks):
+            i = breaks[0]
+            kind = 'gap' if self.starts[i + 1] > ends[i] else 'overlap'
+            raise ValueError(f"Brackets for {self.filing_status} have a {kind} between "
+                             f"{ends[i]:g} and {self.starts[i + 1]:g}")
+        return self
+
+    def tax(self, taxable):
+        """Evaluate the schedule for an array of taxable incomes."""
+        taxable = np.asarray(taxable, dtype=np.float64)
+        if self.overlapping:
+            return self._tax_dense(taxable)
+        # Index of the highest bracket whose start lies strictly below the income
+        idx = np.searchsorted(self.starts, taxable, side='left') - 1
+        reached = idx >= 0
+        idx = np.maximum(idx, 0)
+        in_bracket = np.minimum(taxable - self.starts[idx], self.widths[idx])
+        return np.where(reached, self.base[idx] + in_bracket * self.rates[idx], 0.0)
+
+    def marginal_rate(self, taxable):
+        """Rate applied to the next dollar of each taxable income.
+
+        Income in a gap between brackets or above the last bracket end is not
+        taxed, so its marginal rate is 0.
+        """
+        taxable = np.asarray(taxable, dtype=np.float64)
+        if self.overlapping:
+            inside = (taxable[..., None] >= self.starts) & (taxable[..., None] < self.ends)
+            return (inside * self.rates).sum(axis=-1)
+        idx = np.searchsorted(self.starts, taxable, side='right') - 1
+        inside = (idx >= 0) & (taxable < self.ends[np.maximum(idx, 0)])
+        return np.where(inside, self.rates[np.maximum(idx, 0)], 0.0)
+
+    def distance_to_next(self, taxable):
+        """Income left before the next bracket threshold above each taxable income.
+
+        Thresholds are bracket starts and ends; above the last one the
+        distance is 0.
+        """
+        taxable = np.asarray(taxable, dtype=np.float64)
+        thresholds = np.union1d(self.starts, self.ends)
+        idx = np.searchsorted(thresholds, taxable, side='right')
+        below = idx < len(thresholds)
+        return np.where(below, thresholds[np.minimum(idx, len(thresholds) - 1)] - taxable, 0.0)
+
+    def _tax_dense(self, taxable):
+        """Walk every bracket, as the original loop did, for overlapping tables."""
+        taxes = np.zeros(taxable.shape)
+        for start, width, rate in zip(self.starts, self.widths, self.rates):
+            reached = taxable > start
+            taxes += np.where(reached, np.minimum(taxable - start, width) * rate, 0.0)
+        return taxes
+
+
+class TaxTables:
+    """Parsed tax tables file with one compiled schedule per filing status."""
+
+    def __init__(self, path, text, schedules, signature, digest):
+        self.path = path
+        self.year = year_from_path(path)
+        self.text = text
+        self.schedules = schedules
+        self.signature = signature
+        self.digest = digest
+        self._frame = None
+
+    @property
+    def frame(self):
+        """The raw tables as a DataFrame, built on first access.
+
+        pandas is only imported here so that pure bracket calculation runs
+        with NumPy alone.
+        """
+        if self._frame is None:
+            import pandas as pd
+            self._frame = pd.read_csv(io.StringIO(self.text))
+        return self._frame
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_frame'] = None
+        return state
+
+    def validate(self):
+        """Validate every schedule; see BracketSchedule.validate."""
+        if not self.schedules:
+            raise ValueError(f"No brackets in {self.path}")
+        for schedule in self.schedules.values():
+            schedule.validate()
+        return self
+
+    @classmethod
+    def from_file(cls, path):
+        """Parse, validate and compile a tax tables CSV file."""
+        signature = _file_signature(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        text = content.decode('utf-8-sig')
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise ValueError("Tax tables file is empty")
+        if not all(col in reader.fieldnames for col in REQUIRED_COLUMNS):
+            raise ValueError("Tax tables missing required columns")
+
+        columns = {}
+        for row in reader:
+            starts, ends, rates = columns.setdefault(row['filing_status'], ([], [], []))
+            starts.append(_parse_float(row['bracket_start']))
+            ends.append(_parse_float(row['bracket_end']))
+            rates.append(_parse_float(row['tax_rate']))
+        schedules = {
+            status: BracketSchedule(status, starts, ends, rates)
+            for status, (starts, ends, rates) in columns.items()
+        }
+        return cls(path, text, schedules, signature, hashlib.sha256(content).hexdigest())
+
+
+def _parse_float(value):
+    return float(value) if value not in (None, '') else float('nan')
+
+
+def year_from_path(path):
+    """Return the tax year encoded in a tables filename, or None."""
+    match = _YEAR_PATTERN.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def tables_path_for_year(year, data_dir=DEFAULT_DATA_DIR):
+    return os.path.join(data_dir, f'tax_tables_{year}.csv')
+
+
+def available_years(data_dir=DEFAULT_DATA_DIR):
+    """Sorted tax years with a tables file in data_dir."""
+    try:
+        names = os.listdir(data_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(year for year in map(year_from_path, names) if year is not None)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_tax_tables(path):
+    """Return compiled tax tables for a file, parsing it at most once.
+
+    Tables are cached per process and only re-parsed when the file's
+    mtime/size change and its content hash differs from the cached copy.
+    """
+    key = os.path.abspath(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        signature = _file_signature(key)
+        if cached is not None:
+            if cached.signature == signature:
+                return cached
+            if cached.digest == _file_digest(key):
+                cached.signature = signature
+                return cached
+        tables = TaxTables.from_file(key)
+        _cache[key] = tables
+        return tables
+
+
+def load_tax_year(year, data_dir=DEFAULT_DATA_DIR):
+    """Return compiled tax tables for a tax year."""
+    return load_tax_tables(tables_path_for_year(year, data_dir))
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -1,10 +1,46 @@
+"""Train and publish the tax model.
+
+Run from the repository root as a module, so that src is imported as a
+package and pickled estimators resolve when app.py loads them:
+
+    python -m src.train_model [--search] [--status-features] [--incremental]
+"""
+import argparse
+import json
 import os
-from ml_models import TaxPredictor
-from tax_calculator import TaxCalculator
-from data_processing import DataProcessor
+from .ml_models import TaxPredictor
+from .tax_calculator import TaxCalculator
+from .data_processing import DataProcessor, TaxFeaturePipeline
+from .artifacts import DEFAULT_BUNDLE_ROOT, publish, save_bundle
+from .incremental_training import METHODS, file_source, synthetic_source, train_incremental
+from .instrumentation import timed, timer
+import numpy as np
+import pandas as pd
+
+def _save_atomically(save, path):
+    """Call save(tmp) and move the result over path in one step.
+
+    Registries following the loose files never read a partly written one.
+    """
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        save(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
-def train_initial_model(samples=10000):
-    """Generate synthetic data and train the initial model."""
+@timed('train_initial_model')
+def train_initial_model(samples=10000, search=False, n_jobs=-1, cv=5, status_features=False,
+                        bundle_root=DEFAULT_BUNDLE_ROOT):
+    """Generate synthetic data and train the initial model.
+
+    With search=True, several regressors are cross-validated in parallel and
+    the one with the lowest MAE is saved instead of the default Lasso. With
+    status_features=True, a TaxFeaturePipeline encoding filing status and
+    bracket position replaces the plain income/deductions scaler.
+    """
     print("Generating synthetic training data...")
     calculator = TaxCalculator()
     data = calculator.generate_training_data(num_samples=samples)
@@ -12,24 +48,118 @@ def train_initial_model(samples=10000):
     
     print("Processing data...")
     processor = DataProcessor()
-    # Fit the scaler on the training data
-    features = data[['income', 'deductions']]
-    processor.scaler.fit(features)  # Fit the scaler here
-    X = processor.preprocess_features(data)  # Now transform
+    if status_features:
+        pipeline = TaxFeaturePipeline.from_calculator(calculator)
+        X = pd.DataFrame(pipeline.fit_transform(data), columns=pipeline.feature_names)
+        scaler = pipeline.scaler
+    else:
+        # Fit the scaler on the training data
+        features = data[['income', 'deductions']]
+        processor.scaler.fit(features)  # Fit the scaler here
+        X = processor.preprocess_features(data)  # Now transform
+        scaler = processor.scaler
     
     print("Training model...")
     predictor = TaxPredictor()
-    predictor.train(X, data['tax_liability'])
+    if search:
+        from .model_search import bracket_knots, default_candidates, format_report, search_models
+        statuses = pipeline.statuses if status_features else ()
+        candidates = default_candidates(bracket_knots(calculator), scaler, statuses,
+                                        bracket_knots(calculator, statuses) if statuses else ())
+        with timer('model_search'):
+            results = search_models(X.values, data['tax_liability'].values, candidates,
+                                    cv=cv, n_jobs=n_jobs)
+        print(format_report(results))
+        print(f"Best model: {results[0]['name']}")
+        predictor.model = results[0]['model']
+    else:
+        predictor.train(X, data['tax_liability'])
     
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
     
     # Save model and scaler
     print("Saving model and scaler...")
-    predictor.save_model('models/tax_model.joblib')
-    processor.save_scaler('models/scaler.joblib')
+    _save_atomically(predictor.save_model, 'models/tax_model.joblib')
+    if status_features:
+        _save_atomically(pipeline.save, 'models/feature_pipeline.joblib')
+    else:
+        _save_atomically(processor.save_scaler, 'models/scaler.joblib')
+    if search:
+        report = [{k: v for k, v in result.items() if k != 'model'} for result in results]
+        with open('models/model_search.json', 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Bundle the model with its preprocessing and manifest, then publish it
+    errors = predictor.predict_tax(X) - data['tax_liability'].values
+    metrics = {'train_mae': float(np.abs(errors).mean()),
+               'train_rmse': float(np.sqrt((errors ** 2).mean()))}
+    if search:
+        metrics.update(cv_mae=results[0]['cv_mae'], cv_rmse=results[0]['cv_rmse'],
+                       search_best=results[0]['name'])
+    with timer('save_bundle'):
+        bundle_path = save_bundle(
+            bundle_root, predictor.model, list(X.columns),
+            scaler=None if status_features else processor.scaler,
+            feature_pipeline=pipeline if status_features else None,
+            tax_year=calculator.tax_year, training_data=data, metrics=metrics)
+    publish(bundle_root, os.path.basename(bundle_path))
+    print(f"Published model bundle {bundle_path}")
     
     print("Training complete! You can now use the model for predictions.")
 
+@timed('train_incremental_model')
+def train_incremental_model(samples=10000, input_path=None, chunk_size=100_000, method='closed_form',
+                            bundle_root=DEFAULT_BUNDLE_ROOT):
+    """Train out of core on chunks streamed from input_path or the generator.
+
+    Only one chunk is in memory at a time, so the corpus may be larger than
+    RAM. 20% of rows are held out for validation by a hash split.
+    """
+    calculator = TaxCalculator()
+    if input_path:
+        print(f"Streaming training data from {input_path}...")
+        source = file_source(input_path, chunk_size)
+    else:
+        print(f"Streaming {samples:,} synthetic samples...")
+        source = synthetic_source(calculator, samples, chunk_size)
+
+    predictor, processor, report = train_incremental(source, method=method)
+    print(f"Trained {report['method']} on {report['train_rows']:,} rows "
+          f"({report['rows_per_sec']:,.0f} rows/s, peak {report['peak_memory_mb']:.1f} MB traced)")
+    print(f"Validation MAE {report.get('validation_mae', float('nan')):.2f} "
+          f"on {report['validation_rows']:,} rows")
+
+    os.makedirs('models', exist_ok=True)
+    print("Saving model and scaler...")
+    _save_atomically(predictor.save_model, 'models/tax_model.joblib')
+    _save_atomically(processor.save_scaler, 'models/scaler.joblib')
+    bundle_path = save_bundle(bundle_root, predictor.model, ['income', 'deductions'],
+                              scaler=processor.scaler, tax_year=calculator.tax_year,
+                              metrics=report)
+    publish(bundle_root, os.path.basename(bundle_path))
+    print(f"Published model bundle {bundle_path}")
+    return report
+
 if __name__ == "__main__":
-    train_initial_model()
+    parser = argparse.ArgumentParser(description="Train the tax prediction model")
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--search', action='store_true',
+                        help="cross-validate a model zoo in parallel and keep the best")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--status-features', action='store_true',
+                        help="train on filing status and bracket-derived features")
+    parser.add_argument('--bundle-root', default=DEFAULT_BUNDLE_ROOT)
+    parser.add_argument('--incremental', action='store_true',
+                        help="stream training data in chunks instead of loading it all")
+    parser.add_argument('--input', help="CSV/Parquet training file for --incremental")
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--method', choices=METHODS, default='closed_form')
+    args = parser.parse_args()
+    if args.incremental:
+        train_incremental_model(args.samples, args.input, args.chunk_size, args.method,
+                                args.bundle_root)
+    else:
+        train_initial_model(args.samples, search=args.search, n_jobs=args.n_jobs, cv=args.cv,
+                            status_features=args.status_features, bundle_root=args.bundle_root)
@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import (current_version, load_bundle, load_current, publish, rollback,
+                           save_bundle)
+from src.data_processing import TaxFeaturePipeline
+from src.server import TaxService
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture(scope='module')
+def training():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(400, random_state=2)
+    scaler = StandardScaler().fit(data[['income', 'deductions']])
+    model = LinearRegression().fit(scaler.transform(data[['income', 'deductions']]),
+                                   data['tax_liability'])
+    return calculator, data, scaler, model
+
+
+def test_bundle_round_trip_is_memory_mapped(tmp_path, training):
+    _, data, scaler, model = training
+    path = save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler,
+                       tax_year=2024, training_data=data, metrics={'train_mae': 1.0})
+    bundle = load_bundle(path)
+
+    assert isinstance(bundle.scaler.mean_, np.memmap)
+    assert bundle.manifest['tax_year'] == 2024
+    assert bundle.manifest['training_rows'] == len(data)
+    assert len(bundle.manifest['training_data_sha256']) == 64
+    expected = model.predict(scaler.transform(data[['income', 'deductions']]))
+    np.testing.assert_allclose(bundle.predict(data['income'], data['deductions']), expected)
+    np.testing.assert_allclose(bundle.compile().predict(data[['income', 'deductions']]), expected)
+
+
+def test_load_rejects_mismatched_scaler_and_model(tmp_path, training):
+    _, data, scaler, model = training
+    path = save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler)
+    np.save(os.path.join(path, 'scaler_mean.npy'), np.zeros(3))
+    np.save(os.path.join(path, 'scaler_scale.npy'), np.ones(3))
+    with pytest.raises(ValueError, match='inconsistent'):
+        load_bundle(path)
+
+
+def test_publish_and_rollback_swap_current(tmp_path, training):
+    calculator, data, scaler, model = training
+    first = save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler, version='v1')
+    pipeline = TaxFeaturePipeline.from_calculator(calculator).fit(data)
+    second_model = LinearRegression().fit(pipeline.transform(data), data['tax_liability'])
+    save_bundle(tmp_path, second_model, pipeline.feature_names,
+                feature_pipeline=pipeline, version='v2')
+
+    publish(tmp_path, 'v1')
+    publish(tmp_path, 'v2')
+    assert current_version(tmp_path) == 'v2'
+    assert load_current(tmp_path).feature_pipeline is not None
+
+    rollback(tmp_path)
+    assert current_version(tmp_path) == 'v1'
+    assert load_current(tmp_path).path == first
+    with open(tmp_path / 'releases.json') as f:
+        assert [r['version'] for r in json.load(f)] == ['v1']
+
+    service = TaxService.from_bundle(str(tmp_path))
+    assert service.registry.current().version == 'v1'
+    assert service.calculator.tax_year == 2024
+    service.close()
+
+
+def test_repeated_rollbacks_walk_back_through_history(tmp_path, training):
+    _, _, scaler, model = training
+    for version in ('a', 'b', 'c'):
+        save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler, version=version)
+        publish(tmp_path, version)
+
+    rollback(tmp_path)
+    assert current_version(tmp_path) == 'b'
+    rollback(tmp_path)
+    assert current_version(tmp_path) == 'a'
+    with pytest.raises(ValueError, match='No earlier bundle'):
+        rollback(tmp_path)
+    assert current_version(tmp_path) == 'a'
+
+    # Publishing after a rollback pushes on top of the shortened history
+    publish(tmp_path, 'c')
+    rollback(tmp_path)
+    assert current_version(tmp_path) == 'a'
@@ -0,0 +1,43 @@
+import json
+
+from benchmarks.run_benchmarks import compare, main, run_benchmarks
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {'case[1000]': {'p50_ms': 10.0, 'peak_memory_mb': 5.0},
+                'tiny[1]': {'p50_ms': 0.01, 'peak_memory_mb': 0.0}}
+    results = {'case[1000]': {'p50_ms': 13.0, 'peak_memory_mb': 5.1},
+               'tiny[1]': {'p50_ms': 0.03, 'peak_memory_mb': 0.0},
+               'new[1]': {'p50_ms': 1.0, 'peak_memory_mb': 1.0}}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert [(r['case'], r['metric']) for r in regressions] == [('case[1000]', 'p50_ms')]
+    assert compare(results, baseline, threshold=0.5) == []
+
+
+def test_suite_writes_baseline_and_detects_regressions(tmp_path):
+    results = run_benchmarks(['calculate_tax_batch', 'predict_tax'], [1, 100],
+                             min_time=0, log=lambda _: None)
+    assert set(results) == {'calculate_tax_batch[1]', 'calculate_tax_batch[100]',
+                            'predict_tax[1]', 'predict_tax[100]'}
+    assert all(r['rows_per_sec'] > 0 and r['p99_ms'] >= r['p50_ms'] for r in results.values())
+
+    baseline = tmp_path / 'baseline.json'
+    args = ['--cases', 'calculate_tax_batch', '--sizes', '100000', '--min-time', '0',
+            '--baseline', str(baseline)]
+    # Without a baseline the gate fails rather than passing vacuously
+    assert main(args) == 2
+    assert main(args + ['--update-baseline']) == 0
+    stored = json.loads(baseline.read_text())
+    stored['calculate_tax_batch[100000]']['p50_ms'] = 1e-6
+    baseline.write_text(json.dumps(stored))
+    assert main(args + ['--threshold', '0.25']) == 1
+
+
+def test_pool_scaling_reports_speedup_per_worker_count():
+    from benchmarks.pool_scaling import run_scaling, worker_counts
+    assert worker_counts(6) == [1, 2, 4, 6]
+    results = run_scaling(rows=40000, modes=['thread'], max_workers=2, min_time=0,
+                          log=lambda _: None)
+    assert set(results) == {'thread[1]', 'thread[2]'}
+    assert results['thread[1]']['speedup'] == 1.0
+    assert results['thread[2]']['efficiency'] > 0
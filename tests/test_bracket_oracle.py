@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src import bracket_oracle
+from src.bracket_oracle import IMPLEMENTATIONS, check_table, random_returns, reference_tax, run_oracle
+
+ROWS = [('single', 10000.0, 999999999.0, 0.2), ('single', 0.0, 10000.0, 0.1)]
+
+
+def test_reference_sorts_brackets_and_ignores_unknown_statuses():
+    assert reference_tax(ROWS, 20000, 0, 'single') == pytest.approx(3000)
+    assert reference_tax(ROWS, 5000, 9000, 'single') == 0
+    assert reference_tax(ROWS, 20000, 0, 'married') == 0
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_fast_paths_agree_with_reference(tmp_path, seed):
+    result = run_oracle(num_cases=20000, cases_per_table=500, seed=seed, workdir=str(tmp_path))
+    assert result['cases'] == 20000
+    assert result['mismatches'] == []
+
+
+def test_overlapping_brackets_match_reference(tmp_path):
+    rows = [('single', 0.0, 20000.0, 0.1), ('single', 10000.0, 30000.0, 0.2)]
+    incomes = np.array([5000.0, 10000.0, 15000.0, 25000.0, 40000.0])
+    deductions = np.zeros(5)
+    statuses = np.array(['single'] * 5, dtype=object)
+    assert check_table(rows, str(tmp_path / 'overlap.csv'), incomes, deductions, statuses) == []
+
+
+def test_missing_statuses_are_generated_and_taxed_at_zero(tmp_path):
+    rng = np.random.default_rng(0)
+    incomes, deductions, statuses = random_returns(rng, ROWS, 2000)
+    assert any(s is None for s in statuses)
+    assert any(isinstance(s, float) and np.isnan(s) for s in statuses)
+    # Every implementation, single-year and multi-year, on the same returns
+    assert check_table(ROWS, str(tmp_path / 'missing.csv'), incomes, deductions, statuses) == []
+
+
+def test_missing_amounts_are_generated_and_taxed_at_zero(tmp_path):
+    rng = np.random.default_rng(1)
+    incomes, deductions, statuses = random_returns(rng, ROWS, 2000)
+    assert np.isnan(incomes).any() and np.isnan(deductions).any()
+    statuses = np.array(['single'] * len(incomes), dtype=object)
+    assert check_table(ROWS, str(tmp_path / 'nan.csv'), incomes, deductions, statuses) == []
+
+
+def test_detects_wrong_implementation(tmp_path, monkeypatch):
+    def off_by_a_few_cents(calculator, incomes, deductions, statuses):
+        return calculator.calculate_tax_batch(incomes, deductions, statuses) + 0.05
+
+    monkeypatch.setitem(IMPLEMENTATIONS, 'broken', (off_by_a_few_cents, None))
+    rng = np.random.default_rng(0)
+    cases = random_returns(rng, ROWS, 100)
+    mismatches = check_table(ROWS, str(tmp_path / 'broken.csv'), *cases, implementations=['broken'])
+    assert len(mismatches) == 100
+
+
+def test_cli_exit_status(capsys):
+    assert bracket_oracle.main(['--cases', '1000', '--seed', '0']) == 0
+    assert '0 mismatches' in capsys.readouterr().out
@@ -0,0 +1,146 @@
+import gc
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Lasso
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import ModelBundle
+from src.bulk_scoring import (SpoolFile, count_rows, iter_spool, score_chunk, score_upload,
+                               spool_chunks)
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return TaxCalculator('data/tax_tables_2024.csv')
+
+
+@pytest.fixture(scope='module')
+def bundle(calculator):
+    data = calculator.generate_training_data(500, random_state=0)
+    scaler = StandardScaler().fit(data[['income', 'deductions']].values)
+    model = Lasso(alpha=0.1).fit(scaler.transform(data[['income', 'deductions']].values),
+                                 data['tax_liability'])
+    return ModelBundle.from_estimators(model, scaler)
+
+
+def clients(n=250):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'client': [f'c{i}' for i in range(n)],
+        'income': rng.uniform(20000, 200000, n).round(2),
+        'deductions': rng.uniform(0, 20000, n).round(2),
+        'filing_status': rng.choice(['single', 'married', 'head_of_household'], n),
+    })
+
+
+def encode(df, file_format):
+    buffer = io.BytesIO()
+    if file_format == 'csv':
+        buffer.write(df.to_csv(index=False).encode())
+    elif file_format == 'parquet':
+        df.to_parquet(buffer, index=False)
+    else:
+        df.to_excel(buffer, index=False)
+    buffer.seek(0)
+    buffer.name = f'clients.{file_format}'
+    return buffer
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx', 'parquet'])
+def test_score_upload_in_chunks(calculator, bundle, file_format):
+    df = clients()
+    progress = []
+    chunks = list(score_upload(encode(df, file_format), calculator, bundle, chunksize=100,
+                               progress=lambda done, total: progress.append((done, total))))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert progress == [(100, 250), (200, 250), (250, 250)]
+
+    scored = pd.concat(chunks, ignore_index=True)
+    assert scored['client'].tolist() == df['client'].tolist()
+    np.testing.assert_allclose(scored['calculated_tax'], calculator.calculate_tax_batch(
+        df['income'], df['deductions'], df['filing_status'].to_numpy(dtype=object)))
+    np.testing.assert_allclose(scored['predicted_tax'], bundle.predict(df['income'], df['deductions']))
+
+
+def test_score_chunk_defaults_and_missing_values(calculator, bundle):
+    df = pd.DataFrame({'income': [50000, None, 80000], 'deductions': [12000, 5000, None]})
+    scored = score_chunk(df, calculator, bundle)
+    assert scored['calculated_tax'][0] == calculator.calculate_tax(50000, 12000, 'single')
+    assert scored['calculated_tax'][1:].isna().all()
+    assert scored['predicted_tax'].notna().all()
+    assert 'predicted_tax' not in score_chunk(df, calculator)
+    with pytest.raises(ValueError, match='deductions'):
+        score_chunk(df[['income']], calculator)
+
+
+def test_count_rows_without_trailing_newline():
+    assert count_rows(io.BytesIO(b'income,deductions\n1,2\n3,4'), 'csv') == 2
+    assert count_rows(io.BytesIO(b'income,deductions\n1,2\n3,4\n'), 'csv') == 2
+
+
+def test_count_rows_streams_real_files(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.bulk_scoring.COUNT_BLOCK_SIZE', 7)
+    path = tmp_path / 'clients.csv'
+    pd.DataFrame({'income': range(25), 'deductions': range(25)}).to_csv(path, index=False)
+    with open(path, 'rb') as f:
+        f.read(5)
+        assert count_rows(f, 'csv') == 25
+        assert f.tell() == 0
+    pd.DataFrame({'income': range(25)}).to_parquet(tmp_path / 'clients.parquet')
+    with open(tmp_path / 'clients.parquet', 'rb') as f:
+        assert count_rows(f, 'parquet') == 25
+
+
+def test_spooled_chunks_round_trip(calculator):
+    df = pd.DataFrame({'income': np.arange(250) * 1000.0, 'deductions': 12000.0})
+    path, rows, preview = spool_chunks(score_upload(io.BytesIO(df.to_csv(index=False).encode()),
+                                                    calculator, chunksize=60, file_format='csv'),
+                                       preview_rows=100)
+    try:
+        chunks = list(iter_spool(path))
+        assert (rows, len(chunks), len(preview)) == (250, 5, 100)
+        scored = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(scored.head(100), preview)
+        np.testing.assert_allclose(scored['calculated_tax'],
+                                   calculator.calculate_tax_batch(df['income'], df['deductions']))
+    finally:
+        os.remove(path)
+
+
+def test_spool_file_is_deleted_with_its_owner():
+    path, _, _ = spool_chunks(iter([pd.DataFrame({'a': [1]})]))
+    spool = SpoolFile(path)
+    assert spool.exists()
+    del spool
+    gc.collect()
+    assert not os.path.exists(path)
+
+    path, _, _ = spool_chunks(iter([pd.DataFrame({'a': [1]})]))
+    spool = SpoolFile(path)
+    spool.remove()
+    spool.remove()
+    assert not spool.exists() and not os.path.exists(path)
+
+
+def test_spool_failure_keeps_the_original_error(monkeypatch):
+    def chunks():
+        yield pd.DataFrame({'a': [1]})
+        raise KeyError('bad chunk')
+
+    created = []
+    mkstemp = tempfile.mkstemp
+    monkeypatch.setattr(tempfile, 'mkstemp', lambda **kwargs: created.append(
+        mkstemp(**kwargs)) or created[-1])
+    with pytest.raises(KeyError, match='bad chunk'):
+        spool_chunks(chunks())
+    assert not os.path.exists(created[0][1])
+    path, _, _ = spool_chunks(iter([pd.DataFrame({'a': [1]})]))
+    first, second = SpoolFile(path), SpoolFile(path)
+    assert first.token != second.token
+    first.remove()
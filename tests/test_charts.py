@@ -0,0 +1,20 @@
+import matplotlib
+import matplotlib.pyplot as plt
+
+from src.charts import comparison_figure, comparison_png, render_png
+
+
+def test_comparison_png_bypasses_pyplot_and_global_style():
+    figures = plt.get_fignums()
+    rc = dict(matplotlib.rcParams)
+    png = comparison_png(['Traditional', 'ML Prediction'], [4328.0, 4044.14])
+    assert png.startswith(b'\x89PNG')
+    assert plt.get_fignums() == figures
+    assert dict(matplotlib.rcParams) == rc
+
+
+def test_render_releases_figure_and_handles_zero_amounts():
+    fig = comparison_figure(['Traditional', 'ML Prediction'], [0.0, 0.0])
+    assert fig.axes[0].get_ylim() == (0, 1.2)
+    render_png(fig)
+    assert fig.axes == []
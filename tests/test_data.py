@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from src.data_processing import DataProcessor, TaxFeaturePipeline
+from src.ml_models import TaxPredictor
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture
+def fitted():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(num_samples=300, random_state=0)
+    processor = DataProcessor()
+    processor.scaler.fit(data[['income', 'deductions']])
+    predictor = TaxPredictor()
+    predictor.model = LinearRegression()
+    predictor.train(processor.preprocess_features(data).values, data['tax_liability'])
+    return processor, predictor, calculator, data
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_score_file_streams_in_chunks(tmp_path, fitted, suffix):
+    if suffix == '.parquet':
+        pytest.importorskip('pyarrow')
+    processor, predictor, calculator, data = fitted
+    source = tmp_path / f'input{suffix}'
+    data.to_csv(source, index=False) if suffix == '.csv' else data.to_parquet(source)
+    output = tmp_path / f'scored{suffix}'
+
+    rows = processor.score_file(source, output, predictor, calculator, chunksize=64)
+
+    assert rows == len(data)
+    scored = pd.read_csv(output) if suffix == '.csv' else pd.read_parquet(output)
+    np.testing.assert_allclose(scored['calculated_tax'], data['tax_liability'])
+    expected = predictor.predict_tax(processor.preprocess_features(data).values)
+    np.testing.assert_allclose(scored['predicted_tax'], expected)
+
+
+def test_score_file_parquet_keeps_first_schema_across_chunks(tmp_path, fitted):
+    pytest.importorskip('pyarrow')
+    processor, predictor, calculator, _ = fitted
+    source = tmp_path / 'input.csv'
+    # The first chunk infers integer income and an untyped note column
+    pd.DataFrame({'income': [50000, 60000, 70000.5, np.nan],
+                  'deductions': [12000.0] * 4,
+                  'note': [None, None, 'late', 'amended']}).to_csv(source, index=False)
+    output = tmp_path / 'scored.parquet'
+
+    assert processor.score_file(source, output, predictor, calculator, chunksize=2) == 4
+    scored = pd.read_parquet(output)
+    assert scored['note'].tolist() == [None, None, 'late', 'amended']
+    assert scored['income'].tolist()[:3] == [50000.0, 60000.0, 70000.5]
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_score_file_writes_empty_output_for_empty_input(tmp_path, fitted, suffix):
+    if suffix == '.parquet':
+        pytest.importorskip('pyarrow')
+    processor, predictor, calculator, _ = fitted
+    source = tmp_path / f'input{suffix}'
+    empty = pd.DataFrame({'income': pd.Series(dtype=float), 'deductions': pd.Series(dtype=float)})
+    empty.to_csv(source, index=False) if suffix == '.csv' else empty.to_parquet(source)
+    output = tmp_path / f'scored{suffix}'
+
+    assert processor.score_file(source, output, predictor, calculator) == 0
+    scored = pd.read_csv(output) if suffix == '.csv' else pd.read_parquet(output)
+    assert len(scored) == 0
+    assert {'predicted_tax', 'calculated_tax'} <= set(scored.columns)
+
+
+def test_preprocess_features_requires_columns():
+    with pytest.raises(ValueError):
+        DataProcessor().preprocess_features(pd.DataFrame({'income': [1.0]}))
+
+
+def test_hooks_receive_row_counts_and_timing(fitted, capsys):
+    processor, _, _, data = fitted
+    events = []
+    processor.add_hook(lambda event, rows, seconds: events.append((event, rows, seconds)))
+    processor.preprocess_features(data)
+    assert events[0][:2] == ('preprocess_features', len(data))
+    assert events[0][2] >= 0
+    assert capsys.readouterr().out == ''
+
+
+def test_feature_pipeline_encodes_status_and_brackets(tmp_path, fitted):
+    _, _, calculator, data = fitted
+    pipeline = TaxFeaturePipeline.from_calculator(calculator).fit(data)
+    features = pipeline.transform(data)
+    assert features.shape == (len(data), len(pipeline.feature_names))
+
+    # 60000 - 12000 = 48000 taxable: single is in the 22% bracket up to 100525,
+    # married in the 12% bracket up to 94300
+    rates, distances = pipeline.bracket_features([60000, 60000], [12000, 12000],
+                                                 ['single', 'married'])
+    assert rates.tolist() == [0.22, 0.12]
+    assert distances.tolist() == [100525 - 48000, 94300 - 48000]
+
+    one_hot = features[:, -len(pipeline.statuses):]
+    assert (one_hot.sum(axis=1) == 1).all()
+
+    path = tmp_path / 'feature_pipeline.joblib'
+    pipeline.save(path)
+    np.testing.assert_array_equal(TaxFeaturePipeline.load(path).transform(data), features)
@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src import exporters
+from src.exporters import EXPORT_FORMATS, can_export, export_bytes, file_name, write_export
+
+
+def results(n=120):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'client': [f'c{i}' for i in range(n)],
+        'income': rng.uniform(0, 200000, n),
+        'calculated_tax': rng.uniform(0, 40000, n),
+    })
+
+
+def read_back(data, file_format):
+    if file_format == 'csv':
+        return pd.read_csv(io.BytesIO(data))
+    if file_format == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    if file_format == 'arrow':
+        return pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+    return pd.read_excel(io.BytesIO(data), sheet_name='Tax Results')
+
+
+@pytest.mark.parametrize('file_format', sorted(EXPORT_FORMATS))
+def test_export_round_trip_in_chunks(file_format):
+    df = results()
+    data = export_bytes(df, file_format, chunksize=50)
+    pd.testing.assert_frame_equal(read_back(data, file_format), df)
+
+
+def test_write_export_streams_chunks_to_path(tmp_path):
+    df = results()
+    path = str(tmp_path / file_name('scored', 'arrow'))
+    write_export((df.iloc[i:i + 40] for i in range(0, len(df), 40)), 'arrow', path)
+    assert path.endswith('scored.arrow')
+    assert pa.ipc.open_file(path).read_all().num_rows == len(df)
+    with pytest.raises(ValueError):
+        write_export(df, 'json', io.BytesIO())
+
+
+def test_excel_leaves_missing_values_empty_and_enforces_row_limit(monkeypatch):
+    df = pd.DataFrame({'income': [1.0, np.nan], 'filing_status': [None, 'single']})
+    back = read_back(export_bytes(df, 'xlsx'), 'xlsx')
+    assert back['income'].isna().tolist() == [False, True]
+    assert back['filing_status'].isna().tolist() == [True, False]
+
+    assert can_export(100_000, 'xlsx') and not can_export(100_001, 'xlsx')
+    assert can_export(100_001, 'csv') and can_export(100_001, 'parquet')
+    monkeypatch.setattr(exporters, 'EXCEL_MAX_ROWS', 1)
+    assert not can_export(2, 'xlsx') and can_export(2, 'csv')
+    with pytest.raises(ValueError, match='limited'):
+        export_bytes(df, 'xlsx')
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_streamed_chunks_follow_the_first_chunks_column_types(file_format):
+    chunks = [pd.DataFrame({'client': ['a', 'b'], 'income': [1.0, 2.0]}),
+              pd.DataFrame({'client': [np.nan, np.nan], 'income': [3.0, 4.0]})]
+    buffer = io.BytesIO()
+    write_export(chunks, file_format, buffer)
+    back = read_back(buffer.getvalue(), file_format)
+    assert back['client'].isna().tolist() == [False, False, True, True]
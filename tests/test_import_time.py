@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import budget for the bracket engine, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get('TAXSENSE_IMPORT_BUDGET_MS', 400))
+HEAVY_MODULES = ('pandas', 'sklearn', 'matplotlib', 'openpyxl', 'scipy')
+
+
+def import_times(statement):
+    """Run statement under -X importtime and return {module: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times, result.stdout
+
+
+def test_bracket_engine_imports_only_numpy():
+    times, _ = import_times('import src.tax_calculator')
+    loaded = [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+    assert loaded == []
+    assert times['src.tax_calculator'] / 1000 < IMPORT_BUDGET_MS
+
+
+def test_bracket_calculation_fast_path_stays_numpy_only():
+    statement = (
+        "import sys\n"
+        "from src.tax_calculator import TaxCalculator\n"
+        "calculator = TaxCalculator('data/tax_tables_2024.csv')\n"
+        "calculator.calculate_tax(60000, 12000, 'single')\n"
+        "calculator.calculate_tax_batch([60000, 80000], [12000, 0], ['single', 'married'])\n"
+        "print(sorted(m for m in sys.modules if m.split('.')[0] in %r))" % (HEAVY_MODULES,)
+    )
+    _, stdout = import_times(statement)
+    assert stdout.strip() == '[]'
+
+
+@pytest.mark.parametrize('module', ['src.ml_models', 'src.data_processing'])
+def test_sklearn_estimators_are_not_imported_eagerly(module):
+    times, _ = import_times(f'import {module}')
+    assert 'sklearn.linear_model' not in times
+    assert 'sklearn.model_selection' not in times
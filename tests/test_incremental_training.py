@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from src.incremental_training import (LinearStats, file_source, synthetic_source,
+                                      train_incremental, validation_mask)
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return TaxCalculator('data/tax_tables_2024.csv')
+
+
+def test_linear_stats_merge_matches_full_covariance():
+    rng = np.random.default_rng(0)
+    X = rng.normal([80000, 10000], [30000, 5000], (1000, 2))
+    y = X @ [0.2, -0.1] + rng.normal(0, 100, 1000)
+    stats = LinearStats(2)
+    for start in range(0, 1000, 170):
+        stats.update(X[start:start + 170], y[start:start + 170])
+    xc, yc = X - X.mean(axis=0), y - y.mean()
+    np.testing.assert_allclose(stats.cxx, xc.T @ xc)
+    np.testing.assert_allclose(stats.cxy, xc.T @ yc)
+    assert stats.n == 1000 and stats.mean_y == pytest.approx(y.mean())
+
+
+def test_closed_form_matches_in_memory_ridge(calculator):
+    source = synthetic_source(calculator, 5000, chunk_size=700, random_state=3)
+    predictor, processor, report = train_incremental(source, alpha=1.0)
+
+    data = pd.concat(source(), ignore_index=True)
+    train = data[~validation_mask(data, 0.2)]
+    scaler = StandardScaler().fit(train[['income', 'deductions']])
+    ridge = Ridge(alpha=1.0).fit(scaler.transform(train[['income', 'deductions']]),
+                                 train['tax_liability'])
+    np.testing.assert_allclose(processor.scaler.mean_, scaler.mean_)
+    np.testing.assert_allclose(predictor.model.coef_, ridge.coef_)
+    assert predictor.model.intercept_ == pytest.approx(ridge.intercept_)
+    assert report['train_rows'] == len(train)
+    assert report['validation_rows'] == len(data) - len(train)
+    assert report['rows_per_sec'] > 0 and report['peak_memory_mb'] > 0
+
+
+def test_split_and_fit_do_not_depend_on_chunking(calculator):
+    data = calculator.generate_training_data(3000, random_state=5)
+    small = train_incremental(lambda: (data.iloc[i:i + 250] for i in range(0, 3000, 250)),
+                              track_memory=False)
+    large = train_incremental(lambda: iter([data]), track_memory=False)
+    np.testing.assert_allclose(small[0].model.coef_, large[0].model.coef_)
+    assert small[2]['validation_rows'] == large[2]['validation_rows']
+
+
+def test_file_source_skips_incomplete_rows_and_sgd_converges(tmp_path, calculator):
+    data = calculator.generate_training_data(4000, random_state=1)
+    data.loc[:9, 'income'] = np.nan
+    path = tmp_path / 'train.csv'
+    data.to_csv(path, index=False)
+    source = file_source(str(path), chunksize=1000)
+
+    _, _, exact = train_incremental(source)
+    _, _, sgd = train_incremental(source, method='sgd', epochs=5)
+    assert exact['skipped_rows'] == 10
+    assert sgd['validation_mae'] == pytest.approx(exact['validation_mae'], rel=0.05)
+    with pytest.raises(ValueError):
+        train_incremental(source, method='newton')
@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src import instrumentation
+from src.instrumentation import Metrics, SamplingProfiler
+from src.tax_calculator import TaxCalculator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_metrics_histograms_counters_and_formats(tmp_path):
+    metrics = Metrics(buckets=(0.001, 0.01, float('inf')))
+    metrics.observe('predict_tax', 0.0005, rows=100)
+    metrics.observe('predict_tax', 0.005, rows=50)
+    with metrics.timer('load_model'):
+        pass
+    metrics.inc('cache.hits', 3)
+
+    snapshot = metrics.snapshot()
+    predict = snapshot['operations']['predict_tax']
+    assert (predict['count'], predict['rows']) == (2, 150)
+    assert predict['buckets'] == {'0.001': 1, '0.01': 1, '+Inf': 0}
+    assert predict['mean_ms'] == pytest.approx(2.75)
+    assert snapshot['counters'] == {'cache.hits': 3}
+
+    text = metrics.to_prometheus()
+    assert '# TYPE taxsense_operation_seconds histogram' in text
+    assert 'taxsense_operation_seconds_bucket{operation="predict_tax",le="0.01"} 2' in text
+    assert 'taxsense_operation_seconds_bucket{operation="predict_tax",le="+Inf"} 2' in text
+    assert 'taxsense_operation_rows_total{operation="predict_tax"} 150' in text
+    assert 'taxsense_cache_hits_total 3' in text
+
+    metrics.write(str(tmp_path / 'metrics.json'))
+    metrics.write(str(tmp_path / 'metrics.prom'))
+    assert json.loads((tmp_path / 'metrics.json').read_text())['counters'] == {'cache.hits': 3}
+    assert (tmp_path / 'metrics.prom').read_text() == text
+
+
+@pytest.mark.skipif(instrumentation.enabled(), reason="metrics enabled in this environment")
+def test_disabled_instrumentation_leaves_functions_unwrapped():
+    assert not hasattr(TaxCalculator.calculate_tax, '__wrapped__')
+    assert instrumentation.hooks() == []
+    assert instrumentation.timer('anything') is instrumentation.timer('other')
+
+
+def test_sampling_profiler_records_busy_thread():
+    def busy_loop():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    profiler = SamplingProfiler(interval=0.001).start()
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    worker.join()
+    profiler.stop()
+    assert any(stack.endswith('busy_loop') for stack in profiler.stacks)
+
+
+def test_environment_enables_metrics_and_profile_output(tmp_path):
+    script = (
+        "from src.tax_calculator import TaxCalculator\n"
+        "from src.data_processing import DataProcessor\n"
+        "calculator = TaxCalculator('data/tax_tables_2024.csv')\n"
+        "calculator.calculate_tax(50000, 12000)\n"
+        "data = calculator.generate_training_data(500, random_state=0)\n"
+        "processor = DataProcessor()\n"
+        "processor.scaler.fit(data[['income', 'deductions']])\n"
+        "processor.preprocess_features(data)\n"
+    )
+    env = dict(os.environ, TAXSENSE_METRICS=str(tmp_path / 'metrics.json'),
+               TAXSENSE_PROFILE=f"cprofile:{tmp_path / 'run.pstats'}")
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+    operations = json.loads((tmp_path / 'metrics.json').read_text())['operations']
+    assert operations['calculate_tax']['count'] == 1
+    # The scalar call is not recorded again as a batch of one
+    assert operations['calculate_tax_batch']['rows'] == 500
+    assert operations['preprocess_features']['rows'] == 500
+    assert (tmp_path / 'run.pstats').stat().st_size > 0
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+
+from src.ml_models import CompiledLinearModel, PiecewiseTaxModel, TaxPredictor
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture(scope='module')
+def training_data():
+    data = TaxCalculator('data/tax_tables_2024.csv').generate_training_data(500, random_state=1)
+    return data[['income', 'deductions']].to_numpy(), data['tax_liability'].to_numpy()
+
+
+@pytest.mark.parametrize('model', [Lasso(alpha=1.0), Ridge(alpha=10.0), LinearRegression()])
+def test_compiled_model_matches_sklearn(training_data, model):
+    X, y = training_data
+    scaler = StandardScaler().fit(X)
+    predictor = TaxPredictor()
+    predictor.model = model
+    predictor.train(scaler.transform(X), y)
+
+    compiled = predictor.compile(scaler)
+    expected = predictor.predict_tax(scaler.transform(X))
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=1e-12, atol=1e-8)
+    assert compiled.predict_one(60000.0, 12000.0) == pytest.approx(
+        predictor.predict_tax(scaler.transform([[60000.0, 12000.0]]))[0], rel=1e-12)
+    with pytest.raises(ValueError):
+        compiled.predict_one(60000.0)
+
+
+def test_compile_rejects_non_linear_models():
+    with pytest.raises(TypeError):
+        CompiledLinearModel.from_estimators(None, object())
+
+
+def test_piecewise_model_recovers_brackets_inside_sampled_range():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(5000, random_state=0)
+    statuses = data['filing_status'].to_numpy()
+    model = PiecewiseTaxModel().fit(data['income'], data['deductions'], data['tax_liability'],
+                                    statuses)
+
+    knots = model.to_dict()['single']['knots']
+    assert 47150 in np.round(knots, 6) and 100525 in np.round(knots, 6)
+    test = calculator.generate_training_data(2000, random_state=1)
+    taxable = test['income'] - test['deductions']
+    inside = ((taxable > 20000) & (taxable < 100000)).to_numpy()
+    predicted = model.predict(test['income'], test['deductions'], test['filing_status'].to_numpy())
+    np.testing.assert_allclose(predicted[inside], test['tax_liability'][inside], atol=1e-6)
+    assert model.predict([50000], [0], 'unknown').tolist() == [0.0]
+    # Below the lowest sample the curve runs down to zero tax at zero income
+    assert model.predict([0], [0], 'single').tolist() == [0.0]
+
+    restored = PiecewiseTaxModel.from_dict(model.to_dict())
+    np.testing.assert_array_equal(restored.predict(test['income'], test['deductions'], 'married'),
+                                  model.predict(test['income'], test['deductions'], 'married'))
+
+
+def test_piecewise_model_skips_missing_statuses():
+    x = np.arange(0, 10000, 100.0)
+    statuses = np.array(['single', None, float('nan'), 'married'] * 25, dtype=object)
+    model = PiecewiseTaxModel().fit(x, 0, 0.1 * x, statuses)
+    assert set(model.segments) == {'single', 'married'}
+    predicted = model.predict([5000, 5000], [0, 0], np.array([None, 'married'], dtype=object))
+    assert predicted.tolist() == pytest.approx([0.0, 500.0])
+
+
+def test_piecewise_model_merges_runs_split_by_rounding():
+    x = np.array([0, 1000, 1000.0000001, 2000, 3000, 4000, 5000])
+    y = np.where(x < 3000, 0.1 * x, 300 + 0.2 * (x - 3000))
+    model = PiecewiseTaxModel().fit(x, 0, y)
+    knots, _, slopes = model.segments['single']
+    np.testing.assert_allclose(knots, [0, 3000])
+    np.testing.assert_allclose(slopes, [0.1, 0.2])
+
+
+def test_piecewise_model_tolerates_taxes_rounded_to_the_cent():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(5000, random_state=0)
+    model = PiecewiseTaxModel().fit(data['income'], data['deductions'],
+                                    data['tax_liability'].round(2),
+                                    data['filing_status'].to_numpy())
+
+    knots = np.asarray(model.to_dict()['single']['knots'])
+    for start in (47150, 100525):
+        assert np.abs(knots - start).min() < 1
+    assert len(knots) <= 5
+    test = calculator.generate_training_data(2000, random_state=1)
+    taxable = test['income'] - test['deductions']
+    inside = ((taxable > 20000) & (taxable < 100000)).to_numpy()
+    predicted = model.predict(test['income'], test['deductions'], test['filing_status'].to_numpy())
+    np.testing.assert_allclose(predicted[inside], test['tax_liability'][inside], atol=0.01)
+
+
+def test_piecewise_model_refuses_pooled_filing_statuses():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(2000, random_state=0)
+    with pytest.raises(ValueError, match='not piecewise linear'):
+        PiecewiseTaxModel().fit(data['income'], data['deductions'], data['tax_liability'])
@@ -0,0 +1,86 @@
+import os
+import time
+
+from joblib import dump
+
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import publish, save_bundle
+from src.model_registry import ModelRegistry
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture
+def bundle_root(tmp_path):
+    data = TaxCalculator('data/tax_tables_2024.csv').generate_training_data(200, random_state=4)
+    features = data[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    for version, target in (('v1', data['tax_liability']), ('v2', data['tax_liability'] * 2)):
+        model = LinearRegression().fit(scaler.transform(features), target)
+        save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler, version=version)
+    publish(tmp_path, 'v1')
+    return tmp_path
+
+
+def test_registry_swaps_new_bundle_and_keeps_snapshots(bundle_root):
+    registry = ModelRegistry.for_bundles(str(bundle_root))
+    swaps = []
+    registry.add_listener(lambda old, new: swaps.append((old.version, new.version)))
+    in_flight = registry.current()
+    assert registry.reload() is False
+
+    publish(bundle_root, 'v2')
+    assert registry.reload() is True
+    assert registry.current().version == 'v2'
+    assert in_flight.version == 'v1'
+    assert in_flight.predict([60000], [12000])[0] * 2 == pytest.approx(
+        registry.current().predict([60000], [12000])[0])
+
+    metrics = registry.metrics()
+    assert swaps == [('v1', 'v2')]
+    assert metrics['swaps'] == 1 and metrics['loads'] == 2
+    assert metrics['last_load_seconds'] > 0
+
+
+def test_registry_keeps_serving_when_new_artifact_is_broken(bundle_root):
+    registry = ModelRegistry.for_bundles(str(bundle_root))
+    os.remove(bundle_root / 'v2' / 'model.joblib')
+    publish(bundle_root, 'v2', validate=False)
+
+    assert registry.reload() is False
+    assert registry.current().version == 'v1'
+    assert registry.metrics()['load_failures'] == 1
+
+
+def test_background_watcher_picks_up_publish(bundle_root):
+    registry = ModelRegistry.for_bundles(str(bundle_root), poll_interval=0.01).start()
+    try:
+        publish(bundle_root, 'v2')
+        for _ in range(500):
+            if registry.current().version == 'v2':
+                break
+            time.sleep(0.01)
+        assert registry.current().version == 'v2'
+    finally:
+        registry.stop()
+
+
+def test_file_registry_waits_for_files_to_settle(tmp_path):
+    data = TaxCalculator('data/tax_tables_2024.csv').generate_training_data(200, random_state=4)
+    features = data[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    model_path, scaler_path = str(tmp_path / 'tax_model.joblib'), str(tmp_path / 'scaler.joblib')
+    dump(LinearRegression().fit(scaler.transform(features), data['tax_liability']), model_path)
+    dump(scaler, scaler_path)
+    registry = ModelRegistry.for_files(model_path, scaler_path)
+    first = registry.current()
+
+    # A new model written next to the old scaler is not loaded on the first poll
+    dump(LinearRegression().fit(scaler.transform(features), data['tax_liability'] * 2), model_path)
+    assert registry.reload() is False
+    assert registry.current() is first
+    assert registry.reload() is True
+    assert registry.current().predict([60000], [12000])[0] == pytest.approx(
+        first.predict([60000], [12000])[0] * 2)
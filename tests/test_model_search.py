@@ -0,0 +1,60 @@
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from src.model_search import (BracketHingeFeatures, bracket_knots, default_candidates,
+                              format_report, search_models)
+from src.data_processing import TaxFeaturePipeline
+from src.tax_calculator import TaxCalculator
+
+
+def test_hinge_features_undo_scaling():
+    hinges = BracketHingeFeatures(knots=(100.0,), mean=(1000.0, 100.0), scale=(10.0, 1.0))
+    features = hinges.transform(np.array([[0.0, 0.0], [-90.0, 0.0]]))
+    assert features.tolist() == [[900.0, 800.0], [0.0, 0.0]]
+
+
+def test_search_models_ranks_candidates_and_reports_speed():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(600, random_state=0)
+    scaler = StandardScaler().fit(data[['income', 'deductions']])
+    X = scaler.transform(data[['income', 'deductions']])
+    candidates = default_candidates(bracket_knots(calculator), scaler)
+    # Without status columns the taxes of all statuses are not one curve
+    assert 'piecewise_exact' not in candidates
+    candidates = {name: candidates[name] for name in
+                  ('lasso_alpha_1', 'ridge_alpha_10', 'piecewise_linear')}
+
+    results = search_models(X, data['tax_liability'].values, candidates, cv=3, n_jobs=2)
+
+    assert [r['cv_mae'] for r in results] == sorted(r['cv_mae'] for r in results)
+    assert results[0]['name'] == 'piecewise_linear'
+    for result in results:
+        assert result['fit_seconds'] >= 0 and result['predict_ms_per_1k'] > 0
+    assert 'piecewise_linear' in format_report(results)
+
+
+def test_piecewise_exact_candidate_reads_status_columns():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(3000, random_state=4)
+    pipeline = TaxFeaturePipeline.from_calculator(calculator)
+    X = pipeline.fit_transform(data)
+    regressor = default_candidates(scaler=pipeline.scaler,
+                                   statuses=pipeline.statuses)['piecewise_exact']
+    regressor.fit(X, data['tax_liability'])
+    assert regressor.n_features_in_ == X.shape[1]
+    inside = data['income'] < data['income'].max()
+    np.testing.assert_allclose(regressor.predict(X)[inside], data['tax_liability'][inside], atol=1e-6)
+
+
+def test_piecewise_linear_fits_a_curve_per_status():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(3000, random_state=5)
+    pipeline = TaxFeaturePipeline.from_calculator(calculator)
+    X = pipeline.fit_transform(data)
+    status_knots = bracket_knots(calculator, pipeline.statuses)
+    assert len(status_knots) == len(pipeline.statuses)
+    estimator = default_candidates(bracket_knots(calculator), pipeline.scaler, pipeline.statuses,
+                                   status_knots)['piecewise_linear']
+    estimator.fit(X, data['tax_liability'])
+    assert estimator[0].n_features_in_ == X.shape[1]
+    np.testing.assert_allclose(estimator.predict(X), data['tax_liability'], atol=1e-3)
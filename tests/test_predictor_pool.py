@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import ModelBundle, load_bundle, publish, save_bundle
+from src.data_processing import TaxFeaturePipeline
+from src.model_registry import ModelRegistry
+from src.predictor_pool import PredictorPool, PredictorSnapshot
+from src.tax_calculator import TaxCalculator
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return TaxCalculator('data/tax_tables_2024.csv')
+
+
+@pytest.fixture(scope='module')
+def training(calculator):
+    return calculator.generate_training_data(500, random_state=3)
+
+
+@pytest.fixture(scope='module')
+def linear_bundle(training):
+    features = training[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    model = LinearRegression().fit(scaler.transform(features), training['tax_liability'])
+    return ModelBundle.from_estimators(model, scaler=scaler)
+
+
+@pytest.fixture(scope='module')
+def forest_bundle(training, calculator, tmp_path_factory):
+    pipeline = TaxFeaturePipeline.from_calculator(calculator).fit(training)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(
+        pipeline.transform(training), training['tax_liability'])
+    path = save_bundle(tmp_path_factory.mktemp('bundles'), model, pipeline.feature_names,
+                       feature_pipeline=pipeline, version='forest')
+    return load_bundle(path)
+
+
+def _returns(n=5000):
+    rng = np.random.default_rng(0)
+    statuses = rng.choice(['single', 'married', 'head_of_household', 'unknown'], n)
+    return rng.uniform(0, 400000, n), rng.uniform(0, 40000, n), statuses
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+@pytest.mark.parametrize('bundle_name', ['linear_bundle', 'forest_bundle'])
+def test_pool_matches_serial_scoring(request, calculator, mode, bundle_name):
+    bundle = request.getfixturevalue(bundle_name)
+    incomes, deductions, statuses = _returns()
+    with PredictorPool(bundle, calculator, mode=mode, workers=2, min_shard_size=1000) as pool:
+        predicted, calculated = pool.score(incomes, deductions, statuses)
+    np.testing.assert_allclose(predicted, bundle.predict(incomes, deductions, statuses))
+    np.testing.assert_array_equal(calculated,
+                                  calculator.calculate_tax_batch(incomes, deductions, statuses))
+
+
+def test_pool_without_model_only_calculates(calculator):
+    incomes, deductions, _ = _returns(300)
+    with PredictorPool(calculator=calculator, min_shard_size=100) as pool:
+        predicted, calculated = pool.score(incomes, deductions, 'married')
+    assert predicted is None
+    np.testing.assert_array_equal(calculated,
+                                  calculator.calculate_tax_batch(incomes, deductions, 'married'))
+    with pytest.raises(ValueError, match='Unknown mode'):
+        PredictorPool(mode='fiber')
+
+
+def test_snapshots_are_immutable_and_follow_registry_swaps(training, tmp_path):
+    features = training[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    for version, target in (('v1', training['tax_liability']), ('v2', training['tax_liability'] * 2)):
+        model = LinearRegression().fit(scaler.transform(features), target)
+        save_bundle(tmp_path, model, ['income', 'deductions'], scaler=scaler, version=version)
+    publish(tmp_path, 'v1')
+    registry = ModelRegistry.for_bundles(str(tmp_path))
+    incomes, deductions, _ = _returns(2000)
+
+    with PredictorPool(registry, mode='process', workers=2, min_shard_size=500) as pool:
+        snapshot = pool.snapshot()
+        assert isinstance(snapshot, PredictorSnapshot) and snapshot.version == 'v1'
+        with pytest.raises(AttributeError):
+            snapshot.version = 'v2'
+        first, _ = pool.score(incomes, deductions)
+
+        publish(tmp_path, 'v2')
+        registry.reload()
+        assert pool.snapshot().version == 'v2'
+        second, _ = pool.score(incomes, deductions)
+    np.testing.assert_allclose(second, first * 2)
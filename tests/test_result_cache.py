@@ -0,0 +1,163 @@
+import math
+
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import ModelBundle
+from src.model_registry import ModelRegistry
+from src.result_cache import (ResultCache, cached_calculate_tax, cached_predict_tax,
+                              calculation_key, prediction_key)
+from src.server import TaxService
+from src.tax_calculator import TaxCalculator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    path = str(tmp_path / 'results.sqlite') if request.param == 'sqlite' else None
+    return lambda **kwargs: ResultCache(path=path, **kwargs)
+
+
+def test_lru_eviction_and_counters(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.put(('a',), 1)
+    cache.put(('b',), 2)
+    assert cache.get(('a',)) == 1.0  # 'b' is now least recently used
+    cache.put(('c',), 3)
+    assert cache.get(('b',)) is None
+    assert cache.get(('c',)) == 3.0
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (2, 1, 1, 2)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+
+def test_ttl_expiry(make_cache):
+    clock = FakeClock()
+    cache = make_cache(ttl=60, clock=clock)
+    calls = []
+    compute = lambda: calls.append(1) or 42.0  # noqa: E731
+    assert cache.get_or_compute(('k',), compute) == 42.0
+    clock.now += 59
+    assert cache.get_or_compute(('k',), compute) == 42.0
+    clock.now += 1
+    assert cache.get_or_compute(('k',), compute) == 42.0
+    assert len(calls) == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_get_many_computes_only_missing_keys(make_cache):
+    cache = make_cache()
+    cache.put(('b',), 20)
+    seen = []
+
+    def compute(missing):
+        seen.append(missing)
+        return [i * 100 for i in missing]
+
+    assert cache.get_many([('a',), ('b',), ('c',)], compute) == [0.0, 20.0, 200.0]
+    assert cache.get_many([('a',), ('c',)], compute) == [0.0, 200.0]
+    assert seen == [[0, 2]]
+
+
+def test_non_finite_values_round_trip(make_cache):
+    cache = make_cache()
+    for key, value in (('nan',), float('nan')), (('inf',), float('inf')):
+        cache.put(key, value)
+        cache.put(key, value)
+    assert math.isnan(cache.get(('nan',)))
+    assert cache.get(('inf',)) == float('inf')
+    assert cache.stats()['hits'] == 2
+
+
+def test_sqlite_get_many_is_one_query_and_one_transaction(tmp_path):
+    cache = ResultCache(path=str(tmp_path / 'results.sqlite'))
+    cache.put(('b',), 20)
+    statements = []
+    cache._store.connection.set_trace_callback(statements.append)
+    keys = [(k,) for k in 'abcb']
+    assert cache.get_many(keys, lambda missing: [i * 100 for i in missing]) == [0.0, 20.0, 200.0, 20.0]
+    assert sum(s.startswith('SELECT') for s in statements) == 1
+    assert sum(s.startswith('BEGIN') for s in statements) == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 2)
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'shared.sqlite')
+    ResultCache(path=path).put((2024, 'single', 50000.0, 12000.0, 'model:v1'), 4044.14)
+    other = ResultCache(path=path)
+    assert other.get((2024, 'single', 50000.0, 12000.0, 'model:v1')) == 4044.14
+    assert other.get((2024, 'single', 50000.0, 12000.0, 'model:v2')) is None
+    assert other.stats()['backend'] == 'sqlite'
+
+
+def test_sqlite_hits_do_not_write_and_eviction_is_batched(tmp_path):
+    cache = ResultCache(max_entries=80, path=str(tmp_path / 'results.sqlite'))
+    statements = []
+    cache._store.connection.set_trace_callback(statements.append)
+    for i in range(80):
+        cache.put((i,), i)
+    for _ in range(3):
+        for i in range(40):
+            assert cache.get((i,)) == i
+    assert not any(s.startswith('UPDATE') for s in statements)
+    assert sum('COUNT(*)' in s for s in statements) == 1
+
+    cache.put((80,), 80)
+    # Recently read entries survive; the table is trimmed an eighth below the limit
+    assert cache.stats()['size'] == 70
+    assert cache.stats()['evictions'] == 11
+    assert all(cache.get((i,)) == i for i in range(40))
+    statements.clear()
+    for i in range(81, 91):
+        cache.put((i,), i)
+    assert sum('COUNT(*)' in s for s in statements) == 0
+
+
+def _bundle(scale, version):
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(200, random_state=0)
+    features = data[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    model = LinearRegression().fit(scaler.transform(features), data['tax_liability'] * scale)
+    return ModelBundle.from_estimators(model, scaler, version=version)
+
+
+def test_keys_are_versioned_and_wrappers_match_direct_calls():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    key = calculation_key(calculator, 50000, 12000, 'single')
+    assert key[:4] == (2024, 'single', 50000.0, 12000.0)
+    assert key[4] == f'tables:{calculator.tables_digest[:16]}'
+
+    cache = ResultCache()
+    v1, v2 = _bundle(1, 'v1'), _bundle(2, 'v2')
+    assert prediction_key(v1, 50000, 12000) != prediction_key(v2, 50000, 12000)
+    assert cached_calculate_tax(cache, calculator, 50000, 12000) == calculator.calculate_tax(50000, 12000)
+    first = cached_predict_tax(cache, v1, 50000, 12000)
+    assert first == pytest.approx(v1.predict([50000], [12000])[0])
+    assert cached_predict_tax(cache, v2, 50000, 12000) == pytest.approx(first * 2)
+    assert cached_predict_tax(cache, v1, 50000, 12000) == first
+    assert cache.stats()['hits'] == 1
+
+
+def test_service_answers_repeated_returns_from_cache():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    service = TaxService(calculator, ModelRegistry.static(_bundle(1, 'v1')), cache=ResultCache())
+    items = [{'income': 50000.0, 'deductions': 12000.0, 'filing_status': status}
+             for status in ('single', 'married', 'single')]
+    expected = calculator.calculate_tax_batch([50000] * 3, [12000] * 3,
+                                              ['single', 'married', 'single']).tolist()
+    assert service.calculate_batch(items) == expected
+    assert service.calculate_batch(items) == expected
+    predicted = service.predict_batch(items)
+    assert predicted[0] == predicted[2]
+    stats = service.stats()['cache']
+    # The batch's repeated single return is only a hit once it has been stored
+    assert (stats['hits'], stats['misses'], stats['size']) == (3, 6, 4)
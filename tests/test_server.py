@@ -0,0 +1,101 @@
+import asyncio
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from sklearn.preprocessing import StandardScaler
+
+from src.artifacts import ModelBundle
+from src.load_generator import run_load
+from src.model_registry import ModelRegistry
+from src.server import MicroBatcher, TaxService
+from src.tax_calculator import TaxCalculator
+
+
+def build_service():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    data = calculator.generate_training_data(200, random_state=0)
+    features = data[['income', 'deductions']].to_numpy()
+    scaler = StandardScaler().fit(features)
+    model = LinearRegression().fit(scaler.transform(features), data['tax_liability'])
+    registry = ModelRegistry.static(ModelBundle.from_estimators(model, scaler))
+    return TaxService(calculator, registry, max_delay=0.005)
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    calls = []
+
+    def double(items):
+        calls.append(len(items))
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double, max_batch=8, max_delay=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(scenario()) == [i * 2 for i in range(20)]
+    assert max(calls) == 8 and sum(calls) == 20
+
+
+def test_micro_batcher_fails_items_without_a_result():
+    async def scenario():
+        batcher = MicroBatcher(lambda items: items[:1], max_batch=4, max_delay=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(4)),
+                                       return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results[0] == 0
+    assert all(isinstance(result, RuntimeError) for result in results[1:])
+
+
+def test_http_endpoints_and_stats():
+    service = build_service()
+
+    async def scenario():
+        server = await asyncio.start_server(service.serve_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            calc = await run_load(port=port, endpoint='/calculate', requests=200, concurrency=16)
+            pred = await run_load(port=port, endpoint='/predict', requests=50, concurrency=8)
+            status, payload = await service.handle('POST', '/calculate', b'{"income": "x"}')
+            missing = await service.handle('GET', '/missing', b'')
+        finally:
+            server.close()
+            await service.predict_batcher.stop()
+            await service.calculate_batcher.stop()
+        return calc, pred, status, missing
+
+    calc, pred, status, missing = asyncio.run(scenario())
+    assert calc['requests'] == 200 and pred['requests'] == 50
+    stats = calc['server']
+    assert stats['latency']['/calculate']['requests'] == 200
+    assert stats['calculate_batches']['max_size'] > 1
+    assert status == 400 and missing[0] == 404
+
+    expected = service.calculator.calculate_tax(60000, 12000, 'married')
+    assert service.calculate_batch([{'income': 60000, 'deductions': 12000,
+                                     'filing_status': 'married'}]) == [expected]
+    np.testing.assert_allclose(
+        service.predict_batch([{'income': 60000, 'deductions': 12000}]),
+        service.registry.current().compile().predict([[60000, 12000]]))
+
+
+def test_non_finite_amounts_are_rejected():
+    service = build_service()
+    bodies = [b'{"income": NaN, "deductions": 0}', b'{"income": 1e400, "deductions": 0}',
+              b'{"income": 60000, "deductions": -Infinity}']
+
+    async def scenario():
+        try:
+            return [await service.handle('POST', path, body)
+                    for path in ('/calculate', '/predict') for body in bodies]
+        finally:
+            await service.predict_batcher.stop()
+            await service.calculate_batcher.stop()
+
+    for status, payload in asyncio.run(scenario()):
+        assert status == 400 and 'finite' in payload['error']
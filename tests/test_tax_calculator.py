@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.tax_calculator import FILING_STATUSES, MultiYearTaxCalculator, TaxCalculator
+
+
+def reference_tax(tax_tables, income, deductions, filing_status):
+    """Bracket walk as originally implemented with iterrows()."""
+    taxable_income = max(0, income - deductions)
+    total_tax = 0
+    brackets = tax_tables[tax_tables['filing_status'] == filing_status].sort_values('bracket_start')
+    for _, bracket in brackets.iterrows():
+        if taxable_income > bracket['bracket_start']:
+            total_tax += min(
+                taxable_income - bracket['bracket_start'],
+                bracket['bracket_end'] - bracket['bracket_start']
+            ) * bracket['tax_rate']
+        else:
+            break
+    return total_tax
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return TaxCalculator('data/tax_tables_2024.csv')
+
+
+def test_scalar_matches_reference(calculator):
+    cases = [(0, 0), (11600, 0), (11601, 1), (60000, 12000), (5000, 9000),
+             (250000, 20000), (2e9, 0)]
+    for status in ['single', 'married', 'head_of_household']:
+        for income, deductions in cases:
+            expected = reference_tax(calculator.tax_tables, income, deductions, status)
+            assert calculator.calculate_tax(income, deductions, status) == expected
+
+
+def test_batch_matches_scalar(calculator):
+    rng = np.random.default_rng(0)
+    incomes = rng.uniform(0, 800000, 2000)
+    deductions = rng.uniform(0, 50000, 2000)
+    statuses = rng.choice(['single', 'married', 'head_of_household', 'unknown'], 2000)
+    taxes = calculator.calculate_tax_batch(incomes, deductions, statuses)
+    expected = [calculator.calculate_tax(i, d, s) if s != 'unknown' else 0
+                for i, d, s in zip(incomes, deductions, statuses)]
+    np.testing.assert_array_equal(taxes, expected)
+
+
+def test_batch_single_status_and_missing_tables():
+    calculator = TaxCalculator('data/tax_tables_2024.csv')
+    taxes = calculator.calculate_tax_batch([50000, 60000], [12000, 12000], 'married')
+    assert taxes[0] == calculator.calculate_tax(50000, 12000, 'married')
+    missing = TaxCalculator('data/does_not_exist.csv')
+    assert missing.calculate_tax(50000, 12000) == 0
+    assert missing.calculate_tax_batch([50000], [12000]).tolist() == [0.0]
+
+
+def test_missing_amounts_are_taxed_at_zero(calculator):
+    nan = float('nan')
+    cases = [(nan, 12000), (60000, nan), (nan, nan)]
+    for income, deductions in cases:
+        assert calculator.calculate_tax(income, deductions, 'single') == 0
+    incomes, deductions = zip(*cases)
+    assert calculator.calculate_tax_batch(incomes, deductions).tolist() == [0.0, 0.0, 0.0]
+    taxes, _, effective = calculator.calculate_rates(incomes, deductions)
+    assert taxes.tolist() == effective.tolist() == [0.0, 0.0, 0.0]
+
+
+def test_generate_training_data_is_seedable_and_consistent(calculator):
+    data = calculator.generate_training_data(num_samples=500, random_state=7)
+    again = calculator.generate_training_data(num_samples=500, random_state=7)
+    pd.testing.assert_frame_equal(data, again)
+    assert list(data.columns) == ['income', 'deductions', 'filing_status', 'tax_liability']
+    for row in data.head(20).itertuples():
+        assert row.tax_liability == calculator.calculate_tax(row.income, row.deductions, row.filing_status)
+
+
+def test_iter_training_data_chunks_match_across_workers(calculator):
+    serial = list(calculator.iter_training_data(250, chunk_size=100, random_state=3))
+    assert [len(chunk) for chunk in serial] == [100, 100, 50]
+    parallel = list(calculator.iter_training_data(250, chunk_size=100, random_state=3, n_jobs=2))
+    for a, b in zip(serial, parallel):
+        pd.testing.assert_frame_equal(a, b)
+
+
+@pytest.mark.parametrize('kwargs', [{'chunk_size': 0}, {'n_jobs': 0}, {'n_jobs': -2}])
+def test_iter_training_data_rejects_bad_arguments(calculator, kwargs):
+    with pytest.raises(ValueError):
+        calculator.iter_training_data(100, **kwargs)
+
+
+def test_multi_year_matches_single_year_calculators():
+    multi = MultiYearTaxCalculator('data')
+    assert multi.years == [2024, 2025]
+    rng = np.random.default_rng(0)
+    n = 3000
+    incomes = rng.uniform(0, 800000, n)
+    deductions = rng.uniform(0, 30000, n)
+    statuses = rng.choice(FILING_STATUSES + ['unknown'], n)
+    years = rng.choice([2023, 2024, 2025], n)
+
+    taxes = multi.calculate_tax_batch(incomes, deductions, statuses, years)
+    for year in (2024, 2025):
+        single_year = TaxCalculator(f'data/tax_tables_{year}.csv')
+        mask = years == year
+        expected = single_year.calculate_tax_batch(incomes[mask], deductions[mask], statuses[mask])
+        assert np.array_equal(taxes[mask], expected)
+    assert (taxes[years == 2023] == 0).all()
+    assert (taxes[statuses == 'unknown'] == 0).all()
+
+
+def test_multi_year_scalar_defaults_to_latest_year():
+    multi = MultiYearTaxCalculator('data')
+    # 2025 single brackets: 10% to 11,925 then 12%
+    assert multi.calculate_tax(20000, 0) == pytest.approx(1192.5 + 8075 * 0.12)
+    assert multi.calculate_tax(20000, 0, year=2024) == pytest.approx(1160 + 8400 * 0.12)
+    assert multi.calculate_tax_batch([], [], 'single').shape == (0,)
+    assert multi.calculate_tax(float('nan'), 0) == 0
+
+
+def test_multi_year_taxes_missing_statuses_and_years_at_zero():
+    multi = MultiYearTaxCalculator()
+    single_year = TaxCalculator('data/tax_tables_2024.csv')
+    # A pandas filing_status column with gaps holds None and NaN
+    statuses = pd.Series(['single', None, np.nan, 'married', '']).to_numpy()
+    incomes, deductions = np.full(5, 60000.0), np.zeros(5)
+    expected = single_year.calculate_tax_batch(incomes, deductions, statuses)
+    assert expected[1:3].tolist() == [0, 0] and expected[0] > 0
+    np.testing.assert_array_equal(multi.calculate_tax_batch(incomes, deductions, statuses, 2024),
+                                  expected)
+    years = np.array([2024, 2024, 2024, np.nan, 2024])
+    assert multi.calculate_tax_batch(incomes, deductions, statuses, years)[3] == 0
+
+
+@pytest.mark.parametrize('rows, message', [
+    ('single,0,10000,0.1\nsingle,12000,999999999,0.2', 'gap'),
+    ('single,0,10000,0.1\nsingle,9000,999999999,0.2', 'overlap'),
+    ('single,500,999999999,0.1', 'start at 500'),
+])
+def test_multi_year_rejects_non_contiguous_brackets(tmp_path, rows, message):
+    (tmp_path / 'tax_tables_2030.csv').write_text(
+        'filing_status,bracket_start,bracket_end,tax_rate\n' + rows)
+    with pytest.raises(ValueError, match=message):
+        MultiYearTaxCalculator(str(tmp_path))
+
+
+def test_calculate_rates(calculator):
+    taxes, marginal, effective = calculator.calculate_rates(
+        [0, 11600, 60000, 2e9], [0, 0, 12000, 0], 'single')
+    np.testing.assert_array_equal(taxes, calculator.calculate_tax_batch(
+        [0, 11600, 60000, 2e9], [0, 0, 12000, 0], 'single'))
+    # The next dollar at a bracket boundary is taxed at the higher rate;
+    # income above the last bracket end is untaxed
+    assert marginal.tolist() == [0.10, 0.12, 0.22, 0.0]
+    assert effective[0] == 0
+    assert effective[2] == pytest.approx(taxes[2] / 60000)
+
+
+def test_what_if_grid_matches_batch(calculator):
+    incomes = np.linspace(0, 500000, 1001)
+    deductions = [0, 12000, 30000]
+    grid = calculator.what_if_grid(incomes, deductions, ['married', 'unknown'])
+    assert grid['tax'].shape == (2, 3, 1001)
+    for j, deduction in enumerate(deductions):
+        np.testing.assert_array_equal(
+            grid['tax'][0, j], calculator.calculate_tax_batch(incomes, deduction, 'married'))
+    assert not grid['tax'][1].any() and not grid['marginal_rate'][1].any()
+    assert calculator.what_if_grid([50000])['filing_status'] == FILING_STATUSES
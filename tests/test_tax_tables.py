@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.tax_tables import BracketSchedule, load_tax_tables, year_from_path
+
+TABLE = """filing_status,bracket_start,bracket_end,tax_rate
+single,10000,999999999,0.20
+single,0,10000,0.10
+"""
+
+
+def test_schedule_is_sorted_and_immutable():
+    schedule = BracketSchedule('single', [10000, 0], [50000, 10000], [0.2, 0.1])
+    assert schedule.starts.tolist() == [0, 10000]
+    assert schedule.base.tolist() == [0, 1000]
+    assert schedule.tax([0, 5000, 20000]).tolist() == [0, 500, 3000]
+    with pytest.raises(AttributeError):
+        schedule.rates = np.zeros(2)
+    with pytest.raises(ValueError):
+        schedule.rates[0] = 0.5
+
+
+def test_schedule_rejects_inverted_brackets():
+    with pytest.raises(ValueError):
+        BracketSchedule('single', [0, 100], [100, 50], [0.1, 0.2])
+
+
+def test_registry_parses_once_and_reloads_on_change(tmp_path):
+    path = tmp_path / 'tax_tables_2030.csv'
+    path.write_text(TABLE)
+    first = load_tax_tables(str(path))
+    assert first.year == 2030
+    assert load_tax_tables(str(path)) is first
+
+    # Touching the file without changing its content keeps the compiled copy
+    os.utime(path, ns=(0, 0))
+    assert load_tax_tables(str(path)) is first
+
+    path.write_text(TABLE.replace('0.20', '0.25'))
+    reloaded = load_tax_tables(str(path))
+    assert reloaded is not first
+    assert reloaded.schedules['single'].rates.tolist() == [0.10, 0.25]
+
+
+def test_year_from_path():
+    assert year_from_path('data/tax_tables_2024.csv') == 2024
+    assert year_from_path('custom.csv') is None
+
+
+def test_overlapping_brackets_walk_every_bracket():
+    schedule = BracketSchedule('single', [0, 10000], [20000, 30000], [0.1, 0.2])
+    assert schedule.overlapping
+    # 15000 falls in both brackets: 15000 * 0.1 + 5000 * 0.2
+    assert schedule.tax([5000, 15000]).tolist() == pytest.approx([500, 2500])
+
+
+def test_marginal_rate_is_rate_of_next_dollar():
+    schedule = BracketSchedule('single', [0, 10000, 30000], [10000, 20000, 40000], [0.1, 0.2, 0.3])
+    # 25000 sits in the gap between 20000 and 30000
+    assert schedule.marginal_rate([0, 9999, 10000, 25000, 35000, 50000]).tolist() == \
+        [0.1, 0.1, 0.2, 0.0, 0.3, 0.0]
+    overlapping = BracketSchedule('single', [0, 10000], [20000, 30000], [0.1, 0.2])
+    assert overlapping.marginal_rate([5000, 15000, 25000]).tolist() == pytest.approx([0.1, 0.3, 0.2])
+
+
+def test_distance_to_next_threshold():
+    schedule = BracketSchedule('single', [0, 10000, 30000], [10000, 20000, 40000], [0.1, 0.2, 0.3])
+    assert schedule.distance_to_next([0, 9999, 10000, 25000, 35000, 40000, 50000]).tolist() == \
+        [10000, 1, 10000, 5000, 5000, 0, 0]